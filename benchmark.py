@@ -0,0 +1,803 @@
+#!/usr/bin/env python2
+#
+# TexCompleter - Semantic completer for YouCompleteMe which handles Tex files.
+# Copyright (C) 2015 Till Smejkal <till.smejkal@ossmail.de>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+###
+# Standard library imports.
+###
+from __future__ import print_function
+
+from os import makedirs
+from os.path import abspath, dirname, isdir, join
+
+import gc
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+###
+# YCMD imports.
+###
+def _InstallYcmdStub():
+    """
+    Make the completer importable without an installation of ycmd.
+
+    If ycmd can not be imported, minimal replacements of the parts which the
+    completer uses are registered instead. The third party folder next to
+    this file is added to the package search path in both cases.
+    """
+    try:
+        for name in ["ycmd.completers.completer", "ycmd.responses",
+                "ycmd.utils"]:
+            __import__(name)
+        return
+    except ImportError:
+        pass
+
+    class Completer(object):
+
+        def __init__(self, user_options):
+            self.user_options = user_options
+
+        def ShouldUseNow(self, request_data):
+            return self.ShouldUseNowInner(request_data)
+
+        def ComputeCandidates(self, request_data):
+            if not self.ShouldUseNow(request_data):
+                return []
+
+            return self.FilterAndSortCandidates(
+                    self.ComputeCandidatesInner(request_data),
+                    request_data['query'])
+
+        def FilterAndSortCandidates(self, candidates, query):
+            # The completer's own filtering is measured, not the one of ycmd.
+            return candidates
+
+        def Shutdown(self):
+            pass
+
+    def BuildCompletionData(insertion_text, extra_menu_info = None,
+            detailed_info = None, menu_text = None, kind = None,
+            extra_data = None):
+        completion_data = {'insertion_text' : insertion_text}
+
+        if extra_menu_info:
+            completion_data['extra_menu_info'] = extra_menu_info
+        if menu_text:
+            completion_data['menu_text'] = menu_text
+        if detailed_info:
+            completion_data['detailed_info'] = detailed_info
+        if kind:
+            completion_data['kind'] = kind
+        if extra_data:
+            completion_data['extra_data'] = extra_data
+
+        return completion_data
+
+    def BuildGoToResponse(filepath, line_num, column_num, description = None):
+        return {'filepath' : filepath, 'line_num' : line_num,
+                'column_num' : column_num, 'description' : description}
+
+    def BuildDiagnosticData(diagnostic):
+        return {'ranges' : diagnostic.ranges_,
+                'location' : diagnostic.location_,
+                'location_extent' : diagnostic.location_extent_,
+                'text' : diagnostic.text_, 'kind' : diagnostic.kind_}
+
+    class Location(object):
+
+        def __init__(self, line, column, filename):
+            self.line_number_ = line
+            self.column_number_ = column
+            self.filename_ = filename
+
+    class Range(object):
+
+        def __init__(self, start, end):
+            self.start_ = start
+            self.end_ = end
+
+    class Diagnostic(object):
+
+        def __init__(self, ranges, location, location_extent, text, kind):
+            self.ranges_ = ranges
+            self.location_ = location
+            self.location_extent_ = location_extent
+            self.text_ = text
+            self.kind_ = kind
+
+    def AddNearestThirdPartyFoldersToSysPath(file_path):
+        third_party = join(dirname(abspath(file_path)), "third_party")
+
+        if isdir(third_party):
+            for package in ["bibtexparser"]:
+                if isdir(join(third_party, package)):
+                    sys.path.insert(0, join(third_party, package))
+
+    modules = {
+        "ycmd" : {},
+        "ycmd.completers" : {},
+        "ycmd.completers.completer" : {"Completer" : Completer},
+        "ycmd.responses" : {"BuildCompletionData" : BuildCompletionData,
+            "BuildDiagnosticData" : BuildDiagnosticData,
+            "BuildGoToResponse" : BuildGoToResponse,
+            "Diagnostic" : Diagnostic, "Location" : Location,
+            "Range" : Range},
+        "ycmd.utils" : {"AddNearestThirdPartyFoldersToSysPath" :
+            AddNearestThirdPartyFoldersToSysPath}
+    }
+
+    for name, attributes in modules.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        sys.modules[name] = module
+
+_InstallYcmdStub()
+
+sys.path.insert(0, dirname(abspath(__file__)))
+from tex_completer import TexBibtexScanner, TexCandidateIndex, TexCompleter
+
+
+###
+# Synthetic corpus.
+###
+Words = ["analysis", "system", "efficient", "distributed", "memory", "model",
+        "parallel", "scheduling", "verification", "towards", "approach",
+        "network", "language", "kernel", "scalable", "learning", "data",
+        "storage", "operating", "secure", "adaptive", "framework", "graph"]
+
+Surnames = ["Smith", "Miller", "Schmidt", "Meyer", "Lee", "Wang", "Garcia",
+        "Nguyen", "Kowalski", "Rossi", "Dubois", "Jensen", "Tanaka", "Silva"]
+
+Forenames = ["Anna", "Bernd", "Chen", "David", "Eva", "Frank", "Gita", "Hugo",
+        "Ines", "Jan", "Kim", "Lars", "Maria", "Nils", "Olga", "Paul"]
+
+EntryTypes = ["article", "book", "inproceedings", "incollection", "misc",
+        "phdthesis", "techreport"]
+
+Environments = ["figure", "table", "lstlisting"]
+
+
+def _Sentence(rng, minimum, maximum):
+    """
+    Generate a random sentence.
+
+    :param rng: The random number generator.
+    :type rng: random.Random
+    :param minimum: The minimum number of words.
+    :type minimum: int
+    :param maximum: The maximum number of words.
+    :type maximum: int
+    :rtype: str
+    :return: The sentence.
+    """
+    return " ".join(rng.choice(Words)
+            for _ in range(rng.randint(minimum, maximum))).capitalize()
+
+
+# Unusually formatted entries. Each one gets the type, the key, the author
+# and the title.
+IrregularEntries = [
+    # Values in quotes and braces within the values.
+    '@{0}{{{1},\n  author = "{2}",\n  title = "{{{3}}} with {{TeX}}",\n}}\n',
+    # Values spanning several lines.
+    '@{0}{{{1},\n  author = {{{2}}},\n  title = {{{3}\n     continued}},\n'
+        '}}\n',
+    # Values spanning several lines which end with a comma.
+    '@{0}{{{1},\n  author = {{{2}}},\n  title = {{{3},\n     continued}},\n'
+        '}}\n',
+    # Alternative name of the author field, upper case type and no comma
+    # after the last field.
+    '@{0}{{{1},\n  AUTHORS = {{{2}}},\n  Title = {{{{{3}}}}}\n}}\n',
+    # Macros and concatenations.
+    '@{0}{{{1},\n  author = {{{2}}},\n  title = jour # " {3}",\n}}\n',
+    '@{0}{{{1},\n  author = me,\n  title = {{{3}}},\n}}\n',
+    # All fields on a single line.
+    '@{0}{{{1}, author = {{{2}}}, title = {{{3}}}}}\n',
+    # Other fields with special content and an empty title.
+    '@{0}{{{1},\n  abstract = {{A, {{b}},\n c = d}},\n  author = {{{2}}},\n'
+        '  title = {{}},\n}}\n',
+    # Types which bibtexparser ignores and entries without fields.
+    '@online{{{1},\n  author = {{{2}}},\n  title = {{{3}}},\n}}\n',
+    '@{0}{{{1},\n}}\n',
+    # Text between the entries.
+    '% A comment\n@{0}{{{1},\n  author = {{{2}}},\n  title = {{{3}}},\n}}\n'
+        'Some text = {{x}}\n'
+]
+
+
+def GenerateBibliography(entries, authors = 200, seed = 0, irregular = 0.0):
+    """
+    Generate the content of a synthetic Bibtex database.
+
+    :param entries: The number of entries in the database.
+    :type entries: int
+    :param authors: The number of distinct authors used by the entries.
+    :type authors: int
+    :param seed: The seed for the random number generator. (Defaults to 0)
+    :type seed: int
+    :param irregular: The fraction of entries which are formatted unusually,
+                      use macros, or are no valid citations. (Defaults to 0.0)
+    :type irregular: float
+    :rtype: str
+    :return: The content of the database.
+    """
+    rng = random.Random(seed)
+
+    people = ["{}, {}".format(rng.choice(Surnames), rng.choice(Forenames))
+            for _ in range(authors)]
+
+    content = []
+
+    if irregular > 0:
+        content.append('@comment{{Generated}}\n'
+                '@string{{jour = "Journal of {}"}}\n'
+                '@string{{me = {{{}}}}}\n'.format(_Sentence(rng, 1, 3),
+                    rng.choice(people)))
+
+    for i in range(entries):
+        author = " and ".join(rng.sample(people, rng.randint(1, 4)))
+        entry_type = rng.choice(EntryTypes)
+        key = "key{:06d}".format(i)
+        title = _Sentence(rng, 3, 12)
+
+        if rng.random() < irregular:
+            content.append(rng.choice(IrregularEntries).format(entry_type, key,
+                author, title))
+            continue
+
+        content.append("@{type}{{{key},\n"
+                "  author = {{{author}}},\n"
+                "  title = {{{title}}},\n"
+                "  year = {year}\n"
+                "}}\n".format(type=entry_type, key=key, author=author,
+                    title=title, year=rng.randint(1970, 2015)))
+
+    return "\n".join(content)
+
+
+def GenerateTexFile(index, sections, figures, labels, captions = True,
+        seed = 0):
+    """
+    Generate the content of a synthetic chapter of a LaTeX document.
+
+    :param index: The number of the chapter.
+    :type index: int
+    :param sections: The number of sections in the chapter.
+    :type sections: int
+    :param figures: The number of figure-like environments per section.
+    :type figures: int
+    :param labels: The number of additional labels (e.g. of equations) per
+                   section.
+    :type labels: int
+    :param captions: Whether or not the environments have captions.
+                     (Defaults to True)
+    :type captions: bool
+    :param seed: The seed for the random number generator. (Defaults to 0)
+    :type seed: int
+    :rtype: str
+    :return: The content of the chapter.
+    """
+    rng = random.Random(seed * 7919 + index)
+
+    content = ["\\chapter{{{}}}\\label{{chap:{}}}\n".format(
+        _Sentence(rng, 2, 5), index)]
+
+    for s in range(sections):
+        content.append("\\section{{{}}}\n\\label{{sec:{}:{}}}\n".format(
+            _Sentence(rng, 2, 8), index, s))
+
+        for f in range(figures):
+            environment = rng.choice(Environments)
+            prefix = environment[:3]
+
+            content.append("\\begin{{{}}}\n".format(environment))
+            if captions:
+                content.append("  \\caption{{{}}}\n".format(
+                    _Sentence(rng, 4, 16)))
+            content.append("  \\label{{{}:{}:{}:{}}}\n".format(prefix, index, s,
+                f))
+            content.append("\\end{{{}}}\n".format(environment))
+
+        for l in range(labels):
+            content.append("\\begin{{equation}}\\label{{eq:{}:{}:{}}}\n"
+                    "  a = b\n\\end{{equation}}\n".format(index, s, l))
+
+        # Some text which references the objects.
+        for _ in range(3):
+            content.append("{} \\ref{{sec:{}:{}}} \\cite{{key{:06d}}}.\n"
+                    .format(_Sentence(rng, 10, 30), index, s,
+                        rng.randint(0, 999)))
+
+    return "".join(content)
+
+
+def GenerateProject(directory, files = 20, sections = 10, figures = 3,
+        labels = 2, captions = True, entries = 2000, seed = 0):
+    """
+    Generate a synthetic LaTeX project consisting of a root document, its
+    chapters in a subdirectory and a bibliography.
+
+    :param directory: The directory where the project is created.
+    :type directory: str
+    :param files: The number of chapter files. (Defaults to 20)
+    :type files: int
+    :param sections: The number of sections per file. (Defaults to 10)
+    :type sections: int
+    :param figures: The number of figure-like environments per section.
+                    (Defaults to 3)
+    :type figures: int
+    :param labels: The number of additional labels per section.
+                   (Defaults to 2)
+    :type labels: int
+    :param captions: Whether or not the environments have captions.
+                     (Defaults to True)
+    :type captions: bool
+    :param entries: The number of entries of the bibliography.
+                    (Defaults to 2000)
+    :type entries: int
+    :param seed: The seed for the random number generator. (Defaults to 0)
+    :type seed: int
+    :rtype: str
+    :return: The path to the root document.
+    """
+    chapters = join(directory, "chapters")
+    if not isdir(chapters):
+        makedirs(chapters)
+
+    root = join(directory, "main.tex")
+
+    with open(root, "w") as f:
+        f.write("\\documentclass{book}\n\\begin{document}\n")
+        for i in range(files):
+            f.write("\\include{{chapters/chapter{}}}\n".format(i))
+        f.write("\\bibliography{refs}\n\\end{document}\n")
+
+    for i in range(files):
+        with open(join(chapters, "chapter{}.tex".format(i)), "w") as f:
+            f.write(GenerateTexFile(i, sections, figures, labels, captions,
+                seed))
+
+    with open(join(directory, "refs.bib"), "w") as f:
+        f.write(GenerateBibliography(entries, seed=seed))
+
+    return root
+
+
+###
+# Measurements.
+###
+def MeasureMemory(objects):
+    """
+    Measure the memory which is used by the given objects.
+
+    Strings which are shared between objects are only counted once.
+
+    :param objects: The objects which should be measured.
+    :type objects: list[object]
+    :rtype: int
+    :return: The number of bytes used by all objects.
+    """
+    seen = set()
+    total = 0
+
+    def count(o):
+        if id(o) in seen:
+            return 0
+
+        seen.add(id(o))
+        return sys.getsizeof(o)
+
+    for o in objects:
+        total += count(o)
+
+        if hasattr(o, "__dict__"):
+            total += count(o.__dict__)
+            values = list(o.__dict__.values())
+        else:
+            values = [getattr(o, slot, None) for cls in type(o).__mro__
+                    for slot in getattr(cls, "__slots__", ())]
+
+        for value in values:
+            if value is not None:
+                total += count(value)
+
+    return total
+
+
+def Measure(function, repeat, setup = None):
+    """
+    Measure the run time and the memory allocations of a function.
+
+    :param function: The function which should be measured.
+    :type function: () -> object
+    :param repeat: How often the function is run.
+    :type repeat: int
+    :param setup: The function which is run before each run of the measured
+                  function without being measured. (Defaults to None)
+    :type setup: () -> None
+    :rtype: dict[str,float]
+    :return: The fastest and the median run time in milliseconds, the number
+             of objects which were still alive after a run, and, if
+             tracemalloc is available, the peak of allocated memory in bytes.
+    """
+    times = []
+    peak = None
+    objects = 0
+
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+
+        gc.collect()
+        objects_before = len(gc.get_objects())
+
+        if tracemalloc is not None:
+            tracemalloc.start()
+
+        start = time.time()
+        result = function()
+        times.append((time.time() - start) * 1000.0)
+
+        if tracemalloc is not None:
+            peak = max(peak or 0, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        objects = len(gc.get_objects()) - objects_before
+        del result
+
+    times.sort()
+
+    return {
+        "min_ms" : times[0],
+        "median_ms" : times[len(times) // 2],
+        "retained_objects" : objects,
+        "peak_alloc_bytes" : peak
+    }
+
+
+class _DictCitable(object):
+    """
+    The layout of a citable object before slots and shared strings were
+    introduced: the attributes are kept in a dictionary per object and every
+    object owns its strings.
+    """
+
+    # The attributes which the citable objects had at that time.
+    Attributes = ["_label", "_title", "_short_title", "_author",
+            "_short_author", "_cite_type", "_abbreviation"]
+
+    def __init__(self, citable):
+        """
+        Constructor
+
+        :param citable: The citable object whose values are copied.
+        :type citable: TexCitable
+        """
+        for attribute in self.Attributes:
+            value = getattr(citable, attribute)
+
+            # Copy the strings, so that they are not shared any more.
+            if value is not None:
+                value = (value + " ")[:-1]
+
+            setattr(self, attribute, value)
+
+
+def BenchmarkMemory(entries):
+    """
+    Measure the memory used per citable object of a synthetic bibliography,
+    both with the current layout and with the dictionary based layout which
+    was used before.
+
+    :param entries: The number of entries in the bibliography.
+    :type entries: int
+    :rtype: dict[str,float]
+    :return: The measured values.
+    """
+    completer = TexCompleter({})
+
+    citables = completer._GetAllCitables(GenerateBibliography(entries))
+
+    total = MeasureMemory(citables)
+    baseline = MeasureMemory([_DictCitable(c) for c in citables])
+
+    return {
+        "entries" : len(citables),
+        "bytes" : total,
+        "bytes_per_entry" : float(total) / max(len(citables), 1),
+        "baseline_bytes" : baseline,
+        "baseline_bytes_per_entry" : float(baseline) / max(len(citables), 1)
+    }
+
+
+def CompareBibtexParsers(content, repeat = 1):
+    """
+    Compare the fast Bibtex scanner with bibtexparser on the given content.
+
+    :param content: The Bibtex content.
+    :type content: str
+    :param repeat: How often each parser is run. (Defaults to 1)
+    :type repeat: int
+    :rtype: dict[str,object]
+    :return: The number of citations, of entries left to bibtexparser by the
+             scanner and of differences between both results as well as the
+             keys of the differing citations and the run times of both.
+    """
+    results = {}
+
+    for name, options in [("bibtexparser", {}),
+            ("scanner", {'tex_fast_bibtex' : True})]:
+        completer = TexCompleter(options)
+
+        stage = Measure(lambda: completer._GetAllCitables(content), repeat)
+        results[name] = (completer._GetAllCitables(content), stage)
+
+    expected, slow = results["bibtexparser"]
+    found, fast = results["scanner"]
+
+    def fields(citables):
+        return sorted((c.completion(), c._title, c._author, c._cite_type)
+                for c in citables)
+
+    differences = set(fields(expected)).symmetric_difference(fields(found))
+
+    rest = TexBibtexScanner().Scan(content)[1]
+
+    return {
+        "citables" : len(expected),
+        "fallback_entries" : len(TexBibtexScanner.RecordStart.findall(rest)),
+        "differences" : len(differences),
+        "differing_keys" : sorted(set(d[0] for d in differences)),
+        "bibtexparser_ms" : slow["min_ms"],
+        "scanner_ms" : fast["min_ms"],
+        "speedup" : slow["min_ms"] / max(fast["min_ms"], 0.001)
+    }
+
+
+def BenchmarkStages(root, repeat, user_options = None):
+    """
+    Measure the stages of the completer on a project.
+
+    :param root: The path to the root document of the project.
+    :type root: str
+    :param repeat: How often each stage is run.
+    :type repeat: int
+    :param user_options: The options of the completer. (Defaults to None)
+    :type user_options: dict[str,object]
+    :rtype: dict[str,dict[str,float]]
+    :return: The measured values for each stage.
+    """
+    options = {
+        'min_num_of_chars_for_completion' : 1,
+        'auto_trigger' : False
+    }
+    options.update(user_options or {})
+
+    completer = TexCompleter(options)
+    request = {'filepath' : root, 'query' : ""}
+
+    tex_files = completer._GetProjectFiles(request)[1]
+    contents = []
+    for tex_file_name in tex_files:
+        with open(tex_file_name, "r") as f:
+            contents.append(f.read())
+
+    with open(join(dirname(root), "refs.bib"), "r") as f:
+        bibliography = f.read()
+
+    referables = completer._CollectReferablesInner(request)
+    citables = completer._CollectCitablesInner(request)
+    index = TexCandidateIndex(citables)
+
+    # The .aux file which LaTeX would write for the labels of the project.
+    aux = "".join("\\newlabel{{{}}}{{{{{}}}{{{}}}{{{}}}{{{}.{}}}{{}}}}\n"
+        .format(r.completion(), i + 1, i // 3 + 1, r._name, r._ref_type,
+            i + 1)
+        for i, r in enumerate(referables))
+
+    lines = [
+        ("see \\ref{", 10),
+        ("as shown by \\cite{", 19),
+        ("some ordinary text without any command", 39),
+        ("\\section{Intro}\\label{", 23)
+    ]
+
+    def should_use_now():
+        for line, column in lines:
+            completer.ShouldUseNowInner({'line_value' : line,
+                'start_column' : column})
+
+    def parse(method, contents):
+        return lambda: [method(c) for c in contents]
+
+    def cold():
+        completer._file_cache.Invalidate()
+        completer._merged = {}
+        completer._indices = {}
+        completer._bib_index.Remove(join(dirname(root), "refs.bib"))
+
+    def clear_merged():
+        completer._merged = {}
+
+    changed_bibliography = bibliography.replace("@", "@misc{changed,\n"
+            "  title = {Changed}\n}\n\n@", 1)
+
+    stages = [
+        ("project_files", lambda: completer._GetProjectFiles(request),
+            cold),
+        ("scan_document", parse(completer._ScanDocument, contents), None),
+        ("parse_aux", lambda: completer._ParseAux(aux), None),
+        ("get_all_citables", lambda: completer._GetAllCitables(bibliography),
+            None),
+        ("bib_index_update", lambda: completer._bib_index.Update("refs.bib",
+            changed_bibliography),
+            lambda: completer._bib_index.Update("refs.bib", bibliography)),
+        ("should_use_now", should_use_now, None),
+        ("merge_referables", lambda: completer._Merge(
+            (completer.Actions.Reference, dirname(root)), [referables]),
+            clear_merged),
+        ("merge_citables", lambda: completer._Merge(
+            (completer.Actions.Citation, dirname(root)), [citables]),
+            clear_merged),
+        ("build_index", lambda: TexCandidateIndex(citables), None),
+        ("query_index", lambda: index.Query("key00", 100), None),
+        ("collect_referables_cold", lambda: completer._CollectReferables(
+            request), cold),
+        ("collect_referables_warm", lambda: completer._CollectReferables(
+            request), None),
+        ("collect_citables_cold", lambda: completer._CollectCitables(
+            request), cold),
+        ("collect_citables_warm", lambda: completer._CollectCitables(
+            request), None)
+    ]
+
+    results = {}
+
+    for name, function, setup in stages:
+        results[name] = Measure(function, repeat, setup)
+
+    completer.Shutdown()
+
+    results["sizes"] = {
+        "files" : len(tex_files),
+        "tex_bytes" : sum(len(c) for c in contents),
+        "bib_bytes" : len(bibliography),
+        "referables" : len(referables),
+        "citables" : len(citables)
+    }
+
+    return results
+
+
+###
+# Run the benchmarks as script.
+###
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    options = ArgumentParser(prog="benchmark",
+            description="Benchmarks for the TeX completer")
+    options.add_argument('-f', '--files', type=int, default=20,
+            help="The number of chapter files of the synthetic project.")
+    options.add_argument('-s', '--sections', type=int, default=10,
+            help="The number of sections per file.")
+    options.add_argument('-g', '--figures', type=int, default=3,
+            help="The number of figures, tables and listings per section.")
+    options.add_argument('-l', '--labels', type=int, default=2,
+            help="The number of additional labels per section.")
+    options.add_argument('--no-captions', default=True, action='store_false',
+            dest='captions', help="Generate environments without captions.")
+    options.add_argument('-e', '--entries', type=int, default=5000,
+            help="The number of entries of the synthetic bibliography.")
+    options.add_argument('-i', '--irregular', type=float, default=0.1,
+            help="The fraction of unusually formatted entries of the "
+            "bibliography which compares the Bibtex parsers.")
+    options.add_argument('-c', '--compare', action='append', default=[],
+            metavar='FILE', help="Compare the Bibtex parsers on this "
+            "database instead of a synthetic one.")
+    options.add_argument('-r', '--repeat', type=int, default=5,
+            help="How often each stage is run.")
+    options.add_argument('-o', '--option', action='append', default=[],
+            dest='user_options', metavar='NAME=VALUE',
+            help="An option for the completer, e.g. tex_use_index=1.")
+    options.add_argument('-d', '--directory', type=str, default=None,
+            help="Keep the synthetic project in this directory.")
+    options.add_argument('-j', '--json', default=False, action='store_true',
+            help="Print the results as JSON.")
+
+    parsed_args = options.parse_args()
+
+    user_options = {}
+    for option in parsed_args.user_options:
+        name, _, value = option.partition("=")
+        user_options[name] = int(value) if value.isdigit() else value
+
+    directory = parsed_args.directory or tempfile.mkdtemp(prefix="ycmtex-")
+
+    try:
+        root = GenerateProject(directory, parsed_args.files,
+                parsed_args.sections, parsed_args.figures, parsed_args.labels,
+                parsed_args.captions, parsed_args.entries)
+
+        results = BenchmarkStages(root, parsed_args.repeat, user_options)
+        results["memory"] = BenchmarkMemory(parsed_args.entries)
+
+        corpus = []
+        for file_name in parsed_args.compare:
+            with open(file_name, "r") as f:
+                corpus.append(f.read())
+
+        if not corpus:
+            corpus.append(GenerateBibliography(parsed_args.entries,
+                irregular=parsed_args.irregular))
+
+        results["bibtex_scanner"] = CompareBibtexParsers("\n".join(corpus),
+                parsed_args.repeat)
+        results["python"] = sys.version.split()[0]
+        if resource is not None:
+            results["max_rss_kb"] = resource.getrusage(
+                    resource.RUSAGE_SELF).ru_maxrss
+    finally:
+        if parsed_args.directory is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if parsed_args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print("Project: {files} files ({tex_bytes} bytes), {referables} "
+                "labels, {citables} citations ({bib_bytes} bytes)".format(
+                    **results["sizes"]))
+        print("Citables: {bytes_per_entry:.1f} bytes per entry "
+                "({baseline_bytes_per_entry:.1f} with dictionaries)".format(
+            **results["memory"]))
+        print("Bibtex scanner: {citables} citations, {fallback_entries} "
+                "entries left to bibtexparser, {differences} differences, "
+                "{speedup:.1f}x faster".format(**results["bibtex_scanner"]))
+        print("")
+        print("{:<28} {:>12} {:>12} {:>10} {:>14}".format("Stage", "min [ms]",
+            "median [ms]", "objects", "peak [bytes]"))
+
+        for name in sorted(results):
+            if not isinstance(results[name], dict) or \
+                    "min_ms" not in results[name]:
+                continue
+
+            stage = results[name]
+            print("{:<28} {:>12.2f} {:>12.2f} {:>10} {:>14}".format(name,
+                stage["min_ms"], stage["median_ms"],
+                stage["retained_objects"],
+                "-" if stage["peak_alloc_bytes"] is None else
+                    stage["peak_alloc_bytes"]))
+
+# vim: ft=python tw=80 expandtab tabstop=4
@@ -0,0 +1,1275 @@
+#!/usr/bin/env python2
+#
+# TexCompleter - Semantic completer for YouCompleteMe which handles Tex files.
+# Copyright (C) 2015 Till Smejkal <till.smejkal@ossmail.de>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+###
+# Standard library imports.
+###
+from os import environ, makedirs, pathsep, rename, stat, symlink, utime
+from os.path import abspath, dirname, expanduser, isdir, join, realpath
+
+import io
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+###
+# Completer imports.
+###
+# The benchmark makes the completer importable without an installation of
+# ycmd and generates the synthetic projects.
+sys.path.insert(0, dirname(abspath(__file__)))
+from benchmark import GenerateBibliography, GenerateProject
+from tex_completer import TexBibtexScanner, TexCandidateIndex, TexCompleter, \
+        TexFileCache, TexProjectWatcher, TexReferable, TexStatistics
+import tex_completer
+
+
+class TexTestCase(unittest.TestCase):
+    """
+    Base class for tests which run on a synthetic project in a temporary
+    directory.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="ycmtex-test-")
+        self.root = GenerateProject(self.directory, files = 5, sections = 2,
+                figures = 1, labels = 1, entries = 50)
+        self.chapter = join(self.directory, "chapters", "chapter3.tex")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def Write(self, file_name, content):
+        """
+        Replace the content of a file and move its modification time forward,
+        so that the change is noticed regardless of the resolution of the
+        file system's time stamps.
+        """
+        mtime = stat(file_name).st_mtime
+
+        with io.open(file_name, "w", encoding="utf-8") as f:
+            f.write(content)
+
+        utime(file_name, (mtime + 10, mtime + 10))
+
+    def Read(self, file_name):
+        with io.open(file_name, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def Request(self, file_name = None, query = "", file_data = None):
+        """
+        Build the data of a request for the completion of references.
+        """
+        return {
+            'filepath' : file_name or self.chapter,
+            'query' : query,
+            'line_value' : "see \\ref{",
+            'start_column' : 10,
+            'file_data' : file_data or {}
+        }
+
+    def Completer(self, **user_options):
+        completer = TexCompleter(user_options)
+        self.addCleanup(completer.Shutdown)
+
+        return completer
+
+    def Labels(self, candidates):
+        return set(c['insertion_text'] for c in candidates)
+
+
+class TexFileCacheTest(TexTestCase):
+
+    def setUp(self):
+        super(TexFileCacheTest, self).setUp()
+        self.parsed = []
+
+    def Parse(self, content):
+        self.parsed.append(content)
+        return len(content)
+
+    def test_unchanged_file_is_parsed_once(self):
+        cache = TexFileCache()
+
+        self.assertEqual(cache.Get(self.chapter, "length", self.Parse),
+                len(self.Read(self.chapter)))
+        cache.Get(self.chapter, "length", self.Parse)
+
+        self.assertEqual(len(self.parsed), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_changed_file_is_parsed_again(self):
+        cache = TexFileCache()
+        cache.Get(self.chapter, "length", self.Parse)
+
+        self.Write(self.chapter, "changed")
+
+        self.assertEqual(cache.Get(self.chapter, "length", self.Parse), 7)
+        self.assertEqual(cache.misses, 2)
+
+    def test_kinds_are_cached_independently(self):
+        cache = TexFileCache()
+        cache.Get(self.chapter, "length", self.Parse)
+        cache.Get(self.chapter, "other", self.Parse)
+
+        self.assertEqual(len(self.parsed), 2)
+
+    def test_hash_detects_changes_of_equal_size_and_time(self):
+        content = self.Read(self.chapter)
+        mtime = stat(self.chapter).st_mtime
+
+        cache = TexFileCache(use_hash = True)
+        cache.Get(self.chapter, "content", lambda c: c)
+
+        changed = "X" + content[1:]
+        with open(self.chapter, "w") as f:
+            f.write(changed)
+        utime(self.chapter, (mtime, mtime))
+
+        self.assertEqual(cache.Get(self.chapter, "content", lambda c: c),
+                changed)
+
+        # Without the hash, the change is not noticed.
+        cache = TexFileCache()
+        cache.Get(self.chapter, "content", lambda c: c)
+
+        with open(self.chapter, "w") as f:
+            f.write(content)
+        utime(self.chapter, (mtime, mtime))
+
+        self.assertEqual(cache.Get(self.chapter, "content", lambda c: c),
+                changed)
+
+    def test_invalidate_drops_results(self):
+        cache = TexFileCache()
+        cache.Get(self.chapter, "length", self.Parse)
+        cache.Get(self.root, "length", self.Parse)
+
+        cache.Invalidate(self.chapter)
+        self.assertEqual(len(cache), 1)
+
+        cache.Get(self.chapter, "length", self.Parse)
+        self.assertEqual(len(self.parsed), 3)
+
+        cache.Invalidate()
+        self.assertEqual(len(cache), 0)
+
+    def test_refresh_parses_changed_files_only(self):
+        cache = TexFileCache()
+        cache.Get(self.chapter, "length", self.Parse)
+
+        cache.Refresh(self.chapter)
+        self.assertEqual(len(self.parsed), 1)
+
+        self.Write(self.chapter, "changed")
+        cache.Refresh(self.chapter)
+        self.assertEqual(self.parsed[-1], "changed")
+
+    def test_trusted_results_skip_the_file(self):
+        cache = TexFileCache()
+        cache.validate = False
+        cache.Get(self.chapter, "length", self.Parse)
+
+        self.Write(self.chapter, "changed")
+
+        self.assertNotEqual(cache.Get(self.chapter, "length", self.Parse), 7)
+        self.assertEqual(len(self.parsed), 1)
+
+    def test_buffers_take_precedence(self):
+        cache = TexFileCache()
+        cache.Get(self.chapter, "length", self.Parse)
+
+        with cache.Buffers({self.chapter : (b"hash", "unsaved")}):
+            self.assertEqual(cache.Get(self.chapter, "length", self.Parse), 7)
+            cache.Get(self.chapter, "length", self.Parse)
+
+        self.assertEqual(len(self.parsed), 2)
+
+    def test_undecodable_bytes_are_replaced(self):
+        with open(self.chapter, "wb") as f:
+            f.write(u"\\section{\u00dcbersicht}".encode("latin-1"))
+
+        self.assertEqual(TexFileCache().Get(self.chapter, "content",
+            lambda c: c), u"\\section{\ufffdbersicht}")
+
+
+class TexCompleterCacheTest(TexTestCase):
+
+    def test_second_request_parses_nothing(self):
+        completer = self.Completer()
+
+        candidates = completer.ComputeCandidatesInner(self.Request())
+        misses = completer._file_cache.misses
+
+        self.assertIn("sec:3:1", self.Labels(candidates))
+        self.assertEqual(completer.ComputeCandidatesInner(self.Request()),
+                candidates)
+        self.assertEqual(completer._file_cache.misses, misses)
+
+    def test_changed_file_is_scanned_again(self):
+        completer = self.Completer()
+        completer.ComputeCandidatesInner(self.Request())
+        misses = completer._file_cache.misses
+
+        self.Write(self.chapter, self.Read(self.chapter) +
+                "\\label{added}\n")
+
+        candidates = completer.ComputeCandidatesInner(self.Request())
+
+        self.assertIn("added", self.Labels(candidates))
+        self.assertEqual(completer._file_cache.misses, misses + 1)
+
+    def test_removed_label_disappears(self):
+        completer = self.Completer()
+        completer.ComputeCandidatesInner(self.Request())
+
+        self.Write(self.chapter, self.Read(self.chapter).replace(
+            "\\label{sec:3:1}", ""))
+
+        self.assertNotIn("sec:3:1", self.Labels(
+            completer.ComputeCandidatesInner(self.Request())))
+
+    def test_file_in_latin1_is_completed(self):
+        content = self.Read(self.chapter) + u"\\section{\u00dcbersicht}" \
+                u"\\label{sec:latin}\n"
+
+        with open(self.chapter, "wb") as f:
+            f.write(content.encode("latin-1"))
+
+        candidates = self.Completer().ComputeCandidatesInner(self.Request())
+
+        self.assertIn("sec:latin", self.Labels(candidates))
+        self.assertIn("sec:3:1", self.Labels(candidates))
+
+    def test_changed_bibliography_is_indexed_again(self):
+        bibliography = join(self.directory, "refs.bib")
+        request = dict(self.Request(), line_value = "see \\cite{",
+                start_column = 11)
+
+        completer = self.Completer()
+        self.assertIn("key000001", self.Labels(
+            completer.ComputeCandidatesInner(request)))
+        parsed = completer._bib_index.parsed
+
+        self.Write(bibliography, self.Read(bibliography) +
+                "\n@misc{added,\n  title = {Added}\n}\n")
+
+        labels = self.Labels(completer.ComputeCandidatesInner(request))
+
+        self.assertIn("added", labels)
+        self.assertIn("key000001", labels)
+        self.assertLess(completer._bib_index.parsed - parsed, 50)
+
+
+class TexScriptedBackend(object):
+    """
+    Watcher backend which reports a fixed sequence of changes and nothing
+    afterwards.
+    """
+
+    def __init__(self, changes):
+        self.changes = list(changes)
+
+    def Read(self, timeout):
+        if self.changes:
+            return self.changes.pop(0)
+
+        time.sleep(timeout)
+        return set()
+
+    def Close(self):
+        pass
+
+
+class TexWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.changes = []
+        self.lost = 0
+        self.reported = threading.Event()
+
+    def OnChange(self, paths):
+        self.changes.append(paths)
+        self.reported.set()
+
+    def OnLost(self):
+        self.lost += 1
+
+    def Watcher(self, backend = None, debounce = 0.2):
+        watcher = TexProjectWatcher(self.OnChange, self.OnLost,
+                debounce = debounce, interval = 0.05)
+
+        if backend is not None:
+            watcher._backend = backend
+
+        self.addCleanup(watcher.Stop, 5)
+        watcher.start()
+
+        return watcher
+
+    def test_burst_of_changes_is_reported_at_once(self):
+        self.Watcher(TexScriptedBackend([set(["a"]), set(["b"]), set(),
+            set(["a", "c"])]))
+
+        self.assertTrue(self.reported.wait(5))
+        time.sleep(0.5)
+
+        self.assertEqual(self.changes, [set(["a", "b", "c"])])
+        self.assertEqual(self.lost, 0)
+
+    def test_lost_changes_are_reported_right_away_and_when_calm(self):
+        self.Watcher(TexScriptedBackend([set(["a"]), None, set(["b"]), None]))
+
+        self.assertTrue(self.reported.wait(5))
+        time.sleep(0.5)
+
+        self.assertEqual(self.changes, [None])
+        self.assertEqual(self.lost, 1)
+
+    def test_polling_is_used_without_inotify(self):
+        def unavailable():
+            raise OSError("inotify is not available")
+
+        original = tex_completer._InotifyBackend
+        tex_completer._InotifyBackend = unavailable
+        self.addCleanup(setattr, tex_completer, "_InotifyBackend", original)
+
+        directory = tempfile.mkdtemp(prefix="ycmtex-test-")
+        self.addCleanup(shutil.rmtree, directory, True)
+        file_name = join(directory, "main.tex")
+
+        watcher = self.Watcher(debounce = 0.05)
+        watcher.Watch(directory)
+
+        self.assertIsInstance(watcher._backend,
+                tex_completer._PollingBackend)
+
+        with open(file_name, "w") as f:
+            f.write("\\label{a}\n")
+
+        self.assertTrue(self.reported.wait(5))
+        self.assertEqual(self.changes, [set([file_name])])
+
+
+class TexWatchedCompleterTest(TexTestCase):
+
+    def Completer(self, **user_options):
+        return super(TexWatchedCompleterTest, self).Completer(
+                tex_watch_project = True, tex_watch_debounce = 0.05,
+                **user_options)
+
+    def test_files_are_not_checked_while_watched(self):
+        completer = self.Completer()
+        completer.ComputeCandidatesInner(self.Request())
+
+        # Without an event of the watcher, the parsed information is trusted.
+        completer._watcher.Stop(5)
+
+        with open(self.chapter, "a") as f:
+            f.write("\\label{unnoticed}\n")
+
+        self.assertNotIn("unnoticed", self.Labels(
+            completer.ComputeCandidatesInner(self.Request())))
+
+        completer._OnFilesChanged(set([self.chapter]))
+
+        self.assertIn("unnoticed", self.Labels(
+            completer.ComputeCandidatesInner(self.Request())))
+
+    def test_changed_file_is_noticed(self):
+        completer = self.Completer()
+        completer.ComputeCandidatesInner(self.Request())
+
+        self.Write(self.chapter, self.Read(self.chapter) +
+                "\\label{added}\n")
+
+        deadline = time.time() + 5
+        while time.time() < deadline and "added" not in self.Labels(
+                completer.ComputeCandidatesInner(self.Request())):
+            time.sleep(0.05)
+
+        self.assertIn("added", self.Labels(
+            completer.ComputeCandidatesInner(self.Request())))
+
+    def test_lost_changes_check_all_files_until_refreshed(self):
+        completer = self.Completer()
+        completer.ComputeCandidatesInner(self.Request())
+        completer._watcher.Stop(5)
+
+        completer._OnChangesLost()
+        self.assertTrue(completer._file_cache.validate)
+
+        self.Write(self.chapter, self.Read(self.chapter) +
+                "\\label{added}\n")
+        self.assertIn("added", self.Labels(
+            completer.ComputeCandidatesInner(self.Request())))
+
+        completer._OnFilesChanged(None)
+        self.assertFalse(completer._file_cache.validate)
+
+
+class TexWorkerTest(TexTestCase):
+
+    def test_small_batches_are_parsed_without_workers(self):
+        completer = self.Completer()
+        completer._workers = 2
+
+        contents = [self.Read(self.root), self.Read(self.chapter)]
+        documents = completer._ParseMany("_ScanDocument", contents)
+
+        self.assertIsNone(completer._pool)
+        self.assertEqual([d.structure for d in documents],
+                [completer._ScanDocument(c).structure for c in contents])
+
+    def test_workers_only_parse(self):
+        completer = self.Completer(tex_parse_workers = 2, tex_async = True,
+                tex_snapshot_dir = join(self.directory, "snapshots"),
+                tex_watch_project = True, tex_diagnostics = True)
+
+        worker = self.Completer(**completer._worker_options)
+
+        self.assertEqual(worker._workers, 0)
+        self.assertIsNone(worker._snapshot_writer)
+        self.assertFalse(worker._async)
+        self.assertFalse(worker._diagnostics)
+        self.assertIsNone(worker._watcher)
+
+
+class TexRootTest(TexTestCase):
+
+    def test_root_in_the_parent_directory_is_found(self):
+        labels = self.Labels(self.Completer().ComputeCandidatesInner(
+            self.Request()))
+
+        self.assertIn("sec:0:1", labels)
+        self.assertIn("sec:3:1", labels)
+
+    def test_root_comment_is_followed(self):
+        notes = join(self.directory, "notes")
+        makedirs(notes)
+
+        note = join(notes, "note.tex")
+        with open(note, "w") as f:
+            f.write("%!TEX root = ../main.tex\n\\label{note}\n")
+
+        labels = self.Labels(self.Completer().ComputeCandidatesInner(
+            self.Request(note)))
+
+        self.assertIn("sec:0:1", labels)
+        self.assertNotIn("note", labels)
+
+    def test_undecodable_files_do_not_break_the_search(self):
+        with open(join(self.directory, "old.tex"), "wb") as f:
+            f.write(u"\\documentclass{article}\n\u00dcbersicht\n".encode(
+                "latin-1"))
+
+        sub = join(self.directory, "sub")
+        makedirs(sub)
+
+        unrelated = join(sub, "a.tex")
+        with open(unrelated, "w") as f:
+            f.write("\\section{A}\\label{sec:a}\n")
+
+        completer = self.Completer()
+
+        self.assertEqual(self.Labels(completer.ComputeCandidatesInner(
+            self.Request(unrelated))), set(["sec:a"]))
+        self.assertIn("sec:3:1", self.Labels(
+            completer.ComputeCandidatesInner(self.Request())))
+
+
+class TexDocumentTest(TexTestCase):
+
+    def test_scan_collects_everything(self):
+        completer = self.Completer(tex_reference_commands = "vref")
+        document = completer._ScanDocument(
+            "%!TEX root = ../main.tex\n"
+            "\\input{intro}\\bibliography{a, b}\n"
+            "\\externaldocument[P-]{other}\n"
+            "\\newglossaryentry{tex}{name={\\TeX}, description={A system}}\n"
+            "\\newacronym{cpu}{CPU}{Central Processing Unit}\n"
+            "\\newcommand{\\vect}[1]{\\mathbf{#1}}\n"
+            "% \\label{commented} \\ref{commented}\n"
+            "\\section{Intro}\\label{sec:intro}\n"
+            "\\begin{figure}\\label{fig:a}\\caption{A \\ref{sec:intro}}"
+            "\\end{figure}\n"
+            "See \\vref{fig:a} and \\cite[p.~5]{k1, k2}.\n")
+
+        self.assertEqual(document.structure, ("../main.tex", False,
+            ["intro"]))
+        self.assertEqual(document.bibliographies, ["a", " b"])
+        self.assertEqual(document.externals, [("P-", "other")])
+        self.assertEqual([(g.completion(), g.extra_info(False))
+            for g in document.glossary], [
+                ("cpu", "A CPU - Central Processing Unit"),
+                ("tex", "G \\TeX")])
+        self.assertEqual([(r.completion(), r._name, r._ref_type, r.position())
+            for r in document.referables], [
+                ("fig:a", "A \\ref{sec:intro}", "figure", (9, 22)),
+                ("sec:intro", "Intro", "section", (8, 23))])
+        self.assertEqual(document.usages, [
+            (TexCompleter.Actions.Reference, "sec:intro", 9, 44),
+            (TexCompleter.Actions.Reference, "fig:a", 10, 11),
+            (TexCompleter.Actions.Citation, "k1", 10, 34),
+            (TexCompleter.Actions.Citation, "k2", 10, 38)])
+
+    def test_columns_are_counted_in_bytes(self):
+        document = self.Completer()._ScanDocument(
+                u"\u00dcber \\ref{abc}\n\u00e4\\label{x}\n")
+
+        self.assertEqual(document.usages, [
+            (TexCompleter.Actions.Reference, "abc", 1, 12)])
+        self.assertEqual(document.referables[0].position(), (2, 10))
+
+
+class TexTriggerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.completer = TexCompleter({'tex_reference_commands' : "vref"})
+        self.addCleanup(self.completer.Shutdown)
+
+    def Action(self, line, typed = ""):
+        return self.completer._GetAction({
+            'line_value' : line + typed,
+            'start_column' : len(line.encode("utf-8")) + 1
+        })
+
+    def test_references(self):
+        for line in ["\\ref{", "\\cref{a,", "\\Cref{a, b, ", "\\autoref*{",
+                "\\vref{", "see \\eqref {"]:
+            self.assertEqual(self.Action(line, "sec"),
+                    TexCompleter.Actions.Reference, line)
+
+    def test_citations(self):
+        for line in ["\\cite{", "\\cite[p.~3]{", "\\citep[see][p.~3]{a,",
+                "\\textcite*{"]:
+            self.assertEqual(self.Action(line, "kn"),
+                    TexCompleter.Actions.Citation, line)
+
+    def test_no_trigger(self):
+        for line in ["\\ref{a}", "\\section{", "\\cite[p.~3]", "ref{",
+                "\\cite[a][b][c]{", "\\refx{"]:
+            self.assertEqual(self.Action(line),
+                    TexCompleter.Actions.NoAction, line)
+
+    def test_start_column_is_counted_in_bytes(self):
+        self.assertEqual(self.Action(u"\u00dcber \\ref{", "x"),
+                TexCompleter.Actions.Reference)
+        self.assertEqual(self.Action(u"\u00e4\u00f6\u00fc \\cite{a,"),
+                TexCompleter.Actions.Citation)
+
+
+class TexGlossaryTest(TexTestCase):
+
+    def setUp(self):
+        super(TexGlossaryTest, self).setUp()
+
+        with io.open(self.chapter, "a", encoding="utf-8") as f:
+            f.write(u"\\newglossaryentry{tex}{name={\\TeX}, description={A}}\n"
+                    u"\\newacronym{cpu}{CPU}{Central Processing Unit}\n")
+
+    def Complete(self, completer, line):
+        request = self.Request()
+        request['line_value'] = line
+        request['start_column'] = len(line) + 1
+
+        return completer.ComputeCandidatesInner(request)
+
+    def test_entries_are_completed(self):
+        completer = self.Completer()
+
+        self.assertEqual(self.Labels(self.Complete(completer, "\\gls{")),
+                set(["tex", "cpu"]))
+        self.assertEqual(self.Labels(self.Complete(completer,
+            "\\Acrlong*[x]{tex,")), set(["tex", "cpu"]))
+
+    def test_entries_are_not_labels(self):
+        candidates = self.Complete(self.Completer(), "\\ref{")
+
+        self.assertNotIn("tex", self.Labels(candidates))
+        self.assertIn("sec:3:1", self.Labels(candidates))
+
+    def test_user_commands_trigger(self):
+        completer = self.Completer(tex_glossary_commands = ["myacr"])
+
+        self.assertEqual(self.Labels(self.Complete(completer, "\\myacr{")),
+                set(["tex", "cpu"]))
+
+
+class TexMergeTest(TexTestCase):
+
+    def test_duplicates_are_presented_once(self):
+        completer = self.Completer()
+        parts = [
+            [TexReferable("a", "First", "section"), TexReferable("c", "C")],
+            [TexReferable("a", "Again", "figure"), TexReferable("b", "B")],
+            [TexReferable("a", "First", "section")]]
+
+        merged = completer._Merge((TexCompleter.Actions.Reference,
+            self.directory), parts)
+
+        self.assertEqual([(o.completion(), o._name) for o in merged],
+                [("a", "Again"), ("b", "B"), ("c", "C")])
+
+    def test_unchanged_parts_are_not_merged_again(self):
+        completer = self.Completer()
+        parts = [[TexReferable("a", "A")], [TexReferable("a", "A"),
+            TexReferable("b", "B")]]
+        key = (TexCompleter.Actions.Reference, self.directory)
+
+        merged = completer._Merge(key, parts)
+
+        self.assertIs(completer._Merge(key, list(parts)), merged)
+        self.assertIsNot(completer._Merge(key, [parts[0],
+            [TexReferable("b", "B")]]), merged)
+
+    def test_label_in_two_files_is_completed_once(self):
+        self.Write(self.root, self.Read(self.root).replace(
+            "\\end{document}", "\\label{sec:3:1}\n\\end{document}"))
+
+        candidates = self.Completer().ComputeCandidatesInner(self.Request())
+
+        self.assertEqual([c['insertion_text'] for c in candidates].count(
+            "sec:3:1"), 1)
+
+
+class TexCandidateIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = TexCandidateIndex(sorted(
+            [TexReferable(label) for label in ["fig:arch", "arch:overview",
+                "sec:intro", "Sec:Upper", "fig:plot"]],
+            key = lambda o: o.completion()))
+
+    def Query(self, query, limit = 10):
+        return [o.completion() for o in self.index.Query(query, limit)]
+
+    def test_full_matches_come_first(self):
+        self.assertEqual(self.Query("arch"), ["arch:overview", "fig:arch"])
+
+    def test_query_is_case_insensitive_in_lower_case(self):
+        self.assertEqual(self.Query("sec:"), ["sec:intro", "Sec:Upper"])
+
+    def test_upper_case_makes_the_query_case_sensitive(self):
+        self.assertEqual(self.Query("Sec:"), ["Sec:Upper"])
+
+    def test_limit_is_respected(self):
+        self.assertEqual(self.Query("fig:", 1), ["fig:arch"])
+
+
+class TexRegistryTest(TexTestCase):
+
+    def test_least_recently_used_project_is_evicted(self):
+        other = tempfile.mkdtemp(prefix="ycmtex-test-")
+        self.addCleanup(shutil.rmtree, other, True)
+        other_root = GenerateProject(other, files = 2, sections = 1,
+                entries = 10)
+
+        completer = self.Completer(tex_max_projects = 1)
+        completer.ComputeCandidates(self.Request())
+        completer.ComputeCandidates(self.Request(other_root))
+
+        self.assertEqual(completer._registry.evictions, 1)
+
+        # The evicted project is parsed again when it is used the next time.
+        misses = completer._file_cache.misses
+        completer.ComputeCandidates(self.Request())
+
+        self.assertGreater(completer._file_cache.misses, misses)
+
+
+class TexLocationTest(TexTestCase):
+
+    def Request(self, line):
+        # Like ycmd, the column of the cursor is counted in bytes.
+        return {
+            'filepath' : self.chapter,
+            'line_value' : line,
+            'column_num' : len(line[:line.index("{") + 1].encode("utf-8")) + 1,
+            'file_data' : {}
+        }
+
+    def test_definition_is_found(self):
+        location = self.Completer()._GoToDefinition(self.Request(
+            "see \\ref{sec:3:0}"))
+
+        self.assertEqual((location['filepath'], location['line_num']),
+                (self.chapter, 3))
+
+    def test_all_usages_are_found(self):
+        locations = self.Completer()._GoToReferences(self.Request(
+            "see \\ref{sec:3:0}"))
+
+        self.assertEqual(len(locations), self.Read(self.chapter).count(
+            "\\ref{sec:3:0}"))
+
+    def test_missing_definition_is_an_error(self):
+        self.assertRaises(RuntimeError, self.Completer()._GoToDefinition,
+                self.Request("see \\ref{missing}"))
+
+    def test_columns_are_counted_in_bytes(self):
+        lines = self.Read(self.chapter).count("\n")
+        self.Write(self.chapter, self.Read(self.chapter) +
+                u"\u00dcber \\label{umlaut} \u00e4 \\ref{umlaut}\n")
+
+        completer = self.Completer()
+        request = self.Request(u"\u00c4 \\ref{umlaut}")
+
+        location = completer._GoToDefinition(request)
+        self.assertEqual((location['line_num'], location['column_num']),
+                (lines + 1, 14))
+
+        location, = completer._GoToReferences(request)
+        self.assertEqual((location['line_num'], location['column_num']),
+                (lines + 1, 30))
+
+
+class TexDiagnosticsTest(TexTestCase):
+
+    def Problems(self, completer, text):
+        request = {'filepath' : self.chapter, 'file_data' : {}}
+
+        return [d for d in completer.OnFileReadyToParse(request)
+                if text in d['text']]
+
+    def test_undefined_reference_is_reported(self):
+        completer = self.Completer(tex_diagnostics = True)
+
+        self.assertEqual(self.Problems(completer, "'missing'"), [])
+
+        self.Write(self.chapter, self.Read(self.chapter) +
+                "\\ref{missing}\n")
+
+        problems = self.Problems(completer, "'missing'")
+        self.assertEqual([d['kind'] for d in problems], ["ERROR"])
+
+    def test_duplicate_label_is_reported(self):
+        completer = self.Completer(tex_diagnostics = True)
+
+        self.Write(self.chapter, self.Read(self.chapter) +
+                "\\label{sec:3:0}\n")
+
+        problems = self.Problems(completer, "'sec:3:0' is defined 2 times")
+        self.assertEqual([d['kind'] for d in problems], ["WARNING"] * 2)
+
+    def test_range_is_counted_in_bytes(self):
+        completer = self.Completer(tex_diagnostics = True)
+
+        self.Write(self.chapter, self.Read(self.chapter) +
+                u"\u00dc \\ref{f\u00fcr}\n")
+
+        problem, = self.Problems(completer, u"'f\u00fcr'")
+        extent = problem['location_extent']
+
+        self.assertEqual((extent.start_.column_number_,
+            extent.end_.column_number_), (9, 13))
+
+
+class TexAuxTest(TexTestCase):
+
+    def setUp(self):
+        super(TexAuxTest, self).setUp()
+
+        self.WriteAux(join(self.directory, "main.aux"),
+                "\\relax\n"
+                "\\@input{chapters/chapter3.aux}\n"
+                "\\newlabel{fig:3:0:0}{{1.1}{2}{A figure}{figure.caption.1}{}}\n"
+                "\\newlabel{removed}{{9}{9}{Gone}{section.9}{}}\n")
+        self.WriteAux(join(self.directory, "chapters", "chapter3.aux"),
+                "\\newlabel{sec:3:1}{{\\relax 3.2}{7}{Second}{section.3.2}{}}\n"
+                "\\newlabel{sec:3:1@cref}{{[section][2][3]3.2}{[1][7][]7}}\n")
+
+    def WriteAux(self, file_name, content):
+        if not isdir(dirname(file_name)):
+            makedirs(dirname(file_name))
+
+        with io.open(file_name, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def Candidates(self, completer):
+        return dict((c['insertion_text'], c.get('extra_menu_info')) for c in
+                completer.ComputeCandidatesInner(self.Request()))
+
+    def test_aux_is_parsed(self):
+        labels, inputs = self.Completer()._ParseAux(
+                "\\relax\n"
+                "\\@input{intro.aux}\n"
+                "\\newlabel{sec:a}{{1.2}{3}{Intro}{section.1.2}{}}\n"
+                "\\newlabel{eq:a}{{\\relax 4}{5}{}{AMS.7}{}}\n"
+                "\\newlabel{plain}{{2}{6}}\n"
+                "\\newlabel{sec:a@cref}{{[section][2][1]1.2}{[1][3][]3}}\n")
+
+        self.assertEqual(inputs, ["intro.aux"])
+        self.assertEqual(labels, [
+            ("sec:a", "1.2", "Intro", "section", 3, 11),
+            ("eq:a", "4", None, "equation", 4, 11),
+            ("plain", "2", None, "unknown", 5, 11)])
+
+    def test_numbers_are_shown(self):
+        candidates = self.Candidates(self.Completer(tex_use_aux = True))
+
+        self.assertIn("Fig. 1.1", candidates["fig:3:0:0"])
+        self.assertIn("Sec. 3.2", candidates["sec:3:1"])
+        self.assertNotIn("removed", candidates)
+
+    def test_numbers_are_not_shown_by_default(self):
+        candidates = self.Candidates(self.Completer())
+
+        self.assertNotIn("1.1", candidates["fig:3:0:0"])
+        self.assertNotIn("3.2", candidates["sec:3:1"])
+
+    def test_changed_aux_is_read_again(self):
+        completer = self.Completer(tex_use_aux = True)
+        self.Candidates(completer)
+
+        main = join(self.directory, "main.aux")
+        self.Write(main, self.Read(main).replace("{1.1}", "{1.4}"))
+
+        self.assertIn("Fig. 1.4", self.Candidates(completer)["fig:3:0:0"])
+
+    def test_labels_of_external_documents_are_prefixed(self):
+        self.Write(self.root, self.Read(self.root).replace(
+            "\\begin{document}", "\\externaldocument[P-]{other/book}\n"
+            "\\begin{document}"))
+        self.WriteAux(join(self.directory, "other", "book.aux"),
+                "\\@input{part.aux}\n"
+                "\\newlabel{sec:b}{{3.2}{4}{Background}{section.3.2}{}}\n")
+        self.WriteAux(join(self.directory, "other", "part.aux"),
+                "\\newlabel{fig:c}{{1.1}{5}{Setup}{figure.caption.2}{}}\n")
+
+        candidates = self.Candidates(self.Completer(tex_use_aux = True))
+
+        self.assertEqual(candidates["P-sec:b"], "S Sec. 3.2 Background")
+        self.assertEqual(candidates["P-fig:c"], "F Fig. 1.1 Setup")
+        self.assertNotIn("sec:b", candidates)
+        self.assertIn("sec:3:1", candidates)
+
+
+class TexStatisticsTest(TexTestCase):
+
+    def test_durations_are_summarized(self):
+        statistics = TexStatistics()
+
+        for duration in [0.5] * 8 + [3, 7000]:
+            statistics.Record("stage", duration)
+
+        statistics.Count("things")
+        statistics.Count("things", 2)
+
+        self.assertEqual(statistics.Report(), [
+            "stage: 10 times, mean 700.7 ms, p50 <1 ms, p90 <5 ms, "
+                "p99 >5000 ms, max 7000.0 ms",
+            "things: 3"])
+
+    def test_request_collects_its_breakdown(self):
+        statistics = TexStatistics()
+        statistics.Count("before")
+
+        with statistics.Request() as breakdown:
+            statistics.Count("files", 2)
+            statistics.Record("parsing", 1.5)
+
+        statistics.Count("after")
+
+        self.assertEqual(sorted(breakdown), ["files", "parsing [ms]",
+            "request [ms]"])
+        self.assertEqual(breakdown["files"], 2)
+        self.assertEqual(breakdown["parsing [ms]"], 1.5)
+
+    def test_debug_info_shows_the_requests(self):
+        completer = self.Completer()
+        candidates = completer.ComputeCandidatesInner(self.Request())
+        completer.ComputeCandidatesInner(self.Request())
+
+        lines = completer.DebugInfo(self.Request()).split("\n")
+
+        self.assertTrue(any(l.startswith("  File cache: 6 entries, ") and
+            " 6 misses " in l for l in lines))
+        self.assertIn("  candidates returned: {}".format(
+            2 * len(candidates)), lines)
+        self.assertIn("  tex-files scanned: 12", lines)
+        self.assertTrue(any(l.startswith("  request: 2 times, mean ")
+            for l in lines))
+        self.assertTrue(any(l.startswith("  parsing document: 6 times, ")
+            for l in lines))
+
+    def test_slow_requests_are_logged(self):
+        completer = self.Completer(tex_slow_request_threshold = 1e-6)
+
+        with self.assertLogs("tex_completer", "WARNING") as logs:
+            completer.ComputeCandidatesInner(self.Request())
+
+        self.assertIn("Slow request for " + self.chapter, logs.output[0])
+        self.assertIn("tex-files scanned 6", logs.output[0])
+
+
+class TexBibtexScannerTest(unittest.TestCase):
+
+    # Entries which the scanner must either understand exactly like
+    # bibtexparser or leave to it.
+    Unusual = (
+        '@string{jour = "Journal of Things"}\n'
+        '@STRING(pub = {Some {Nested} Publisher})\n'
+        '@preamble{"\\newcommand{\\noopsort}[1]{}"}\n'
+        '@comment{ignored @article{fake, title={Fake}} }\n'
+        '@article{concat,\n'
+        '  author = {Smith, Anna and Lee, Kim},\n'
+        '  title = "Part one" # " and " # jour,\n'
+        '}\n'
+        '@book(paren,\n'
+        '  author = "Miller, Hugo",\n'
+        '  title = {A {Nested {Deeply}} Title},\n'
+        '  publisher = pub\n'
+        ')\n'
+        '@inproceedings{nested,\n'
+        '  title = {{The {TeX}book} revisited},\n'
+        '  author = {{Acme Inc.}}\n'
+        '}\n'
+        '@misc{macro, title = jour, author = pub}\n'
+        '@Article{upper, Author = {Wang, Chen}, Title = {Upper case}}\n'
+        '@article{number, title = 2015, author = {N}}\n'
+        '@online{online, title = {Online}}\n')
+
+    def Citations(self, content, fast):
+        completer = TexCompleter({'tex_fast_bibtex' : fast})
+
+        return sorted((c.completion(), c._title, c._author, c._cite_type)
+                for c in completer._GetAllCitables(content))
+
+    def assertSameCitations(self, content):
+        expected = self.Citations(content, False)
+
+        self.assertTrue(expected)
+        self.assertEqual(self.Citations(content, True), expected)
+
+    def test_unusual_entries_match_bibtexparser(self):
+        self.assertSameCitations(self.Unusual)
+
+    def test_synthetic_entries_match_bibtexparser(self):
+        self.assertSameCitations(GenerateBibliography(300, irregular = 0.5,
+            seed = 1))
+
+    def test_unusual_entries_after_regular_ones(self):
+        self.assertSameCitations(GenerateBibliography(20) + self.Unusual)
+
+    def test_simple_entries_are_scanned(self):
+        content = GenerateBibliography(100)
+        entries, rest = TexBibtexScanner().Scan(content)
+
+        self.assertEqual(len(entries), 100)
+        self.assertFalse(rest.strip())
+
+    def test_entries_with_macros_are_left_to_bibtexparser(self):
+        entries, rest = TexBibtexScanner().Scan(self.Unusual)
+
+        self.assertNotIn("concat", [e.get('ID') for e in entries])
+        self.assertIn("@article{concat", rest)
+
+
+class TexBibliographySearchTest(TexTestCase):
+
+    def setUp(self):
+        super(TexBibliographySearchTest, self).setUp()
+
+        self.bibliography = join(self.directory, "refs.bib")
+        self.other = tempfile.mkdtemp(prefix="ycmtex-test-")
+        self.addCleanup(shutil.rmtree, self.other, True)
+
+    def Cite(self, completer, file_name = None):
+        request = dict(self.Request(file_name), line_value = "see \\cite{",
+                start_column = 11)
+
+        return self.Labels(completer.ComputeCandidatesInner(request))
+
+    def Project(self, bibliography):
+        """
+        Create a second project in its own directory which cites from the
+        given database.
+        """
+        root = join(self.other, "main.tex")
+
+        with io.open(root, "w", encoding="utf-8") as f:
+            f.write(u"\\documentclass{article}\n\\begin{document}\n"
+                    u"\\bibliography{" + bibliography + u"}\n"
+                    u"\\end{document}\n")
+
+        return root
+
+    def test_search_paths_are_read_like_bibinputs(self):
+        completer = self.Completer()
+
+        self.assertEqual(completer._ReadSearchPaths(pathsep.join(["a/",
+            "", " /b//c ", "/"])), ["a", "/b/c", "/"])
+        self.assertEqual(completer._ReadSearchPaths(["~/d", ""]),
+                [expanduser("~/d")])
+
+    def test_database_is_found_in_bib_paths(self):
+        rename(self.bibliography, join(self.other, "refs.bib"))
+
+        self.assertNotIn("key000001", self.Cite(self.Completer()))
+        self.assertIn("key000001", self.Cite(self.Completer(
+            tex_bib_paths = [self.other])))
+
+    def test_database_is_found_in_bibinputs(self):
+        rename(self.bibliography, join(self.other, "refs.bib"))
+
+        original = environ.get("BIBINPUTS")
+        environ["BIBINPUTS"] = pathsep.join(["", self.other + "/"])
+
+        if original is None:
+            self.addCleanup(environ.pop, "BIBINPUTS")
+        else:
+            self.addCleanup(environ.__setitem__, "BIBINPUTS", original)
+
+        self.assertIn("key000001", self.Cite(self.Completer()))
+
+    def test_local_database_comes_first(self):
+        with io.open(join(self.other, "refs.bib"), "w",
+                encoding="utf-8") as f:
+            f.write(u"@misc{elsewhere,\n  title = {Elsewhere}\n}\n")
+
+        labels = self.Cite(self.Completer(tex_bib_paths = self.other))
+
+        self.assertIn("key000001", labels)
+        self.assertNotIn("elsewhere", labels)
+
+    def test_linked_database_is_parsed_once(self):
+        symlink(self.bibliography, join(self.other, "shared.bib"))
+        root = self.Project("shared")
+
+        completer = self.Completer()
+        self.assertIn("key000001", self.Cite(completer))
+        parsed = completer._bib_index.parsed
+
+        self.assertIn("key000001", self.Cite(completer, root))
+        self.assertEqual(completer._bib_index.parsed, parsed)
+        self.assertEqual(completer._ResolveBibliography("shared", self.other),
+                realpath(self.bibliography))
+
+    def test_copied_database_is_parsed_once(self):
+        shutil.copy(self.bibliography, join(self.other, "copy.bib"))
+        root = self.Project("copy.bib")
+
+        completer = self.Completer()
+        self.assertIn("key000001", self.Cite(completer))
+        parsed = completer._bib_index.parsed
+
+        self.assertIn("key000001", self.Cite(completer, root))
+        self.assertEqual(completer._bib_index.parsed, parsed)
+
+
+class TexAsyncTest(TexTestCase):
+
+    def Completer(self, **user_options):
+        return super(TexAsyncTest, self).Completer(tex_async = True,
+                **user_options)
+
+    def Wait(self, completer):
+        """
+        Wait until all refreshes in the background finished.
+        """
+        for _ in range(1000):
+            with completer._refresh_lock:
+                if not completer._refreshes and not completer._pending:
+                    return
+
+            time.sleep(0.01)
+
+        self.fail("The refreshes did not finish.")
+
+    def Partial(self, candidates):
+        return [c.get('extra_data', {}).get('partial', False)
+                for c in candidates]
+
+    def test_finished_refresh_gives_complete_results(self):
+        completer = self.Completer(tex_async_timeout = 10)
+        candidates = completer.ComputeCandidates(self.Request())
+
+        self.assertIn("sec:3:1", self.Labels(candidates))
+        self.assertFalse(any(self.Partial(candidates)))
+
+    def test_slow_refresh_gives_partial_results(self):
+        completer = self.Completer(tex_async_timeout = 10)
+        completer.ComputeCandidates(self.Request())
+
+        # The refresh can not finish while the project is locked.
+        lock = completer._AcquireProject(self.directory)
+        completer._async_timeout = 0.01
+
+        try:
+            candidates = completer.ComputeCandidates(self.Request())
+        finally:
+            lock.release()
+
+        self.assertIn("sec:3:1", self.Labels(candidates))
+        self.assertTrue(all(self.Partial(candidates)))
+
+        completer._async_timeout = 10
+        self.assertFalse(any(self.Partial(completer.ComputeCandidates(
+            self.Request()))))
+
+    def test_superseded_refreshes_are_cancelled(self):
+        completer = self.Completer(tex_async_timeout = 0)
+        lock = completer._AcquireProject(self.directory)
+
+        try:
+            for _ in range(3):
+                self.assertEqual(completer.ComputeCandidates(self.Request()),
+                        [])
+        finally:
+            lock.release()
+
+        self.Wait(completer)
+
+        counters = completer._statistics._counters
+        self.assertEqual(counters["refreshes cancelled"], 2)
+        self.assertEqual(counters["refreshes started"], 2)
+
+        # Only the last refresh published its objects.
+        completer._async_timeout = 10
+        self.assertIn("sec:3:1", self.Labels(completer.ComputeCandidates(
+            self.Request())))
+
+    def test_query_is_left_to_ycmd_without_index(self):
+        completer = self.Completer(tex_async_timeout = 10)
+
+        self.assertEqual(completer.ComputeCandidates(self.Request(
+            query = "sec:3:")), completer.ComputeCandidates(self.Request()))
+
+    def test_query_is_filtered_by_the_index(self):
+        completer = self.Completer(tex_async_timeout = 10,
+                tex_use_index = True)
+
+        self.assertEqual(self.Labels(completer.ComputeCandidates(
+            self.Request(query = "sec:3:"))), set(["sec:3:0", "sec:3:1"]))
+
+
+class TexBufferTest(TexTestCase):
+
+    def Buffer(self, file_name, content):
+        return {file_name : {'contents' : content, 'filetypes' : ["tex"]}}
+
+    def test_dirty_buffer_is_scanned_once_per_change(self):
+        completer = self.Completer()
+        completer.ComputeCandidatesInner(self.Request())
+
+        content = self.Read(self.chapter)
+        misses = []
+
+        for i in range(4):
+            content += "\\label{{typed{}}}\n".format(i)
+
+            candidates = completer.ComputeCandidatesInner(self.Request(
+                file_data = self.Buffer(self.chapter, content)))
+
+            self.assertIn("typed{}".format(i), self.Labels(candidates))
+            misses.append(completer._file_cache.misses)
+
+        self.assertEqual([b - a for a, b in zip(misses, misses[1:])],
+                [1, 1, 1])
+
+    def test_unchanged_buffer_reuses_the_candidates(self):
+        completer = self.Completer()
+
+        request = self.Request(file_data = self.Buffer(self.chapter,
+            self.Read(self.chapter) + "\\label{typed}\n"))
+
+        completer.ComputeCandidatesInner(request)
+        misses = completer._file_cache.misses
+        merged = dict(completer._merged)
+
+        completer.ComputeCandidatesInner(request)
+
+        self.assertEqual(completer._file_cache.misses, misses)
+        self.assertTrue(all(completer._merged[k][1] is v[1]
+            for k, v in merged.items()))
+
+    def test_unsaved_root_comment_is_used(self):
+        notes = join(self.directory, "notes")
+        makedirs(notes)
+
+        note = join(notes, "note.tex")
+        with open(note, "w") as f:
+            f.write("\\label{note}\n")
+
+        completer = self.Completer()
+        self.assertNotIn("sec:0:0", self.Labels(
+            completer.ComputeCandidatesInner(self.Request(note))))
+
+        candidates = completer.ComputeCandidatesInner(self.Request(note,
+            file_data = self.Buffer(note,
+                "%!TEX root = ../main.tex\n\\label{note}\n")))
+
+        self.assertIn("sec:0:0", self.Labels(candidates))
+
+
+class TexSnapshotTest(TexTestCase):
+
+    def setUp(self):
+        super(TexSnapshotTest, self).setUp()
+        self.snapshot_dir = tempfile.mkdtemp(prefix="ycmtex-snapshots-")
+
+    def tearDown(self):
+        shutil.rmtree(self.snapshot_dir, ignore_errors=True)
+        super(TexSnapshotTest, self).tearDown()
+
+    def Restart(self, request):
+        """
+        Answer a request, shut the completer down and start a new one which
+        uses the snapshot of the first.
+        """
+        completer = TexCompleter({'tex_snapshot_dir' : self.snapshot_dir})
+        candidates = completer.ComputeCandidatesInner(request)
+        completer.Shutdown()
+
+        return (candidates, self.Completer(
+            tex_snapshot_dir = self.snapshot_dir))
+
+    def test_restart_parses_nothing(self):
+        for file_name in [self.chapter, self.root]:
+            candidates, completer = self.Restart(self.Request(file_name))
+
+            self.assertEqual(completer.ComputeCandidatesInner(self.Request(
+                file_name)), candidates)
+            self.assertEqual(completer._file_cache.misses, 0)
+
+    def test_restart_from_another_file_parses_nothing(self):
+        candidates, completer = self.Restart(self.Request(self.root))
+
+        self.assertEqual(completer.ComputeCandidatesInner(self.Request()),
+                candidates)
+        self.assertEqual(completer._file_cache.misses, 0)
+
+    def test_restart_parses_changed_files_only(self):
+        _, completer = self.Restart(self.Request())
+
+        self.Write(self.chapter, self.Read(self.chapter) +
+                "\\label{added}\n")
+
+        self.assertIn("added", self.Labels(completer.ComputeCandidatesInner(
+            self.Request())))
+        self.assertEqual(completer._file_cache.misses, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# vim: ft=python tw=80 expandtab tabstop=4
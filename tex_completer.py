@@ -21,18 +21,47 @@
 ###
 from __future__ import print_function
 
-from os.path import dirname, join, isfile, isdir, splitext
-from os import listdir
-
-from functools import total_ordering
-
+from os.path import basename, dirname, expanduser, join, isfile, isdir, \
+        normpath, realpath, splitext
+from os import environ, listdir, makedirs, pathsep, rename, stat
+from os import close as os_close, read as os_read
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import partial
+from itertools import chain
+from operator import methodcaller
+
+import bisect
+import ctypes
+import ctypes.util
+import hashlib
+import io
 import logging
+import multiprocessing
+import re
+import select
+import struct
+import sys
+import threading
+import time
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
 
 ###
 # YCMD imports.
 ###
 from ycmd.completers.completer import Completer
-from ycmd.responses import BuildCompletionData
+from ycmd.responses import BuildCompletionData, BuildDiagnosticData, \
+        BuildGoToResponse, Diagnostic, Location, Range
 from ycmd.utils import AddNearestThirdPartyFoldersToSysPath
 
 ###
@@ -45,7 +74,94 @@ import bibtexparser
 
 logger = logging.getLogger(__name__)
 
-class TexObject:
+
+def ContentHash(content):
+    """
+    Calculate the hash of the given content.
+
+    :param content: The content which should be hashed.
+    :type content: str
+    :rtype: str
+    :return: The digest of the content's hash.
+    """
+    if not isinstance(content, bytes):
+        content = content.encode("utf-8")
+
+    return hashlib.sha1(content).digest()
+
+
+def OpenText(file_name):
+    """
+    Open a file to read its text.
+
+    The content is decoded as UTF-8 regardless of the locale. Bytes which are
+    not valid UTF-8, like the umlauts of a file in Latin-1, are replaced, so
+    that a single file in another encoding can not break the completion.
+
+    :param file_name: The path to the file which should be opened.
+    :type file_name: str
+    :rtype: file
+    :return: The opened file.
+    """
+    return io.open(file_name, "r", encoding="utf-8", errors="replace")
+
+
+def ByteColumn(content, begin):
+    """
+    Get the column of a position like ycmd counts it, which is in bytes of
+    the UTF-8 encoded line and starts at 1.
+
+    :param content: The content which contains the position.
+    :type content: str
+    :param begin: The index of the character at the position.
+    :type begin: int
+    :rtype: int
+    :return: The column of the position.
+    """
+    line_start = content.rfind("\n", 0, begin) + 1
+
+    return len(content[line_start:begin].encode("utf-8")) + 1
+
+
+def CharacterIndex(line, column):
+    """
+    Get the index of the character at a column which ycmd sent.
+
+    :param line: The line which contains the column.
+    :type line: str
+    :param column: The column in bytes of the UTF-8 encoded line, starting
+                   at 1.
+    :type column: int
+    :rtype: int
+    :return: The index of the character in the line.
+    """
+    return len(line.encode("utf-8")[:column - 1].decode("utf-8", "ignore"))
+
+
+class TexObject(object):
+
+    # The objects are kept in memory in large numbers. So avoid the overhead
+    # of a dictionary per object.
+    __slots__ = ()
+
+    def __getstate__(self):
+        """
+        Get the state of the object for pickling.
+
+        :rtype: tuple
+        :return: The values of all slots of the object.
+        """
+        return tuple([getattr(self, slot) for slot in self.__slots__])
+
+    def __setstate__(self, state):
+        """
+        Restore the state of the object after unpickling.
+
+        :param state: The values of all slots of the object.
+        :type state: tuple
+        """
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
 
     def _smart_shorten(self, to_shorten, length, delta = 5):
         """
@@ -101,6 +217,18 @@ class TexObject:
         """
         raise NotImplementedError()
 
+    def sort_key(self):
+        """
+        The key by which objects of the same type are sorted.
+
+        This method must be implemented by every TeX object which the completer
+        supports.
+
+        :rtype: tuple
+        :return: The sort key of this object.
+        """
+        raise NotImplementedError()
+
     def extra_info(self, shortened = True):
         """
         The additional information for the completion which should be presented
@@ -117,10 +245,55 @@ class TexObject:
         """
         raise NotImplementedError()
 
+    def completion_data(self, shortened = True, outdated = False):
+        """
+        The completion of this object in the format which YCM understands.
+
+        The data is built only once for each variant and reused afterwards. As
+        the objects are created anew whenever their source file changes, the
+        data never gets outdated.
+
+        :param shortened: Whether or not the information text should be
+                          shortened or not. (Defaults to True)
+        :type shortened: bool
+        :param outdated: Whether or not the completion is flagged as possibly
+                         outdated or incomplete (`extra_data.partial`), so
+                         that the client requests it again. Only shortened
+                         completions are flagged. (Defaults to False)
+        :type outdated: bool
+        :rtype: dict[str,str]
+        :return: The completion data of this object.
+        """
+        if outdated:
+            if self._outdated_completion_data is None:
+                data = self.completion_data(True)
+                self._outdated_completion_data = dict(data,
+                        extra_data=dict(data.get('extra_data') or {},
+                            partial=True))
+
+            return self._outdated_completion_data
+        elif shortened:
+            if self._completion_data is None:
+                self._completion_data = BuildCompletionData(
+                        self.completion(),
+                        extra_menu_info=self.extra_info(True))
+
+            return self._completion_data
+        else:
+            if self._full_completion_data is None:
+                self._full_completion_data = BuildCompletionData(
+                        self.completion(),
+                        extra_menu_info=self.extra_info(False))
+
+            return self._full_completion_data
+
 
-@total_ordering
 class TexReferable(TexObject):
 
+    __slots__ = ("_label", "_name", "_short_name", "_ref_type",
+            "_abbreviation", "_position", "_number", "_completion_data",
+            "_full_completion_data", "_outdated_completion_data")
+
     MaxNameLength = 50
 
     AbbreviationMap = {
@@ -133,10 +306,31 @@ class TexReferable(TexObject):
             "subparagraph" : "p",
             "figure" : "F",
             "table" : "T",
-            "lstlisting" : "L"
+            "lstlisting" : "L",
+            "equation" : "E"
+    }
+
+    # The names which LaTeX documents commonly put in front of the numbers of
+    # the types.
+    NumberPrefixes = {
+            "chapter" : "Chap.",
+            "section" : "Sec.",
+            "subsection" : "Sec.",
+            "subsubsection" : "Sec.",
+            "paragraph" : "Par.",
+            "subparagraph" : "Par.",
+            "figure" : "Fig.",
+            "table" : "Tab.",
+            "lstlisting" : "List.",
+            "equation" : "Eq."
     }
 
-    def __init__(self, label, name="Unknown", ref_type="unknown"):
+    # The known type names, used to share a single string object for each
+    # type between all objects.
+    TypeNames = dict((t, t) for t in AbbreviationMap)
+
+    def __init__(self, label, name="Unknown", ref_type="unknown",
+            position=None, number=None):
         """
         Constructor
 
@@ -146,14 +340,25 @@ class TexReferable(TexObject):
         :type name: str
         :param ref_type: The type of the referable object.
         :type ref_type: str
+        :param position: The line and the column (both starting at 1) of the
+                         label in its file. (Defaults to None)
+        :type position: (int, int)
+        :param number: The number which LaTeX assigned to the object when the
+                       document was compiled the last time. (Defaults to
+                       None)
+        :type number: str
         """
         self._label = label
         self._name = name
         self._short_name = None
-        self._ref_type = ref_type
-        self._abbreviation = self.AbbreviationMap[ref_type] if \
-                self.AbbreviationMap.has_key(ref_type) else \
-                self.AbbreviationMap["unknown"]
+        self._ref_type = self.TypeNames.get(ref_type, ref_type)
+        self._abbreviation = self.AbbreviationMap.get(ref_type,
+                self.AbbreviationMap["unknown"])
+        self._position = position
+        self._number = number
+        self._completion_data = None
+        self._full_completion_data = None
+        self._outdated_completion_data = None
 
     def __eq__(self, other):
         """
@@ -174,32 +379,6 @@ class TexReferable(TexObject):
         return self._label == other._label and self._name == other._name and \
                 self._ref_type == other._ref_type
 
-    def __lt__(self, other):
-        """
-        Determine if the current object is less than the other one.
-
-        The current object is less than the other one if the label is less, or
-        if the name is less, or if the ref_type is less than the one of the
-        other object.
-
-        :param other: The object which should be tested against.
-        :type other: TexReferable
-        :rtype: bool
-        :return: Whether or not the current object is less then the other one.
-        """
-        if not isinstance(other, TexReferable):
-            raise ValueError("Less than can only be tested for objects with" +
-                    "the same type.")
-
-        if self._label != other._label:
-            return self._label < other._label
-        elif self._name != other._name:
-            return self._name < other._name
-        elif self._ref_type != other._ref_type:
-            return self._ref_type < other._ref_type
-        else:
-            return False
-
     def shorten(self, ignore_name = "Unknown"):
         """
         Shorten the name of the referable object so that it is not too long.
@@ -225,6 +404,37 @@ class TexReferable(TexObject):
         """
         return self._label
 
+    def position(self):
+        """
+        The position where the referable object is labeled in its file.
+
+        :rtype: (int, int)
+        :return: The line and the column, both starting at 1, or None if
+                 unknown.
+        """
+        return self._position
+
+    def numbered(self, number):
+        """
+        Create a copy of the referable object with the given number.
+
+        :param number: The number which LaTeX assigned to the object.
+        :type number: str
+        :rtype: TexReferable
+        :return: The numbered copy.
+        """
+        referable = TexReferable(self._label, self._name, self._ref_type,
+                self._position, number)
+        referable._short_name = self._short_name
+
+        return referable
+
+    def sort_key(self):
+        """
+        :see TexObject.sort_key:
+        """
+        return (self._label, self._name, self._ref_type)
+
     def extra_info(self, shorten = True):
         """
         :see TexObject.completion:
@@ -237,12 +447,19 @@ class TexReferable(TexObject):
         else:
             name = self._name
 
+        if self._number:
+            prefix = self.NumberPrefixes.get(self._ref_type)
+            name = (prefix + " " if prefix else "") + self._number + " " + name
+
         return self._abbreviation + " " + name
 
 
-@total_ordering
 class TexCitable(TexObject):
 
+    __slots__ = ("_label", "_title", "_short_title", "_author",
+            "_short_author", "_cite_type", "_abbreviation", "_completion_data",
+            "_full_completion_data", "_outdated_completion_data")
+
     MaxTitleLength = 45
 
     AbbreviationMap = {
@@ -264,6 +481,10 @@ class TexCitable(TexObject):
             "unpublished" : "U"
     }
 
+    # The known type names, used to share a single string object for each
+    # type between all objects.
+    TypeNames = dict((t, t) for t in AbbreviationMap)
+
     def __init__(self, label, title="Unknown", author="Unknown",
             cite_type="unknown"):
         """
@@ -284,10 +505,12 @@ class TexCitable(TexObject):
         self._short_title = None
         self._author = author
         self._short_author = None
-        self._cite_type = cite_type
-        self._abbreviation = self.AbbreviationMap[cite_type] if \
-                self.AbbreviationMap.has_key(cite_type) else \
-                self.AbbreviationMap["unknown"]
+        self._cite_type = self.TypeNames.get(cite_type, cite_type)
+        self._abbreviation = self.AbbreviationMap.get(cite_type,
+                self.AbbreviationMap["unknown"])
+        self._completion_data = None
+        self._full_completion_data = None
+        self._outdated_completion_data = None
 
     def __eq__(self, other):
         """
@@ -308,34 +531,6 @@ class TexCitable(TexObject):
         return self._label == other._label and self._title == other._title and \
                 self._author == other._author and self._cite_type == other._cite_type
 
-    def __lt__(self, other):
-        """
-        Determine if the current object is less than the other one.
-
-        The current object is less than the other one if it label is less, or if
-        the title is less, or if the author is less, or if the cite_type is less
-        than the one of the other object.
-
-        :param other: The object which should be tested against.
-        :type other: TexCitable
-        :rtype: bool
-        :return: Whether or not the current object is less then the other one.
-        """
-        if not isinstance(other, TexCitable):
-            raise ValueError("Less than can only be tested for objects with" +
-                    "the same type.")
-
-        if self._label != other._label:
-            return self._label < other._label
-        elif self._title != other._title:
-            return self._title < other._title
-        elif self._author != other._author:
-            return self._author < other._author
-        elif self._cite_type != other._cite_type:
-            return self._cite_type < other._cite_type
-        else:
-            return False
-
     def shorten(self, ignore_title = "Unknown", ignore_author = "Unknown"):
         """
         Shorten the title and the author string of the citable object so that
@@ -382,12 +577,38 @@ class TexCitable(TexObject):
 
         return self
 
+    def share(self, pool):
+        """
+        Replace the author strings of the citable object by equal ones from
+        the given pool, so that objects of the same authors share them.
+
+        Strings which are not yet in the pool are added to it.
+
+        :param pool: The strings which can be shared.
+        :type pool: dict[str,str]
+        :rtype: TexCitable
+        :return: The current object
+        """
+        self._author = pool.setdefault(self._author, self._author)
+
+        if self._short_author is not None:
+            self._short_author = pool.setdefault(self._short_author,
+                    self._short_author)
+
+        return self
+
     def completion(self):
         """
         :see TexObject.completion:
         """
         return self._label
 
+    def sort_key(self):
+        """
+        :see TexObject.sort_key:
+        """
+        return (self._label, self._title, self._author, self._cite_type)
+
     def extra_info(self, shorten = True):
         """
         :see TexObject.extra_info:
@@ -406,555 +627,5255 @@ class TexCitable(TexObject):
         return self._abbreviation + " " + author + " - " + title
 
 
-class TexCompleter(Completer):
+class TexGlossaryEntry(TexObject):
 
-    ###
-    # List of Latex commands and options known by the completer.
-    ###
-    BibliographyCommands = ["bibliography"]
-    ReferenceCommands = ["ref", "refv"]
-    CitationCommands = ["cite", "citep", "citev"]
-    SectioningCommands = ["chapter", "section", "subsection", "subsubsection",
-            "paragraph", "subparagraph"]
-    SpecialSectioningCommands = [("addchap", "chapter")]
+    __slots__ = ("_label", "_name", "_description", "_short_description",
+            "_entry_type", "_abbreviation", "_completion_data",
+            "_full_completion_data", "_outdated_completion_data")
 
-    ###
-    # List of supported VIM file types
-    ###
-    FileTypes = ["tex", "plaintex"]
+    MaxDescriptionLength = 45
 
-    ###
-    # Action which the completer supports
-    ###
-    class Actions(object):
-        NoAction = 0
-        Reference = 1
-        Citation = 2
+    AbbreviationMap = {
+            "glossary" : "G",
+            "acronym" : "A"
+    }
 
-    def __init__(self, user_options):
-        super(TexCompleter, self).__init__(user_options)
+    def __init__(self, label, name, description=None, entry_type="glossary"):
+        """
+        Constructor
 
-        self._action = self.Actions.NoAction
+        :param label: The identifier which is used to refer to the entry.
+        :type label: str
+        :param name: The name of the entry, or the short form of an acronym.
+        :type name: str
+        :param description: The long form of an acronym (or None).
+        :type description: str
+        :param entry_type: Either 'glossary' or 'acronym'. (Defaults to
+                           'glossary')
+        :type entry_type: str
+        """
+        self._label = label
+        self._name = name
+        self._description = description
+        self._short_description = None
+        self._entry_type = entry_type
+        self._abbreviation = self.AbbreviationMap[entry_type]
+        self._completion_data = None
+        self._full_completion_data = None
+        self._outdated_completion_data = None
 
-    def DebugInfo(self, request_data):
-        file_name = request_data['filepath']
+    def completion(self):
+        """
+        :see TexObject.completion:
+        """
+        return self._label
 
-        return "TeX Completer for {}".format(file_name)
+    def sort_key(self):
+        """
+        :see TexObject.sort_key:
+        """
+        return (self._label, self._name, self._entry_type)
 
-    def SupportedFiletypes(self):
-        return self.FileTypes
+    def extra_info(self, shorten = True):
+        """
+        :see TexObject.extra_info:
+        """
+        if not self._description:
+            return self._abbreviation + " " + self._name
 
-    def ShouldUseNowInner(self, request_data):
-        self._action = self.Actions.NoAction
+        if shorten:
+            if self._short_description is None:
+                self._short_description = self._smart_shorten(
+                        self._description, self.MaxDescriptionLength)
 
-        # Extract the last command
-        current_line = request_data['line_value']
-        word_start = request_data['start_column'] - 1
+            description = self._short_description
+        else:
+            description = self._description
 
-        # As according to the documentation the start_column points to the
-        # begin of the word which is currently typed, the last command ends
-        # at exactly this position.
-        last_command = current_line[:word_start]
+        return self._abbreviation + " " + self._name + " - " + description
 
-        if self._WantsReferable(last_command):
-            self._action = self.Actions.Reference
 
-            return True
+class TexDocument(object):
+    """
+    Everything the completer extracts from a single tex-file.
 
-        elif self._WantsCitable(last_command):
-            self._action = self.Actions.Citation
+    A file is read and scanned once for all kinds of information, which are
+    then shared by all kinds of completion.
+    """
 
-            return True
+    __slots__ = ("structure", "referables", "usages", "bibliographies",
+            "glossary", "externals")
 
-        return False
+    def __init__(self, structure, referables, usages, bibliographies,
+            glossary, externals):
+        """
+        Constructor
 
-    def ComputeCandidatesInner(self, request_data):
-        if self._action == self.Actions.Citation:
-            return self._CollectCitables(request_data)
-        elif self._action == self.Actions.Reference:
-            return self._CollectReferables(request_data)
+        :param structure: The root document named by a '%!TEX root' comment
+                          (or None), whether or not the file is a root
+                          document itself, and the files which it includes.
+        :type structure: (str, bool, list[str])
+        :param referables: The sorted referable objects of the file.
+        :type referables: list[TexReferable]
+        :param usages: The action, the key, the line and the column of every
+                       reference and citation.
+        :type usages: list[(int, str, int, int)]
+        :param bibliographies: The Bibtex databases named by the file.
+        :type bibliographies: list[str]
+        :param glossary: The sorted glossary entries and acronyms of the
+                         file.
+        :type glossary: list[TexGlossaryEntry]
+        :param externals: The prefix and the name of every external document
+                          whose labels can be referenced (see package xr).
+        :type externals: list[(str, str)]
+        """
+        self.structure = structure
+        self.referables = referables
+        self.usages = usages
+        self.bibliographies = bibliographies
+        self.glossary = glossary
+        self.externals = externals
+
+    def __getstate__(self):
+        """
+        Get the state of the document for pickling.
 
-        return []
+        :rtype: tuple
+        :return: The values of all slots of the document.
+        """
+        return tuple([getattr(self, slot) for slot in self.__slots__])
 
-    def _ExtractFromCommand(self, content, command_name, starable = False):
+    def __setstate__(self, state):
         """
-        Extracts the argument of a LaTeX command.
+        Restore the state of the document after unpickling.
 
-        :param content: The string where the extraction should happen.
-        :type content: str
-        :param command_name: The name of the command from which the argument
-                             should be extracted.
-        :type command_name: str
-        :param starable: Whether or not a stared version of the command exists,
-                         too. (Defaults to False)
-        :type starable: bool
-        :rtype: str
-        :return: The extracted command argument.
+        :param state: The values of all slots of the document.
+        :type state: tuple
         """
-        commands = ["\\"+command_name+"{"]
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
 
-        if starable:
-            commands.append("\\"+command_name+"*{")
 
-        for command in commands:
-            # Try to find the begin of the command in the given content.
-            begin = content.find(command)
+class TexFileCache(object):
+    """
+    Cache for the results of parsing files of a TeX project.
 
-            # The command is not in the content. Try the next one.
-            if begin == -1:
-                continue
+    Every result is stored together with the fingerprint of the file it was
+    gathered from. The fingerprint consists of the modification time and the
+    size of the file and optionally of a hash of its content. As long as the
+    fingerprint of a file does not change, the stored result is reused and the
+    file is neither read nor parsed again.
 
-            # Determine the begin and the end of the commands argument.
-            begin += len(command)
-            end = content.find("}", begin)
+    The unsaved content of files which are open in the editor can be passed
+    for the current thread. It takes precedence over the content on disk and
+    its hash is used as fingerprint.
 
-            # Extract it and remove newlines.
-            return content[begin:end].replace('\n', ' ').replace('\r', '')
+    The cache is shared by all projects and may be used by several threads at
+    the same time. Files are read and parsed without holding its lock.
+    """
 
-        return None
+    # The size of the pieces in which streamed files are read.
+    ChunkSize = 1 << 16
 
-    def _ExtractFromOption(self, content, option_name, compoundable = True):
+    def __init__(self, use_hash = False):
         """
-        Extracts the argument of an option of a command.
+        Constructor
 
-        :param content: The string where the extraction should happen.
-        :type content: str
-        :param option_name: The name of the option from which the argument
-                            should be extracted.
-        :type option_name: str
-        :param compoundable: Whether or not the argument can be enclosed by
-                             curly brackets. (Defaults to True)
-        :type compoundable: bool
-        :rtype: str
-        :return: The extracted option argument.
+        :param use_hash: Whether or not the content hash of a file should be
+                         part of its fingerprint. This detects changes which
+                         neither alter the modification time nor the size of
+                         the file, but requires to read the file on every
+                         lookup. (Defaults to False)
+        :type use_hash: bool
         """
-        option = option_name + "="
+        self._use_hash = use_hash
+        self._entries = {}
 
-        # Try to find the begin of the option.
-        begin = content.find(option)
+        # Whether or not the fingerprints of already known files are checked
+        # on every lookup. This can be disabled if somebody else takes care of
+        # refreshing changed files.
+        self.validate = True
 
-        if begin == -1:
-            # The option is not included in the given content string.
-            return None
+        # The kinds of results whose parse function gets the path to the file
+        # instead of its content, so that large files are never read at once.
+        self.streamed = set()
 
-        begin += len(option)
+        # The optional statistics which record the time spent reading and
+        # parsing files.
+        self.statistics = None
 
-        # Search for the end of the argument.
-        if compoundable and content[begin] == "{":
-            # The argument is surrounded by curly brackets. Extract it by
-            # finding the corresponding closing one.
-            begin += 1
-            end = content.find("}", begin)
-        else:
-            # The argument is not surrounded by curly brackets, so search for
-            # the possible end of the argument.
-            end = begin
+        # The unsaved content of open files for each thread.
+        self._buffers = threading.local()
 
-            while end < len(content) and \
-                    (content[end] != " " and content[end] != "," and \
-                    content[end] != "]" and content[end] != "}"):
-                end += 1
+        # How often results were parsed anew for each file.
+        self._parsed = {}
 
-        # Extract it and remove newlines.
-        return content[begin:end].replace('\n', ' ').replace('\r', '')
+        self.hits = 0
+        self.misses = 0
 
-    def _ExtractFromOptionOrCommand(self, content, name, starable = False,
-            compoundable = True):
+        # The lock which guards the stored results and the counters.
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def Buffers(self, buffers):
         """
-        Extracts an argument from either an option or a command.
+        Use the unsaved content of open files instead of the content on disk
+        within the current thread.
 
-        :param content: The string where the extraction should happen.
-        :type content: str
-        :param name: The name of the option from which the argument should be
-                     extracted.
-        :type name: str
-        :param starable: Whether or not a stared version of the command exists,
-                         too. (Defaults to False)
-        :type starable: bool
-        :param compoundable: Whether or not the argument can be enclosed by
-                             curly brackets. (Defaults to True)
-        :type compoundable: bool
-        :rtype: str
-        :return: The extracted argument if possible.
+        :param buffers: The hash and the content of each open file.
+        :type buffers: dict[str,(str, str)]
         """
-        # First try whether the given name is included as option in the given
-        # content.
-        extracted = self._ExtractFromOption(content, name, compoundable)
+        previous = getattr(self._buffers, "contents", {})
+        self._buffers.contents = buffers
 
-        if extracted is not None:
-            return extracted
+        try:
+            yield
+        finally:
+            self._buffers.contents = previous
 
-        # Next try if the given name is included as a command in the given
-        # content.
-        extracted = self._ExtractFromCommand(content, name, starable)
+    def _Buffer(self, key):
+        """
+        Get the unsaved content of a file if it is open.
 
-        if extracted is not None:
-            return extracted
+        Streamed kinds of results are always gathered from the disk.
 
-        # It was neither found is argument of a command nor of an option.
-        return None
+        :param key: The file name and the kind of the result.
+        :type key: (str, str)
+        :rtype: (str, str)
+        :return: The hash and the content of the file or None.
+        """
+        if key[1] in self.streamed:
+            return None
 
-    def _WantsReferable(self, line):
+        return getattr(self._buffers, "contents", {}).get(key[0])
+
+    def _Trusted(self, key):
         """
-        This method checks if the line given ends with a LaTeX reference
-        command.
+        Check whether the stored result for a key may be used without looking
+        at the file.
 
-        :param line: The line of text which should be checked.
-        :type line: str
+        :param key: The file name and the kind of the result.
+        :type key: (str, str)
         :rtype: bool
-        :return: Whether or not given line end with a LaTeX reference command.
+        :return: Whether or not the stored result is trusted.
         """
-        for command in self.ReferenceCommands:
-            if line.endswith("\\" + command + "{"):
-                return True
+        entry = self._entries.get(key)
 
-        return False
+        # Results which were gathered from unsaved content are never trusted
+        # since the content may have been discarded.
+        return not self.validate and entry is not None and \
+                entry[0][0] != "buffer" and self._Buffer(key) is None
 
-    def _WantsCitable(self, line):
+    def _Read(self, file_name):
         """
-        This method checks if the line given ends with a LaTeX citation
-        command.
+        Read the whole content of the given file.
 
-        :param line: The line of text which should be checked.
-        :type line: str
-        :rtype: bool
-        :return: Whether or not given line end with a LaTeX citation command.
+        :param file_name: The path to the file which should be read.
+        :type file_name: str
+        :rtype: str
+        :return: The content of the file.
         """
-        for command in self.CitationCommands:
-            if line.endswith("\\" + command + "{"):
-                return True
+        if self.statistics is None:
+            with OpenText(file_name) as f:
+                return f.read()
 
-        return False
+        with self.statistics.Measure("file reading"):
+            with OpenText(file_name) as f:
+                content = f.read()
 
-    def _CollectReferables(self, request_data):
+        self.statistics.Count("files read")
+        self.statistics.Count("bytes read", len(content))
+
+        return content
+
+    def Get(self, file_name, kind, parse):
         """
-        Create the YCM compatible list of all referable objects which could be
-        found.
+        Get the parse result of a specific kind for the given file.
+
+        The file is only read and parsed again if its fingerprint changed since
+        the last time this kind of result was requested for it.
+
+        :param file_name: The path to the file of interest.
+        :type file_name: str
+        :param kind: The kind of result which is requested (e.g. 'referables').
+                     Different kinds are cached independently of each other.
+        :type kind: str
+        :param parse: The function which is used to parse the content of the
+                      file if the stored result is outdated. For streamed
+                      kinds it gets the path to the file instead.
+        :type parse: (str) -> object
+        :rtype: object
+        :return: The result of the parse function for the current content of
+                 the file.
+        :raises IOError: If the file can not be accessed.
+        """
+        key = (file_name, kind)
 
-        :param request_data: The data which YouCompleteMe passes to the
-                             completer.
-        :type request_data: dict[str,str]
-        :rtype: list[dict[str,str]]
-        :return: A list of all referable objects which could be found in a format
-                 which YCM understands.
+        with self._lock:
+            if self._Trusted(key):
+                # The stored result is trusted to be up to date.
+                self.hits += 1
+                return self._entries[key][1]
+
+        return self._Load(key, parse)
 
+    def _Load(self, key, parse):
         """
-        referables = self._CollectReferablesInner(request_data)
+        Get the parse result for the given key if the file did not change or
+        parse the file again otherwise.
+
+        :param key: The file name and the kind of the result.
+        :type key: (str, str)
+        :param parse: The function which is used to parse the content of the
+                      file if the stored result is outdated.
+        :type parse: (str) -> object
+        :rtype: object
+        :return: The result of the parse function for the current content of
+                 the file.
+        :raises IOError: If the file can not be accessed.
+        """
+        file_name = key[0]
+        streamed = key[1] in self.streamed
+        fingerprint, content = self._Fingerprint(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] == fingerprint:
+                # The file did not change since the last time. Reuse the
+                # result.
+                self.hits += 1
+                return entry[1]
+
+        if streamed:
+            content = file_name
+        elif content is None:
+            content = self._Read(file_name)
+
+        if self.statistics is None:
+            result = parse(content)
+        else:
+            with self.statistics.Measure("parsing " + key[1]):
+                result = parse(content)
 
-        return [ BuildCompletionData(
-            r.completion(),
-            extra_menu_info=r.extra_info()
-            ) for r in referables ]
+        with self._lock:
+            self._Store(key, fingerprint, result, parse)
 
+        return result
 
-    def _CollectReferablesInner(self, request_data):
+    def _Store(self, key, fingerprint, result, parse):
         """
-        Create a list of all referable objects which could be found.
+        Store a result which was parsed anew. The lock must be held.
+
+        :param key: The file name and the kind of the result.
+        :type key: (str, str)
+        :param fingerprint: The fingerprint of the parsed content.
+        :type fingerprint: tuple
+        :param result: The result of the parse function.
+        :type result: object
+        :param parse: The function which parsed the content.
+        :type parse: (str) -> object
+        """
+        self.misses += 1
+        self._parsed[key[0]] = self._parsed.get(key[0], 0) + 1
+        self._entries[key] = (fingerprint, result, parse)
 
-        :param request_data: The data which YouCompleteMe passes to the
-                             completer.
-        :type request_data: dict[str,str]
-        :rtype: list[TexReferable]
-        :return: A list of all referable objects which could be found.
+    def Trusts(self, file_name, kind):
         """
-        referables = []
+        Check whether a result for the given file is stored and trusted to be
+        up to date without looking at the file.
 
-        # Get the directory where to search for the files.
-        file_dir = request_data['filepath']
-        if not isdir(file_dir):
-            # Use the corresponding directory if the file path points to a file.
-            file_dir = dirname(file_dir)
+        :param file_name: The path to the file of interest.
+        :type file_name: str
+        :param kind: The kind of result of interest.
+        :type kind: str
+        :rtype: bool
+        :return: Whether or not the stored result is trusted or the unsaved
+                 content of the file is known.
+        """
+        key = (file_name, kind)
 
-        for tex_file_name in self._GetAllTexFiles(file_dir):
-            try:
-                with open(tex_file_name, "r") as tex_file:
-                    content = tex_file.read()
+        with self._lock:
+            return self._Trusted(key) or self._Buffer(key) is not None
 
-                logger.debug("Get referables from {}".format(tex_file_name))
+    def _Fingerprint(self, key):
+        """
+        Determine the current fingerprint of the file of a key.
+
+        :param key: The file name and the kind of the result. The content of
+                    files for streamed kinds is hashed piece by piece instead
+                    of being read at once.
+        :type key: (str, str)
+        :rtype: (tuple, str)
+        :return: A tuple containing the fingerprint and the content of the
+                 file if it had to be read for the fingerprint (or None).
+        :raises IOError: If the file can not be accessed.
+        """
+        file_name = key[0]
+        streamed = key[1] in self.streamed
 
-                # Add all the referable objects which are found in the current
-                # file to the overall list.
-                referables.extend(self._GetAllReferables(content))
+        unsaved = self._Buffer(key)
+        if unsaved is not None:
+            return (("buffer", unsaved[0]), unsaved[1])
 
-            except IOError as e:
-                # The file could somehow not be opened. Skip it.
-                logger.warn("Could not open {} for inspection".format(
-                    tex_file_name))
+        try:
+            file_stat = stat(file_name)
+        except OSError as e:
+            raise IOError(e.errno, e.strerror, file_name)
 
-        return sorted(referables)
+        content = None
+        fingerprint = (file_stat.st_mtime, file_stat.st_size)
 
-    def _CollectCitables(self, request_data):
-        """
-        Create the YCM compatible list of all citable objects which could be
-        found.
+        if self._use_hash and streamed:
+            content_hash = hashlib.sha1()
 
-        :param request_data: The data which YouCompleteMe passes to the
-                             completer.
-        :type request_data: dict[str,str]
-        :rtype: list[dict[str,str]]
-        :return: A list of all citable objects which could be found in a format
-                 which YCM understands.
-        """
-        citables = self._CollectCitablesInner(request_data)
+            with open(file_name, "rb") as f:
+                for chunk in iter(partial(f.read, self.ChunkSize), b""):
+                    content_hash.update(chunk)
 
-        return [ BuildCompletionData(
-            c.completion(),
-            extra_menu_info=c.extra_info()
-            ) for c in citables]
+            fingerprint += (content_hash.digest(),)
 
-    def _CollectCitablesInner(self, request_data):
-        """
-        Create a list of all citable objects which could be found.
+        elif self._use_hash:
+            content = self._Read(file_name)
+            fingerprint += (ContentHash(content),)
 
-        :param request_data: The data which YouCompleteMe passes to the
-                             completer.
-        :type request_data: dict[str,str]
-        :rtype: list[TexCitable]
-        :return: A list of all citable objects which could be found.
+        return (fingerprint, content)
+
+    def Prefetch(self, file_names, kind, parse, parse_many):
         """
-        citables = []
-        bibliographies = []
+        Bring the results of a specific kind for several files up to date at
+        once.
+
+        All files whose stored results are outdated are handed together to
+        the given function, which may parse them in parallel. Afterwards, the
+        results can be retrieved with Get as usual.
+
+        :param file_names: The paths to the files of interest.
+        :type file_names: list[str]
+        :param kind: The kind of result which is requested.
+        :type kind: str
+        :param parse: The function which is used to parse the content of a
+                      single file. It is remembered for refreshing the result.
+        :type parse: (str) -> object
+        :param parse_many: The function which parses the contents of several
+                           files at once and returns the list of results in
+                           the same order.
+        :type parse_many: (list[str]) -> list[object]
+        """
+        outdated = []
 
-        # Get the directory where to search for the files.
-        file_dir = request_data['filepath']
-        if not isdir(file_dir):
-            # Use the corresponding directory if the file path points to a file.
-            file_dir = dirname(file_dir)
+        for file_name in file_names:
+            key = (file_name, kind)
+
+            with self._lock:
+                if self._Trusted(key):
+                    continue
 
-        # 1. Scan all found tex-files for a bibliography command.
-        for tex_file_name in self._GetAllTexFiles(file_dir):
             try:
-                with open(tex_file_name, "r") as tex_file:
-                    content = tex_file.read()
+                fingerprint, content = self._Fingerprint(key)
 
-                # Add all found bib-files mentioned in this file to the
-                # overall list.
-                bibliographies.extend(self._GetAllBibliographies(content))
+                with self._lock:
+                    entry = self._entries.get(key)
 
-            except IOError as e:
-                # The file could somehow not be opened.
-                logger.warn("Could not open {} for inspection".format(
-                    tex_file_name))
+                if entry is not None and entry[0] == fingerprint:
+                    continue
 
-        # 2. Parse the corresponding Bibtex-files.
-        for bib in bibliographies:
-            bib_file_name = join(file_dir, bib + ".bib")
+                # The content is read after the fingerprint was taken. So it
+                # is never older than the fingerprint it is stored with.
+                if content is None:
+                    content = self._Read(file_name)
+            except IOError:
+                # Get reports the problem later on.
+                continue
 
-            if isfile(bib_file_name):
-                # Open the file and parse it
-                try:
-                    with open(bib_file_name, "r") as bib_file:
-                        content = bib_file.read()
+            outdated.append((key, fingerprint, content))
 
-                    logger.debug("Get citables from {}".format(bib_file_name))
+        if len(outdated) < 2:
+            # There is nothing to gain. Leave the file to Get.
+            return
 
-                    # Add all citables found in this bibliography file to the
-                    # overall list.
-                    citables.extend(self._GetAllCitables(content))
+        if self.statistics is None:
+            results = parse_many([content for _, _, content in outdated])
+        else:
+            with self.statistics.Measure("parallel parsing " + kind):
+                results = parse_many([content for _, _, content in outdated])
 
-                except IOError as e:
-                    # The file could somehow not be opened.
-                    logger.warn("Could not open {} for inspection".format(
-                        bib_file_name))
+        with self._lock:
+            for (key, fingerprint, _), result in zip(outdated, results):
+                self._Store(key, fingerprint, result, parse)
 
-            else:
-                # The file does not exist. Ignore it.
-                logger.warn("Bibliography {} does not exist".format(
-                    bib_file_name))
+    def Refresh(self, file_name):
+        """
+        Bring all stored results for the given file up to date.
 
-        return sorted(citables)
+        The file is parsed again with the same functions which were used to
+        gather the stored results, if it changed in the meantime. If the file
+        can not be accessed any more, its results are dropped.
 
-    def _GetAllTexFiles(self, directory):
+        :param file_name: The path to the file which should be refreshed.
+        :type file_name: str
         """
-        Get the list of all tex-files which are present in the specified
-        directory.
+        with self._lock:
+            keys = [(k, e[2]) for k, e in self._entries.items()
+                    if k[0] == file_name]
 
-        :param directory: The directory of interest.
-        :type directory: str
+        for key, parse in keys:
+            try:
+                self._Load(key, parse)
+            except IOError:
+                with self._lock:
+                    self._entries.pop(key, None)
+
+    def Export(self, file_names):
+        """
+        Get the stored results of the given files in a form which can be
+        pickled.
+
+        :param file_names: The paths to the files of interest.
+        :type file_names: set[str]
+        :rtype: dict[(str, str),(tuple, object)]
+        :return: The fingerprint and the result for each file and kind.
+        """
+        with self._lock:
+            return dict((key, entry[:2]) for key, entry in
+                    self._entries.items() if key[0] in file_names)
+
+    def Import(self, entries, parser):
+        """
+        Add previously exported results to the cache.
+
+        Only results whose file did not change since they were exported are
+        added. Results which are already stored are kept.
+
+        :param entries: The fingerprint and the result for each file and kind.
+        :type entries: dict[(str, str),(tuple, object)]
+        :param parser: The function which determines the parse function for
+                       a file name and a kind of result.
+        :type parser: (str, str) -> ((str) -> object)
+        :rtype: int
+        :return: The number of added results.
+        """
+        fingerprints = {}
+        added = 0
+
+        for key, (fingerprint, result) in entries.items():
+            file_name = key[0]
+            streamed = key[1] in self.streamed
+
+            with self._lock:
+                if key in self._entries:
+                    continue
+
+            if (file_name, streamed) not in fingerprints:
+                try:
+                    fingerprints[(file_name, streamed)] = self._Fingerprint(
+                            key)[0]
+                except IOError:
+                    fingerprints[(file_name, streamed)] = None
+
+            if fingerprints[(file_name, streamed)] != fingerprint:
+                continue
+
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = (fingerprint, result,
+                            parser(file_name, key[1]))
+                    added += 1
+
+        return added
+
+    def Invalidate(self, file_name = None):
+        """
+        Drop the stored results for the given file or for all files.
+
+        :param file_name: The path to the file whose results should be dropped.
+                          If not given, the whole cache is emptied. (Defaults to
+                          None)
+        :type file_name: str
+        """
+        with self._lock:
+            if file_name is None:
+                self._entries.clear()
+                self._parsed.clear()
+                return
+
+            for key in [k for k in self._entries if k[0] == file_name]:
+                del self._entries[key]
+
+            self._parsed.pop(file_name, None)
+
+    def Parsed(self, file_names):
+        """
+        Count how often results for the given files were parsed anew.
+
+        :param file_names: The paths to the files of interest.
+        :type file_names: set[str]
+        :rtype: int
+        :return: The number of results which were parsed for the files.
+        """
+        with self._lock:
+            return sum(self._parsed.get(f, 0) for f in file_names)
+
+    def __len__(self):
+        """
+        The number of results which are currently stored in the cache.
+
+        :rtype: int
+        :return: The number of stored results.
+        """
+        return len(self._entries)
+
+
+class TexBibtexScanner(object):
+    """
+    Fast scanner for the fields of Bibtex entries which are needed for
+    completion.
+
+    The scanner only extracts the key, the type, the title and the author of
+    every entry and skips all other fields. It yields the same values as
+    bibtexparser for the entries it understands. All entries which it does
+    not understand for sure (e.g. which use macros or concatenations, or are
+    formatted unusually) are returned as text, so that they can be parsed by
+    bibtexparser instead.
+
+    The versions 0.x of bibtexparser strip all braces which enclose a value
+    and map alternative field names such as 'authors' to the standard ones.
+    Later versions do neither and parse with a grammar of their own. For
+    them, the scanner only handles entries which consist of simple fields
+    and leaves all others to bibtexparser.
+    """
+
+    # The begin of a record. Like bibtexparser, every line starting with an
+    # '@' begins a new one.
+    RecordStart = re.compile(r"^[ \t]*@", re.MULTILINE)
+
+    # The type and the key of an entry, which must be alone on the first line.
+    _Header = r"[ \t]*@(\w+)[ \t]*\{[ \t]*([^,\s{}]+)[ \t]*,[ \t]*\r?\n"
+    Header = re.compile(_Header)
+
+    # A field whose value is on a single line and contains no nested braces.
+    _SimpleField = r"\s*([^\s=,{}\"#]+)[ \t]*=[ \t]*" \
+            r"(\{[^{}\n]*\}|\"[^\"{}\n]*\"|[\w.:/+-]+)"
+    SimpleField = re.compile(_SimpleField)
+
+    # An entry which only consists of simple fields, each of which is
+    # followed by a comma except for the last one.
+    SimpleEntry = re.compile(_Header +
+            r"(?:" + _SimpleField + r"[ \t]*,[ \t]*\r?\n)*" +
+            r"(?P<last>" + _SimpleField + r")?\s*\}\s*$")
+
+    # The name of a field and the following equal sign.
+    FieldName = re.compile(r"\s*([^\s=,{}\"#]+)[ \t]*=[ \t]*")
+
+    # The end of a field which is followed by another one.
+    FieldEnd = re.compile(r"[ \t]*,[ \t]*\r?\n")
+
+    # The end of the last field and of the entry.
+    EntryEnd = re.compile(r"\s*\}\s*$")
+
+    # A closing brace at the end of a line.
+    LineEndingBrace = re.compile(r"\}[ \t\r]*\n")
+
+    # Tokens which determine where a value ends.
+    ValueTokens = re.compile(r"[{}\"]")
+
+    # A value which is not delimited.
+    BareValue = re.compile(r"[^,\s{}\"#]+")
+
+    # Parts of values where bibtexparser splits the fields of an entry.
+    FieldSplit = re.compile(r",\s*\n|\n\s*,")
+
+    # The name of a macro which is defined by a string entry.
+    MacroName = re.compile(r"@string\s*\{\s*([^=\s]+)\s*=", re.IGNORECASE)
+
+    # The types of records which never describe a citable object.
+    IgnoredTypes = ("@comment", "@preamble")
+
+    # The entry types which bibtexparser does not ignore.
+    StandardTypes = set(["article", "book", "booklet", "conference", "inbook",
+            "incollection", "inproceedings", "manual", "mastersthesis", "misc",
+            "phdthesis", "proceedings", "techreport", "unpublished"])
+
+    # The fields which are extracted and their alternative names.
+    Fields = {
+        "title" : "title",
+        "author" : "author",
+        "authors" : "author"
+    }
+
+    # The macros which later versions of bibtexparser always define.
+    CommonStrings = set(["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug",
+            "sep", "oct", "nov", "dec"])
+
+    def __init__(self, version = bibtexparser.__version__):
+        """
+        Constructor
+
+        :param version: The version of bibtexparser whose results the scanner
+                        reproduces. (Defaults to the installed version)
+        :type version: str
+        """
+        self._legacy = version.split(".")[0] == "0"
+
+        if self._legacy:
+            self._fields = self.Fields
+        else:
+            self._fields = dict((name, field) for name, field in
+                    self.Fields.items() if name == field)
+
+    def _ReadValue(self, record, begin):
+        """
+        Read the value of a field.
+
+        :param record: The text of the entry.
+        :type record: str
+        :param begin: The position where the value begins.
+        :type begin: int
+        :rtype: (str, int)
+        :return: A tuple containing the text of the value including its
+                 delimiters and the position after it, or None if the value
+                 can not be read.
+        """
+        if begin >= len(record):
+            return None
+
+        if record[begin] not in "{\"":
+            bare = self.BareValue.match(record, begin)
+            if bare is None:
+                return None
+
+            return (bare.group(0), bare.end())
+
+        quoted = record[begin] == "\""
+        depth = 0 if quoted else 1
+
+        for token in self.ValueTokens.finditer(record, begin + 1):
+            if token.group(0) == "{":
+                depth += 1
+            elif token.group(0) == "}":
+                depth -= 1
+            elif depth == 0:
+                # The closing quote.
+                return (record[begin:token.end()], token.end())
+
+            if depth == 0 and not quoted:
+                return (record[begin:token.end()], token.end())
+            elif depth < 0:
+                return None
+
+        return None
+
+    def _CleanValue(self, value):
+        """
+        Clean the text of a value like bibtexparser does.
+
+        :param value: The text of the value including its delimiters.
+        :type value: str
+        :rtype: str
+        :return: The cleaned value.
+        """
+        if "\n" in value:
+            value = "\n".join(line.strip() for line in value.split("\n"))
+
+        if value != "{}":
+            value = self._StripBraces(value).strip()
+            if value.startswith("\"") and value.endswith("\""):
+                value = value[1:-1]
+
+            value = self._StripBraces(value)
+        else:
+            value = ""
+
+        if isinstance(value, bytes):
+            value = value.decode("utf-8", "ignore")
+
+        return value
+
+    def _StripBraces(self, value):
+        """
+        Remove the braces which enclose the whole value.
+
+        :param value: The value.
+        :type value: str
+        :rtype: str
+        :return: The value without enclosing braces.
+        """
+        value = value.strip()
+
+        if not value.startswith("{") or not value.endswith("}"):
+            return value
+
+        depth = 0
+        for token in self.ValueTokens.finditer(value):
+            if token.group(0) == "{":
+                depth += 1
+            elif token.group(0) == "}":
+                depth -= 1
+
+            if depth == 0:
+                return value[1:-1] if token.end() == len(value) else value
+
+        return value
+
+    def _ScanSimpleEntry(self, record):
+        """
+        Scan a single entry which only consists of simple fields.
+
+        This is the fast path for the vast majority of entries. All other
+        entries are left to _ScanEntry.
+
+        :param record: The text of the entry.
+        :type record: str
+        :rtype: (bool, dict[str,str])
+        :return: The same as _ScanEntry or None if the entry is not simple.
+        """
+        match = self.SimpleEntry.match(record)
+        if match is None:
+            return None
+
+        entry_type = match.group(1).lower()
+        if entry_type not in self.StandardTypes:
+            return (True, None)
+
+        last = match.group("last")
+        if last is not None and self._fields.get(
+                self.SimpleField.match(last).group(1).lower()) is not None:
+            # The last field has no comma. Let _ScanEntry check it.
+            return None
+
+        entry = {'ID' : match.group(2), 'ENTRYTYPE' : entry_type}
+        fields = 0
+
+        for name, value in self.SimpleField.findall(record, match.end(2)):
+            fields += 1
+
+            if not self._legacy and value[0] not in "{\"" and not \
+                    value.isdigit() and value.lower() not in self.CommonStrings:
+                # Later versions fail on undefined macros. Let bibtexparser
+                # decide.
+                return None
+
+            field = self._fields.get(name.lower())
+            if field is None:
+                continue
+
+            if value[0] not in "{\"" or "#" in value:
+                # Leave macros and concatenations to _ScanEntry.
+                return None
+
+            # Later versions of bibtexparser keep the value as it is.
+            value = value[1:-1]
+            if self._legacy:
+                value = value.strip()
+                if value.startswith("\"") and value.endswith("\""):
+                    value = self._CleanValue(value)
+
+            if isinstance(value, bytes):
+                value = value.decode("utf-8", "ignore")
+
+            entry[field] = value
+
+        if fields == 0 or (fields == 1 and last is not None):
+            # bibtexparser may lose the only field. Let _ScanEntry check it.
+            return None
+
+        return (True, entry)
+
+    def _ScanEntry(self, record, macros):
+        """
+        Scan a single entry.
+
+        :param record: The text of the entry.
+        :type record: str
+        :param macros: The lower case names of all macros defined so far (or
+                       None if they are not known).
+        :type macros: set[str]
+        :rtype: (bool, dict[str,str])
+        :return: A tuple containing whether or not the entry was understood
+                 and its key, type and extracted fields (or None if the entry
+                 is not citable).
+        """
+        header = self.Header.match(record)
+        if header is None:
+            return (False, None)
+
+        entry_type = header.group(1).lower()
+        if entry_type not in self.StandardTypes:
+            return (True, None)
+
+        entry = {'ID' : header.group(2), 'ENTRYTYPE' : entry_type}
+        fields = 0
+        position = header.end()
+
+        while True:
+            end = self.EntryEnd.match(record, position)
+            if end is not None:
+                break
+
+            name = self.FieldName.match(record, position)
+            if name is None:
+                return (False, None)
+
+            value = self._ReadValue(record, name.end())
+            if value is None:
+                return (False, None)
+
+            value, position = value
+            fields += 1
+
+            if self.FieldSplit.search(value):
+                return (False, None)
+
+            field = self._fields.get(name.group(1).lower())
+
+            separator = self.FieldEnd.match(record, position)
+            if separator is not None:
+                position = separator.end()
+            elif self.EntryEnd.match(record, position) is None:
+                return (False, None)
+            elif (value[0] != "{" or self.LineEndingBrace.search(record) is
+                    None) and (field is not None or fields == 1):
+                # bibtexparser only copes with a missing comma after the
+                # last field if its value is enclosed in braces. Otherwise
+                # the field is lost, which only matters for the fields of
+                # interest or if it is the only one.
+                return (False, None)
+
+            if field is None:
+                continue
+
+            if "#" in value:
+                return (False, None)
+
+            if value[0] not in "{\"" and (macros is None or
+                    value.lower() in macros):
+                # The value may be a macro.
+                return (False, None)
+
+            entry[field] = self._CleanValue(value)
+
+        return (True, entry if fields > 0 else None)
+
+    def Scan(self, content):
+        """
+        Scan Bibtex content for the entries which are needed for completion.
+
+        :param content: The Bibtex content.
+        :type content: str
+        :rtype: (list[dict[str,str]], str)
+        :return: A tuple containing the list of all understood entries and
+                 the text of all other entries together with the macro
+                 definitions, which must be parsed by bibtexparser.
+        """
+        entries = []
+        rest = []
+        macro_texts = []
+        macros = set()
+
+        starts = [m.start() for m in self.RecordStart.finditer(content)]
+
+        if content[:starts[0] if starts else len(content)].strip():
+            # Something precedes the first entry. Leave the decision what it
+            # means to bibtexparser.
+            rest.append(content[:starts[0] if starts else len(content)])
+
+        for i, begin in enumerate(starts):
+            end = starts[i + 1] if i + 1 < len(starts) else len(content)
+            record = content[begin:end]
+            record_type = record.lstrip()[:9].lower()
+
+            if record_type.startswith(self.IgnoredTypes):
+                continue
+
+            elif record_type.startswith("@string"):
+                macro_texts.append(record)
+
+                macro = self.MacroName.search(record)
+                if macro is not None and macros is not None:
+                    macros.add(macro.group(1).lower())
+                else:
+                    macros = None
+
+                continue
+
+            result = self._ScanSimpleEntry(record)
+            if result is None and self._legacy:
+                result = self._ScanEntry(record, macros)
+            elif result is None:
+                result = (False, None)
+
+            understood, entry = result
+
+            if not understood:
+                rest.append(record)
+            elif entry is not None:
+                entries.append(entry)
+
+        if not rest:
+            return (entries, "")
+
+        return (entries, "".join(macro_texts + rest))
+
+
+class TexBibliographyIndex(object):
+    """
+    Incremental index of the entries of Bibtex databases.
+
+    A database is read piece by piece and split into its entries at the
+    '@type{key,' boundaries. For every entry the citable objects which were
+    parsed from it are remembered. If the database changes, only the entries
+    whose text changed are handed to the parser again, all others are reused.
+    Changed entries are parsed in batches, so that neither the whole content
+    of a large database nor all of its parsed entries are held in memory at
+    once.
+    """
+
+    # The begin of a Bibtex entry at the start of a line.
+    EntryStart = re.compile(r"^[ \t]*@[ \t]*(\w+)[ \t]*[{(]", re.MULTILINE)
+
+    # The key of a Bibtex entry anywhere in a text.
+    EntryKey = re.compile(r"@[ \t]*\w+[ \t]*[{(][ \t\r\n]*([^,\s]+)[ \t]*,")
+
+    # Entry types which do not describe a citable object but influence how the
+    # other entries are parsed.
+    MacroTypes = ["string", "preamble"]
+
+    # The number of changed entries which are parsed together.
+    BatchSize = 500
+
+    # The number of batches which are handed together to the function which
+    # parses them in parallel.
+    ParallelBatches = 8
+
+    # The size of the pieces in which a database is read.
+    ChunkSize = 1 << 16
+
+    def __init__(self, parse, parse_many = None):
+        """
+        Constructor
+
+        :param parse: The function which is used to parse Bibtex content.
+        :type parse: (str) -> list[TexCitable]
+        :param parse_many: The function which is used to parse several pieces
+                           of Bibtex content in parallel. If not given, all
+                           batches are parsed one after another with the parse
+                           function. (Defaults to None)
+        :type parse_many: (list[str]) -> list[list[TexCitable]]
+        """
+        self._parse = parse
+        self._parse_many = parse_many
+
+        # For each database a map from the hash of an entry's text and the
+        # macro definitions before it to the citables parsed from it.
+        self._databases = {}
+
+        # The hash of the content of each database and for each hash the
+        # entries and the sorted citables of the content. Databases with the
+        # same content, e.g. copies in several projects, share them.
+        self._digests = {}
+        self._shared = {}
+
+        # For each database the line and the column of the key of each entry.
+        self._positions = {}
+
+        # A lock for each database, so that a database which is used by
+        # several projects at the same time is only parsed once, and the lock
+        # which guards the maps above and the counters, which are shared by
+        # all databases.
+        self._locks = {}
+        self._lock = threading.Lock()
+
+        self.parsed = 0
+        self.reused = 0
+
+    def _Chunks(self, file_name, content):
+        """
+        Get the content of a database piece by piece.
+
+        :param file_name: The path to the database.
+        :type file_name: str
+        :param content: The content of the database if it is already known
+                        (or None).
+        :type content: str
+        :rtype: generator[str]
+        :return: The pieces of the content.
+        :raises IOError: If the database can not be read.
+        """
+        if content is not None:
+            yield content
+            return
+
+        with OpenText(file_name) as f:
+            for chunk in iter(partial(f.read, self.ChunkSize), ""):
+                yield chunk
+
+    def _Hashed(self, chunks, content_hash):
+        """
+        Pass on pieces of content while they are added to a hash.
+
+        :param chunks: The pieces of the content.
+        :type chunks: generator[str]
+        :param content_hash: The hash which the pieces are added to.
+        :type content_hash: hashlib.sha1
+        :rtype: generator[str]
+        :return: The same pieces.
+        """
+        for chunk in chunks:
+            if not isinstance(chunk, bytes):
+                content_hash.update(chunk.encode("utf-8"))
+            else:
+                content_hash.update(chunk)
+
+            yield chunk
+
+    def _Release(self, file_name):
+        """
+        Forget the hash of a database and drop the shared entries of its
+        content if no other database has the same content. The lock of the
+        index must be held.
+
+        :param file_name: The path to the database.
+        :type file_name: str
+        """
+        digest = self._digests.pop(file_name, None)
+
+        if digest is not None and digest not in self._digests.values():
+            self._shared.pop(digest, None)
+
+    def _Entries(self, chunks):
+        """
+        Split the content of a Bibtex database into its entries.
+
+        Only the entry which is currently read is kept in memory besides the
+        piece of content which was read last.
+
+        :param chunks: The pieces of the content of the database.
+        :type chunks: iterable[str]
+        :rtype: generator[(str, str, int)]
+        :return: The type, the text and the line (starting at 1) of each
+                 entry.
+        """
+        pending = ""
+
+        # The line where the pending content begins.
+        line = 1
+
+        for chunk in chunks:
+            pending += chunk
+            starts = [(m.start(), m.group(1).lower())
+                    for m in self.EntryStart.finditer(pending)]
+
+            if not starts:
+                # Keep the last line. It may contain the begin of an entry
+                # which is not complete yet.
+                cut = pending.rfind("\n") + 1
+                line += pending.count("\n", 0, cut)
+                pending = pending[cut:]
+                continue
+
+            # All but the last entry are complete.
+            position = 0
+            for (begin, entry_type), (end, _) in zip(starts, starts[1:]):
+                line += pending.count("\n", position, begin)
+                position = begin
+
+                yield (entry_type, pending[begin:end], line)
+
+            line += pending.count("\n", position, starts[-1][0])
+            pending = pending[starts[-1][0]:]
+
+        match = self.EntryStart.match(pending)
+        if match is not None:
+            yield (match.group(1).lower(), pending, line)
+
+    def _ParseBatches(self, batches, entries):
+        """
+        Parse batches of changed entries and remember the citables of each
+        entry.
+
+        :param batches: The batches which should be parsed. Each one consists
+                        of the macro definitions and the list of tuples of the
+                        hash and the text of each changed entry.
+        :type batches: list[(str, list[(tuple, str)])]
+        :param entries: The map from the hash of an entry to its citables
+                        which is extended.
+        :type entries: dict[tuple,list[TexCitable]]
+        :rtype: int
+        :return: The number of parsed citables.
+        """
+        contents = [macros + "".join(e for _, e in changed)
+                for macros, changed in batches]
+
+        if self._parse_many is not None and len(contents) > 1:
+            results = self._parse_many(contents)
+        else:
+            results = [self._parse(c) for c in contents]
+
+        count = 0
+
+        for (_, changed), found in zip(batches, results):
+            # Assign the found citables to the entries by their key.
+            parsed = {}
+            for citable in found:
+                parsed.setdefault(citable.completion(), []).append(citable)
+
+            for entry_hash, entry in changed:
+                citables = []
+                for key in self.EntryKey.findall(entry):
+                    if parsed.get(key):
+                        citables.append(parsed[key].pop(0))
+
+                entries[entry_hash] = citables
+                count += len(citables)
+
+        return count
+
+    def Update(self, file_name, content = None):
+        """
+        Update the index of the given database with its new content.
+
+        :param file_name: The path to the database.
+        :type file_name: str
+        :param content: The current content of the database. If not given, the
+                        database is read piece by piece. (Defaults to None)
+        :type content: str
+        :rtype: list[TexCitable]
+        :return: The sorted list of all citable objects found in the database.
+        :raises IOError: If the database can not be read.
+        """
+        with self._lock:
+            lock = self._locks.setdefault(file_name, threading.Lock())
+
+        with lock:
+            return self._Update(file_name, content)
+
+    def _Update(self, file_name, content):
+        """
+        Update the index of the given database while its lock is held.
+
+        :param file_name: The path to the database.
+        :type file_name: str
+        :param content: The current content of the database or None.
+        :type content: str
+        :rtype: list[TexCitable]
+        :return: The sorted list of all citable objects found in the database.
+        :raises IOError: If the database can not be read.
+        """
+        # The content is hashed while it is split into its entries, so that
+        # the database is read only once. Entries which were parsed for
+        # another database are reused as well, and if another database has
+        # the same content, its citables are shared.
+        content_hash = hashlib.sha1()
+        chunks = self._Hashed(self._Chunks(file_name, content), content_hash)
+
+        with self._lock:
+            old_entries = self._databases.get(file_name, {})
+            known = [old_entries] + [e for e, _, _ in self._shared.values()
+                    if e is not old_entries]
+
+        new_entries = {}
+        positions = {}
+        parsed = 0
+        reused = 0
+
+        # The hashes of all entries in the order of the database.
+        order = []
+
+        macros = []
+        macros_hash = hashlib.sha1()
+        macros_digest = macros_hash.digest()
+
+        batches = []
+        changed = []
+
+        for entry_type, entry, line in self._Entries(chunks):
+            # Whitespace between the entries is irrelevant. So ignore it to
+            # recognize entries which are followed by a new one.
+            entry = entry.rstrip() + "\n"
+
+            if entry_type in self.MacroTypes:
+                # Changed macros may alter every following entry. Hence, they
+                # are part of the hash of the entries.
+                macros.append(entry)
+                macros_hash.update(ContentHash(entry))
+                macros_digest = macros_hash.digest()
+                continue
+
+            elif entry_type == "comment":
+                continue
+
+            key = self.EntryKey.match(entry.lstrip())
+            if key is not None:
+                begin = len(entry) - len(entry.lstrip()) + key.start(1)
+                positions[key.group(1)] = (line + entry.count("\n", 0, begin),
+                        ByteColumn(entry, begin))
+
+            entry_hash = (macros_digest, ContentHash(entry))
+            order.append(entry_hash)
+
+            if entry_hash in new_entries:
+                # The exact same entry was already seen before.
+                continue
+
+            found = next((e[entry_hash] for e in known if entry_hash in e),
+                    None)
+
+            if found is not None:
+                new_entries[entry_hash] = found
+                reused += len(found)
+                continue
+
+            new_entries[entry_hash] = []
+            changed.append((entry_hash, entry))
+
+            if len(changed) == self.BatchSize:
+                batches.append(("".join(macros), changed))
+                changed = []
+
+            if len(batches) == (self.ParallelBatches if self._parse_many
+                    is not None else 1):
+                parsed += self._ParseBatches(batches, new_entries)
+                batches = []
+
+        if changed:
+            batches.append(("".join(macros), changed))
+
+        parsed += self._ParseBatches(batches, new_entries)
+
+        digest = content_hash.digest()
+
+        with self._lock:
+            shared = self._shared.get(digest)
+
+        if shared is None:
+            citables = list(chain.from_iterable(new_entries[h] for h in order))
+            citables.sort(key=methodcaller("sort_key"))
+
+            shared = (new_entries, citables, positions)
+
+        with self._lock:
+            self._Release(file_name)
+
+            shared = self._shared.setdefault(digest, shared)
+            self._databases[file_name] = shared[0]
+            self._positions[file_name] = shared[2]
+            self._digests[file_name] = digest
+
+            self.parsed += parsed
+            self.reused += reused
+
+        return shared[1]
+
+    def Export(self, file_names):
+        """
+        Get the index of the given databases in a form which can be pickled.
+
+        :param file_names: The paths to the databases of interest.
+        :type file_names: set[str]
+        :rtype: dict[str,object]
+        :return: The index of each database.
+        """
+        with self._lock:
+            return dict((f, (d, self._positions.get(f, {}))) for f, d in
+                    self._databases.items() if f in file_names)
+
+    def Import(self, databases):
+        """
+        Add previously exported indices of databases.
+
+        Databases which are already indexed are kept.
+
+        :param databases: The index of each database.
+        :type databases: dict[str,object]
+        """
+        with self._lock:
+            for file_name, (database, positions) in databases.items():
+                if file_name not in self._databases:
+                    self._databases[file_name] = database
+                    self._positions[file_name] = positions
+
+    def Remove(self, file_name):
+        """
+        Remove the given database from the index.
+
+        :param file_name: The path to the database.
+        :type file_name: str
+        """
+        with self._lock:
+            self._databases.pop(file_name, None)
+            self._positions.pop(file_name, None)
+            self._Release(file_name)
+
+    def Positions(self, file_name):
+        """
+        Get the positions of the keys of all entries of a database.
+
+        :param file_name: The path to the database.
+        :type file_name: str
+        :rtype: dict[str,(int, int)]
+        :return: The line and the column, both starting at 1, of each key.
+                 The dictionary must not be altered.
+        """
+        with self._lock:
+            return self._positions.get(file_name, {})
+
+
+class TexCandidateIndex(object):
+    """
+    Sorted index of the completion texts of TeX objects.
+
+    The index answers prefix queries with a binary search. Besides the full
+    completion text, every part of it after a namespace separator is indexed
+    too. Thereby, 'arch' finds 'fig:arch' as well as 'arch:overview'.
+    """
+
+    NamespaceSeparator = ":"
+
+    def __init__(self, objects):
+        """
+        Constructor
+
+        :param objects: The objects which should be indexed in sorted order.
+        :type objects: list[TexObject]
+        """
+        self._objects = objects
+
+        self._keys = []
+        self._namespace_keys = []
+
+        for i, o in enumerate(self._objects):
+            text = o.completion()
+            self._keys.append((text.lower(), i))
+
+            parts = text.split(self.NamespaceSeparator)
+            for j in range(1, len(parts)):
+                part = self.NamespaceSeparator.join(parts[j:])
+                self._namespace_keys.append((part.lower(), i))
+
+        self._keys.sort()
+        self._namespace_keys.sort()
+
+    def _Search(self, keys, query):
+        """
+        Iterate over all keys which start with the given query.
+
+        :param keys: The sorted keys which should be searched.
+        :type keys: list[(str, int)]
+        :param query: The lower case query.
+        :type query: str
+        :rtype: iterable[(str, int)]
+        :return: All matching keys in sorted order.
+        """
+        pos = bisect.bisect_left(keys, (query,))
+
+        while pos < len(keys) and keys[pos][0].startswith(query):
+            yield keys[pos]
+            pos += 1
+
+    def Query(self, query, limit):
+        """
+        Find the objects whose completion text or one of its namespace parts
+        start with the given query.
+
+        Like the filtering of YCM, the query is case insensitive unless it
+        contains upper case characters.
+
+        :param query: The text which the user typed so far.
+        :type query: str
+        :param limit: The maximum number of objects to return.
+        :type limit: int
+        :rtype: list[TexObject]
+        :return: The matching objects. Those whose full completion text
+                 matches come first.
+        """
+        lower_query = query.lower()
+        case_sensitive = lower_query != query
+
+        found = []
+        seen = set()
+
+        for keys in (self._keys, self._namespace_keys):
+            for _, i in self._Search(keys, lower_query):
+                if len(found) >= limit:
+                    return found
+
+                if i in seen:
+                    continue
+
+                o = self._objects[i]
+                if case_sensitive and query not in o.completion():
+                    continue
+
+                seen.add(i)
+                found.append(o)
+
+        return found
+
+    def __len__(self):
+        """
+        The number of indexed objects.
+
+        :rtype: int
+        :return: The number of indexed objects.
+        """
+        return len(self._objects)
+
+
+class TexLocationIndex(object):
+    """
+    Index of the locations where labels and Bibtex keys are defined and used
+    within a project.
+
+    Every file contributes its definitions and usages. When a file changes,
+    only its own contribution is replaced, so that the index is kept up to
+    date without looking at the other files again.
+
+    The index also knows the problems of the keys, like references to
+    undefined labels. They are only checked again for the keys whose
+    definitions or usages changed.
+    """
+
+    def __init__(self, unused = False):
+        """
+        Constructor
+
+        :param unused: Whether or not Bibtex entries which are never cited are
+                       reported as problem. (Defaults to False)
+        :type unused: bool
+        """
+        # For each file the results of parsing it which its contribution was
+        # built from.
+        self._sources = {}
+
+        # The definitions and usages which each file contributes as lists of
+        # (action, key, line, column).
+        self._contributions = {}
+
+        # The locations of the definitions and usages of each key as lists of
+        # (file name, line, column).
+        self._definitions = {}
+        self._usages = {}
+
+        # The problems of each key as lists of (file name, line, column,
+        # kind, text), the keys with problems in each file, and the keys which
+        # must be checked again.
+        self._unused = unused
+        self._problems = {}
+        self._file_problems = {}
+        self._unchecked = set()
+
+    def Update(self, file_name, sources, definitions, usages):
+        """
+        Replace the contribution of a file if it was built from other results
+        of parsing the file.
+
+        :param file_name: The path to the file.
+        :type file_name: str
+        :param sources: The results of parsing the file which the definitions
+                        and usages are taken from.
+        :type sources: tuple
+        :param definitions: The action, the key, the line and the column of
+                            each definition. It is only consumed if the
+                            sources changed.
+        :type definitions: iterable[(int, str, int, int)]
+        :param usages: The action, the key, the line and the column of each
+                       usage. It is only consumed if the sources changed.
+        :type usages: iterable[(int, str, int, int)]
+        :rtype: set[(int, str)]
+        :return: The actions and keys whose definitions or usages changed.
+        """
+        old_sources = self._sources.get(file_name)
+
+        if old_sources is not None and len(old_sources) == len(sources) and \
+                all(a is b for a, b in zip(old_sources, sources)):
+            return set()
+
+        changed = self.Remove(file_name)
+
+        contribution = (list(definitions), list(usages))
+
+        for entries, locations in zip(contribution, (self._definitions,
+                self._usages)):
+            for action, key, line, column in entries:
+                locations.setdefault((action, key), []).append((file_name,
+                    line, column))
+                changed.add((action, key))
+
+        self._sources[file_name] = sources
+        self._contributions[file_name] = contribution
+        self._unchecked.update(changed)
+
+        return changed
+
+    def Remove(self, file_name):
+        """
+        Remove the contribution of a file.
+
+        :param file_name: The path to the file.
+        :type file_name: str
+        :rtype: set[(int, str)]
+        :return: The actions and keys whose definitions or usages changed.
+        """
+        changed = set()
+
+        self._sources.pop(file_name, None)
+        contribution = self._contributions.pop(file_name, ([], []))
+
+        for entries, locations in zip(contribution, (self._definitions,
+                self._usages)):
+            for action, key, _, _ in entries:
+                found = [l for l in locations.get((action, key), [])
+                        if l[0] != file_name]
+
+                if found:
+                    locations[(action, key)] = found
+                else:
+                    locations.pop((action, key), None)
+
+                changed.add((action, key))
+
+        self._unchecked.update(changed)
+
+        return changed
+
+    def Files(self):
+        """
+        Get all files which contribute to the index.
+
+        :rtype: list[str]
+        :return: The paths to the files.
+        """
+        return list(self._sources)
+
+    def Definitions(self, action, key):
+        """
+        Get the locations where a key is defined.
+
+        :param action: The action which uses the key.
+        :type action: int
+        :param key: The label or Bibtex key.
+        :type key: str
+        :rtype: list[(str, int, int)]
+        :return: The file name, the line and the column of each definition.
+        """
+        return self._definitions.get((action, key), [])
+
+    def Usages(self, action, key):
+        """
+        Get the locations where a key is used.
+
+        :param action: The action which uses the key.
+        :type action: int
+        :param key: The label or Bibtex key.
+        :type key: str
+        :rtype: list[(str, int, int)]
+        :return: The file name, the line and the column of each usage.
+        """
+        return self._usages.get((action, key), [])
+
+    def _Check(self, action, key):
+        """
+        Determine the problems of a key anew.
+
+        :param action: The action which uses the key.
+        :type action: int
+        :param key: The label or Bibtex key.
+        :type key: str
+        """
+        for problem in self._problems.pop((action, key), []):
+            self._file_problems.get(problem[0], set()).discard((action, key))
+
+        definitions = self.Definitions(action, key)
+        usages = self.Usages(action, key)
+        problems = []
+
+        if action == TexCompleter.Actions.Reference:
+            name = "Label"
+            missing = "Reference to undefined label '{}'"
+        else:
+            name = "Bibtex key"
+            missing = "Citation of undefined Bibtex key '{}'"
+
+        if not definitions:
+            problems.extend(l + ("ERROR", missing.format(key))
+                    for l in usages)
+
+        elif len(definitions) > 1:
+            problems.extend(l + ("WARNING", "{} '{}' is defined {} "
+                "times".format(name, key, len(definitions)))
+                for l in definitions)
+
+        if self._unused and action == TexCompleter.Actions.Citation and \
+                not usages:
+            problems.extend(l + ("WARNING", "Bibtex key '{}' is never "
+                "cited".format(key)) for l in definitions)
+
+        if problems:
+            self._problems[(action, key)] = problems
+
+            for problem in problems:
+                self._file_problems.setdefault(problem[0], set()).add(
+                        (action, key))
+
+    def Problems(self, file_name):
+        """
+        Get the problems which are located in a file.
+
+        Only the keys whose definitions or usages changed since the last time
+        are checked again.
+
+        :param file_name: The path to the file.
+        :type file_name: str
+        :rtype: list[((str, int, int, str, str), str)]
+        :return: A tuple for each problem, in the order of the lines. It
+                 contains the file name, the line, the column, the kind
+                 ('ERROR' or 'WARNING') and the text of the problem as well as
+                 the affected key.
+        """
+        for action, key in self._unchecked:
+            self._Check(action, key)
+
+        self._unchecked = set()
+
+        return sorted((p, key) for action, key in self._file_problems.get(
+            file_name, ()) for p in self._problems[(action, key)]
+            if p[0] == file_name)
+
+
+class TexStatistics(object):
+    """
+    Lightweight counters and timing histograms of the stages of the completer.
+
+    The durations of each stage are collected in buckets of exponentially
+    growing size, so that recording a duration is cheap and the memory used
+    does not grow with the number of requests.
+    """
+
+    # The upper bounds of the buckets in milliseconds. The last bucket takes
+    # all longer durations.
+    Buckets = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+        # The breakdown of the request which the current thread handles.
+        self._local = threading.local()
+
+    def Count(self, name, value = 1):
+        """
+        Increase a counter.
+
+        :param name: The name of the counter.
+        :type name: str
+        :param value: The value which is added to the counter. (Defaults to 1)
+        :type value: int
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+        breakdown = getattr(self._local, "breakdown", None)
+        if breakdown is not None:
+            breakdown[name] = breakdown.get(name, 0) + value
+
+    def Record(self, stage, duration):
+        """
+        Record the duration of a stage.
+
+        :param stage: The name of the stage.
+        :type stage: str
+        :param duration: The duration in milliseconds.
+        :type duration: float
+        """
+        bucket = bisect.bisect_left(self.Buckets, duration)
+
+        with self._lock:
+            histogram = self._histograms.get(stage)
+
+            if histogram is None:
+                # The number of durations of each bucket followed by the
+                # number of all durations, their sum and their maximum.
+                histogram = [0] * (len(self.Buckets) + 1) + [0, 0.0, 0.0]
+                self._histograms[stage] = histogram
+
+            histogram[bucket] += 1
+            histogram[-3] += 1
+            histogram[-2] += duration
+            histogram[-1] = max(histogram[-1], duration)
+
+        breakdown = getattr(self._local, "breakdown", None)
+        if breakdown is not None:
+            key = stage + " [ms]"
+            breakdown[key] = breakdown.get(key, 0.0) + duration
+
+    @contextmanager
+    def Measure(self, stage):
+        """
+        Measure the duration of the code which runs in this context.
+
+        :param stage: The name of the stage.
+        :type stage: str
+        """
+        start = time.time()
+
+        try:
+            yield
+        finally:
+            self.Record(stage, (time.time() - start) * 1000.0)
+
+    @contextmanager
+    def Request(self):
+        """
+        Measure a whole request.
+
+        All durations and counts which are recorded by the current thread
+        while in this context are collected in the dictionary which is passed
+        to the context.
+        """
+        breakdown = {}
+        self._local.breakdown = breakdown
+
+        start = time.time()
+
+        try:
+            yield breakdown
+        finally:
+            self._local.breakdown = None
+
+            duration = (time.time() - start) * 1000.0
+            self.Record("request", duration)
+            breakdown["request [ms]"] = duration
+
+    def _Percentile(self, histogram, fraction):
+        """
+        Estimate a percentile of the durations of a histogram.
+
+        :param histogram: The histogram of interest.
+        :type histogram: list[float]
+        :param fraction: The fraction of durations which are shorter than the
+                         percentile.
+        :type fraction: float
+        :rtype: str
+        :return: The upper bound of the bucket which contains the percentile.
+        """
+        needed = fraction * histogram[-3]
+        found = 0
+
+        for i, bound in enumerate(self.Buckets):
+            found += histogram[i]
+            if found >= needed:
+                return "<{}".format(bound)
+
+        return ">{}".format(self.Buckets[-1])
+
+    def Report(self):
+        """
+        Summarize all counters and histograms.
+
+        :rtype: list[str]
+        :return: The lines of the summary.
+        """
+        lines = []
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((s, list(h))
+                    for s, h in self._histograms.items())
+
+        for stage, histogram in histograms:
+            lines.append("{}: {} times, mean {:.1f} ms, p50 {} ms, p90 {} ms, "
+                    "p99 {} ms, max {:.1f} ms".format(stage, histogram[-3],
+                        histogram[-2] / histogram[-3],
+                        self._Percentile(histogram, 0.5),
+                        self._Percentile(histogram, 0.9),
+                        self._Percentile(histogram, 0.99), histogram[-1]))
+
+        for name, value in counters:
+            lines.append("{}: {}".format(name, value))
+
+        return lines
+
+
+class TexProjectRegistry(object):
+    """
+    Registry of the projects whose parsed information is kept in memory.
+
+    For each project the number of parsed objects is tracked, from which the
+    memory it occupies is estimated. The size of an object is measured once
+    for each type of objects from a sample of them. The projects are ordered
+    by their last use, so that the least recently used ones can be evicted as
+    soon as there are too many of them or they occupy too much memory.
+    """
+
+    # The number of objects of each type whose size is measured.
+    SampleSize = 100
+
+    # The size of a reference to an object in a list.
+    PointerSize = struct.calcsize("P")
+
+    def __init__(self, max_projects = 0, budget = 0):
+        """
+        Constructor
+
+        :param max_projects: The maximum number of projects. (Defaults to 0,
+                             which means no limit)
+        :type max_projects: int
+        :param budget: The maximum number of bytes which all projects occupy
+                       together. (Defaults to 0, which means no limit)
+        :type budget: int
+        """
+        self._max_projects = max_projects
+        self._budget = budget
+
+        # The number of bytes occupied by the objects of each project for each
+        # action, in the order of their last use.
+        self._projects = OrderedDict()
+        self._lock = threading.Lock()
+
+        # The measured number of bytes for each type of objects.
+        self._object_sizes = {}
+
+        self.evictions = 0
+
+    def Touch(self, project):
+        """
+        Mark a project as used right now.
+
+        :param project: The base directory of the project.
+        :type project: str
+        """
+        with self._lock:
+            sizes = self._projects.pop(project, None)
+            self._projects[project] = sizes if sizes is not None else {}
+
+    def Update(self, project, action, parts):
+        """
+        Set the objects of a project for an action.
+
+        :param project: The base directory of the project.
+        :type project: str
+        :param action: The action.
+        :type action: int
+        :param parts: A list containing the lists of objects of each file.
+        :type parts: list[list[TexObject]]
+        """
+        size = 0
+
+        for part in parts:
+            if part:
+                size += len(part) * self._ObjectSize(part)
+
+        with self._lock:
+            self._projects.setdefault(project, {})[action] = size
+
+    def _ObjectSize(self, objects):
+        """
+        Get the number of bytes which an object of the same type as the given
+        ones occupies, including the references to it in the list of its file
+        and in the merged list.
+
+        The size is measured only the first time a type is seen. The
+        completion data of the sample is built for this, since it is built for
+        almost every object sooner or later.
+
+        :param objects: Objects of the same type.
+        :type objects: list[TexObject]
+        :rtype: int
+        :return: The average number of bytes.
+        """
+        object_type = type(objects[0])
+
+        with self._lock:
+            size = self._object_sizes.get(object_type)
+
+        if size is None:
+            sample = objects[:self.SampleSize]
+
+            for o in sample:
+                o.completion_data()
+
+            size = sum(self._Measure(o) for o in sample) // len(sample) + \
+                    2 * self.PointerSize
+
+            with self._lock:
+                size = self._object_sizes.setdefault(object_type, size)
+
+        return size
+
+    def _Measure(self, value):
+        """
+        Measure the memory which a value occupies together with the values it
+        contains.
+
+        :param value: The value which is measured.
+        :type value: object
+        :rtype: int
+        :return: The number of bytes.
+        """
+        size = sys.getsizeof(value)
+
+        if isinstance(value, TexObject):
+            contained = [getattr(value, slot) for slot in value.__slots__]
+        elif isinstance(value, dict):
+            contained = list(value.keys()) + list(value.values())
+        elif isinstance(value, (list, tuple)):
+            contained = value
+        else:
+            contained = []
+
+        return size + sum(self._Measure(v) for v in contained if v is not None)
+
+    def _Size(self, sizes):
+        """
+        Determine the memory occupied by a project.
+
+        :param sizes: The number of bytes of the project for each action.
+        :type sizes: dict[int,int]
+        :rtype: int
+        :return: The number of bytes.
+        """
+        return sum(sizes.values())
+
+    def Victims(self, keep):
+        """
+        Determine which projects should be evicted.
+
+        :param keep: The base directory of a project which must be kept.
+        :type keep: str
+        :rtype: list[str]
+        :return: The base directories of the projects to evict, least
+                 recently used first.
+        """
+        with self._lock:
+            projects = list(self._projects.items())
+
+        count = len(projects)
+        size = sum(self._Size(s) for _, s in projects)
+        victims = []
+
+        for project, sizes in projects:
+            if (not self._max_projects or count <= self._max_projects) and \
+                    (not self._budget or size <= self._budget):
+                break
+
+            if project == keep:
+                continue
+
+            victims.append(project)
+            count -= 1
+            size -= self._Size(sizes)
+
+        return victims
+
+    def Remove(self, project):
+        """
+        Remove an evicted project.
+
+        :param project: The base directory of the project.
+        :type project: str
+        """
+        with self._lock:
+            if self._projects.pop(project, None) is not None:
+                self.evictions += 1
+
+    def Report(self):
+        """
+        Summarize the registered projects.
+
+        :rtype: str
+        :return: The summary.
+        """
+        with self._lock:
+            count = len(self._projects)
+            size = sum(self._Size(s) for s in self._projects.values())
+
+        return "Projects: {} (limit {}), about {:.1f} MiB (budget {}), " \
+                "{} evicted".format(count, self._max_projects or "none",
+                        size / 1048576.0, "{:.0f} MiB".format(
+                            self._budget / 1048576.0) if self._budget
+                        else "none", self.evictions)
+
+
+class _InotifyBackend(object):
+    """
+    Change detection for directories using the inotify interface of Linux.
+    """
+
+    # Events of interest (see inotify.h).
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_NONBLOCK = 0x00000800
+    IN_CLOEXEC = 0x00080000
+
+    EventMask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+            IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    # The fixed size part of an inotify event (wd, mask, cookie, len).
+    EventHeader = struct.Struct("iIII")
+
+    def __init__(self):
+        """
+        Constructor
+
+        :raises OSError: If inotify is not available on this system.
+        """
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._directories = {}
+
+        # The watches which were removed but whose removal was not confirmed
+        # by the kernel yet. Their remaining events are ignored.
+        self._removed = set()
+
+    def Add(self, directory):
+        """
+        Start watching the given directory.
+
+        :param directory: The directory which should be watched.
+        :type directory: str
+        """
+        path = directory if isinstance(directory, bytes) else \
+                directory.encode("utf-8")
+
+        wd = self._libc.inotify_add_watch(self._fd, path, self.EventMask)
+
+        if wd < 0:
+            logger.warn("Could not watch {}".format(directory))
+        else:
+            self._directories[wd] = directory
+            self._removed.discard(wd)
+
+    def Remove(self, directory):
+        """
+        Stop watching the given directory.
+
+        :param directory: The directory which should not be watched any more.
+        :type directory: str
+        """
+        for wd, watched in list(self._directories.items()):
+            if watched == directory:
+                self._removed.add(wd)
+                self._libc.inotify_rm_watch(self._fd, wd)
+
+    def Read(self, timeout):
+        """
+        Wait for changes in the watched directories.
+
+        :param timeout: The maximum time in seconds to wait for changes.
+        :type timeout: float
+        :rtype: set[str]
+        :return: The paths of all files which changed or None if changes were
+                 lost because the event queue overflowed.
+        """
+        changed = set()
+
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return changed
+
+        try:
+            data = os_read(self._fd, 64 * 1024)
+        except OSError:
+            return changed
+
+        pos = 0
+        while pos + self.EventHeader.size <= len(data):
+            wd, mask, _, length = self.EventHeader.unpack_from(data, pos)
+            pos += self.EventHeader.size
+
+            name = data[pos:pos + length].rstrip(b"\0")
+            pos += length
+
+            if wd in self._removed:
+                if mask & self.IN_IGNORED:
+                    # The kernel confirmed the removal of the watch.
+                    self._removed.discard(wd)
+                    self._directories.pop(wd, None)
+
+                continue
+
+            directory = self._directories.get(wd)
+            if mask & self.IN_Q_OVERFLOW or directory is None:
+                # Events were dropped or can not be assigned to a directory.
+                # So it is unknown which files changed.
+                return None
+
+            if not name:
+                continue
+
+            if not isinstance(name, str):
+                name = name.decode("utf-8", "replace")
+
+            changed.add(join(directory, name))
+
+        return changed
+
+    def Close(self):
+        """
+        Stop watching all directories.
+        """
+        os_close(self._fd)
+
+
+class _PollingBackend(object):
+    """
+    Change detection for directories by regularly comparing the modification
+    times and sizes of their files.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def _Scan(self, directory):
+        """
+        Take a snapshot of the files in the given directory.
+
+        :param directory: The directory of interest.
+        :type directory: str
+        :rtype: dict[str,(float,int)]
+        :return: The modification time and size of every file.
+        """
+        snapshot = {}
+
+        try:
+            names = listdir(directory)
+        except OSError:
+            return snapshot
+
+        for name in names:
+            path = join(directory, name)
+
+            try:
+                file_stat = stat(path)
+            except OSError:
+                continue
+
+            snapshot[path] = (file_stat.st_mtime, file_stat.st_size)
+
+        return snapshot
+
+    def Add(self, directory):
+        """
+        Start watching the given directory.
+
+        :param directory: The directory which should be watched.
+        :type directory: str
+        """
+        snapshot = self._Scan(directory)
+
+        with self._lock:
+            self._snapshots[directory] = snapshot
+
+    def Remove(self, directory):
+        """
+        Stop watching the given directory.
+
+        :param directory: The directory which should not be watched any more.
+        :type directory: str
+        """
+        with self._lock:
+            self._snapshots.pop(directory, None)
+
+    def Read(self, timeout):
+        """
+        Wait for changes in the watched directories.
+
+        :param timeout: The time in seconds to wait before looking for changes.
+        :type timeout: float
+        :rtype: set[str]
+        :return: The paths of all files which changed. Changes are never lost.
+        """
+        time.sleep(timeout)
+
+        changed = set()
+
+        with self._lock:
+            directories = list(self._snapshots.items())
+
+        for directory, old in directories:
+            new = self._Scan(directory)
+
+            for path in set(old) | set(new):
+                if old.get(path) != new.get(path):
+                    changed.add(path)
+
+            with self._lock:
+                if directory in self._snapshots:
+                    self._snapshots[directory] = new
+
+        return changed
+
+    def Close(self):
+        """
+        Stop watching all directories.
+        """
+        with self._lock:
+            self._snapshots.clear()
+
+
+class TexProjectWatcher(threading.Thread):
+    """
+    Background thread which watches the directories of a TeX project.
+
+    Changes are collected until no further change happened for a short time,
+    so that bursts of changes (e.g. by a checkout of a version control system)
+    are reported at once. If changes were lost, e.g. because too many of them
+    happened at once, this is reported right away and again when things
+    calmed down.
+    """
+
+    def __init__(self, on_change, on_lost, debounce = 0.5, interval = 1.0):
+        """
+        Constructor
+
+        :param on_change: The function which is called with the set of the
+                          paths of all changed files, or with None if changes
+                          were lost in the meantime.
+        :type on_change: (set[str]) -> None
+        :param on_lost: The function which is called as soon as changes were
+                        lost.
+        :type on_lost: () -> None
+        :param debounce: The time in seconds without any further change before
+                         the collected changes are reported. (Defaults to 0.5)
+        :type debounce: float
+        :param interval: The time in seconds between two checks for changes if
+                         inotify is not available. (Defaults to 1.0)
+        :type interval: float
+        """
+        super(TexProjectWatcher, self).__init__(name="TexProjectWatcher")
+        self.daemon = True
+
+        self._on_change = on_change
+        self._on_lost = on_lost
+        self._debounce = debounce
+        self._interval = interval
+
+        try:
+            self._backend = _InotifyBackend()
+        except (OSError, AttributeError) as e:
+            logger.info("Falling back to polling for changes: {}".format(e))
+            self._backend = _PollingBackend()
+
+        self._directories = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def Watch(self, path):
+        """
+        Start watching the given directory or the directory of the given file.
+
+        :param path: The directory or file which should be watched.
+        :type path: str
+        """
+        directory = path if isdir(path) else dirname(path)
+
+        with self._lock:
+            if directory in self._directories:
+                return
+
+            self._directories.add(directory)
+            self._backend.Add(directory)
+
+    def Unwatch(self, directory):
+        """
+        Stop watching the given directory.
+
+        :param directory: The directory which should not be watched any more.
+        :type directory: str
+        """
+        with self._lock:
+            if directory not in self._directories:
+                return
+
+            self._directories.remove(directory)
+            self._backend.Remove(directory)
+
+    def Stop(self, timeout = None):
+        """
+        Stop watching and wait for the thread to finish.
+
+        :param timeout: The maximum time in seconds to wait. (Defaults to None)
+        :type timeout: float
+        """
+        self._stopped.set()
+
+        if self.is_alive():
+            self.join(timeout)
+
+    def run(self):
+        pending = set()
+        lost = False
+        last_change = 0
+
+        while not self._stopped.is_set():
+            timeout = self._debounce if pending or lost else self._interval
+            changed = self._backend.Read(timeout)
+
+            if changed is None:
+                if not lost:
+                    try:
+                        self._on_lost()
+                    except Exception:
+                        logger.exception("Could not process lost changes")
+
+                lost = True
+                last_change = time.time()
+
+            elif changed:
+                pending.update(changed)
+                last_change = time.time()
+
+            elif (pending or lost) and \
+                    time.time() - last_change >= self._debounce:
+                # Things calmed down. Report all the changes at once.
+                try:
+                    self._on_change(None if lost else pending)
+                except Exception:
+                    logger.exception("Could not process changed files")
+
+                pending = set()
+                lost = False
+
+        self._backend.Close()
+
+
+class _RefreshCancelled(Exception):
+    """
+    Raised within a refresh in the background when it was cancelled.
+    """
+    pass
+
+
+class _RefreshTask(object):
+    """
+    A refresh of the objects for an action and a file in the background.
+    """
+
+    def __init__(self, key, project, request_data, collect):
+        """
+        Constructor
+
+        :param key: The action and the path to the file of the request.
+        :type key: (int, str)
+        :param project: The base directory of the project of the file.
+        :type project: str
+        :param request_data: The data of the request which triggered the
+                             refresh.
+        :type request_data: dict[str,str]
+        :param collect: The method which collects the objects.
+        :type collect: (dict[str,str]) -> list[TexObject]
+        """
+        self.key = key
+        self.project = project
+        self.request_data = request_data
+        self.collect = collect
+
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+
+class TexCompleter(Completer):
+
+    ###
+    # List of Latex commands and options known by the completer.
+    ###
+    BibliographyCommands = ["bibliography", "addbibresource", "addglobalbib"]
+    InputCommands = ["input", "include", "subfile"]
+    ReferenceCommands = ["ref", "refv", "autoref", "cref", "Cref", "eqref",
+            "pageref"]
+    CitationCommands = ["cite", "citep", "citet", "citev", "textcite",
+            "parencite", "citeauthor"]
+    GlossaryCommands = ["gls", "Gls", "GLS", "glspl", "Glspl", "GLSpl",
+            "glstext", "glsfirst", "glsdesc", "acrshort", "acrlong", "acrfull",
+            "Acrshort", "Acrlong", "Acrfull"]
+    SectioningCommands = ["chapter", "section", "subsection", "subsubsection",
+            "paragraph", "subparagraph"]
+    SpecialSectioningCommands = [("addchap", "chapter")]
+
+    # The types of objects which hyperref names differently in its anchors.
+    AnchorTypes = {"AMS" : "equation", "Item" : "item"}
+
+    ###
+    # Regular expressions used while parsing.
+    ###
+    _BraceTokens = re.compile(r"(?<!\\)[{}]")
+    _Key = re.compile(r"[^,\s]+")
+    _LabelCommand = re.compile(r"\\label\s*\{[^}]*\}")
+    _MagicRoot = re.compile(r"%\s*!\s*TeX\s+root\s*=\s*(.*\S)",
+            re.IGNORECASE)
+    _AuxTokens = re.compile(r"^\\(?:@input\{(?P<input>[^}]*)\}|" +
+            r"newlabel\{(?P<label>[^{}]*)\}\{" +
+            r"\{(?P<number>(?:[^{}]|\{(?:[^{}]|\{[^{}]*\})*\})*)\}" +
+            r"\{(?:[^{}]|\{(?:[^{}]|\{[^{}]*\})*\})*\}" +
+            r"(?:\{(?P<title>(?:[^{}]|\{(?:[^{}]|\{[^{}]*\})*\})*)\}" +
+            r"\{(?P<anchor>[^{}]*)\})?)", re.MULTILINE)
+    _AuxNumber = re.compile(r"\\relax\s*|[{}]")
+    _GlossaryName = re.compile(r"(?:^|,)\s*name\s*=\s*(\{[^{}]*\}|[^,]*)")
+
+    ###
+    # Version of the format of snapshot files. It must be increased whenever
+    # the parsed information changes its format.
+    ###
+    SnapshotVersion = 10
+
+    ###
+    # The amount of content (in bytes) for each parse method below which the
+    # worker processes are not used. Starting them and handing the content to
+    # them takes longer than parsing it right away. The fast Bibtex scanner
+    # parses about as fast as the scan of tex-files does.
+    ###
+    ParallelThresholds = {
+        "_ScanDocument" : 4 << 20,
+        "_GetAllCitables" : 128 << 10
+    }
+
+    ###
+    # List of supported VIM file types
+    ###
+    FileTypes = ["tex", "plaintex"]
+
+    ###
+    # Action which the completer supports
+    ###
+    class Actions(object):
+        NoAction = 0
+        Reference = 1
+        Citation = 2
+        Glossary = 3
+
+    def __init__(self, user_options):
+        super(TexCompleter, self).__init__(user_options)
+
+        # Counters and timings of the stages of all requests. Requests which
+        # take longer than the threshold (in milliseconds) are logged together
+        # with their breakdown. A threshold of 0 disables the logging.
+        self._statistics = TexStatistics()
+        self._slow_request_threshold = float(user_options.get(
+                'tex_slow_request_threshold', 0))
+
+        # The commands which trigger the completion of references, citations
+        # or glossary entries, including the ones the user added.
+        references = self.ReferenceCommands + self._ReadCommandList(
+                user_options, 'tex_reference_commands')
+        citations = self.CitationCommands + self._ReadCommandList(
+                user_options, 'tex_citation_commands')
+        glossary = self.GlossaryCommands + self._ReadCommandList(
+                user_options, 'tex_glossary_commands')
+
+        self._triggers = self._CompileTriggers(references, citations,
+                glossary)
+
+        # All tokens which are relevant to find the keys which are used by
+        # these commands.
+        self._usage_tokens = self._CompileUsageTokens(references, citations)
+
+        # All tokens of a document which are relevant for any kind of
+        # information the completer extracts from it.
+        self._document_tokens = self._CompileDocumentTokens(references,
+                citations)
+
+        # Results of parsing the files of the project which are reused as long
+        # as the files do not change.
+        self._file_cache = TexFileCache(
+                use_hash = user_options.get('tex_cache_use_hash', False))
+        self._file_cache.statistics = self._statistics
+
+        # Bibtex databases may be huge. Hence, they are read piece by piece by
+        # the index of their entries instead of at once.
+        self._file_cache.streamed.add("citables")
+
+        # The optional pool of worker processes which parse files in parallel.
+        # It is only started when it is needed for the first time, unless the
+        # workers can only be forked (see _StartPool).
+        self._workers = int(user_options.get('tex_parse_workers', 0))
+        if self._workers < 0:
+            self._workers = multiprocessing.cpu_count()
+
+        if multiprocessing.cpu_count() <= 1:
+            # The workers would only compete with ycmd for the single CPU.
+            self._workers = 0
+
+        # The completers of the workers only parse. Everything which starts
+        # threads or works on whole projects is disabled for them.
+        self._worker_options = dict(user_options, tex_parse_workers=0,
+                tex_watch_project=False, tex_snapshot_dir="",
+                tex_async=False, tex_diagnostics=False, tex_use_aux=False)
+        self._pool = None
+
+        if self._workers > 1 and not hasattr(multiprocessing, "get_context"):
+            self._pool = self._StartPool()
+
+        # The directories where bibliographies are searched in if they are not
+        # found relative to the document, like BibTeX does with BIBINPUTS.
+        self._bib_paths = self._ReadSearchPaths(user_options.get(
+            'tex_bib_paths', [])) + self._ReadSearchPaths(environ.get(
+                'BIBINPUTS', ""))
+
+        # The entries of all Bibtex databases which were parsed so far.
+        self._bib_index = TexBibliographyIndex(self._GetAllCitables,
+                self._ParseBibtexBatches if self._workers > 1 else None)
+
+        # The optional scanner which extracts the needed fields of Bibtex
+        # entries much faster than bibtexparser. Entries which it does not
+        # understand are still parsed by bibtexparser.
+        self._bibtex_scanner = None
+        if user_options.get('tex_fast_bibtex', False):
+            self._bibtex_scanner = TexBibtexScanner()
+
+        # Whether or not the completion data of the objects is built right
+        # when they are parsed instead of on the first request.
+        self._precompute_completions = user_options.get(
+                'tex_precompute_completions', False)
+
+        # Whether or not the candidates are filtered by the completer itself
+        # using an index of the completion texts, and how many of them are
+        # returned at most.
+        self._use_index = user_options.get('tex_use_index', False)
+        self._max_candidates = int(user_options.get(
+                'tex_max_candidates', 100))
+        self._indices = {}
+
+        # The merged objects of all files for each action and project.
+        self._merged = {}
+
+        # The locations where labels and keys are defined and used for each
+        # project. An index is only changed while the lock of its project is
+        # held.
+        self._locations = {}
+
+        # Whether or not the numbers of the referable objects are read from
+        # the .aux files of the last compilation, and the directory of these
+        # files relative to the base directory of the document. For each
+        # project the labels of all .aux files and the referable objects with
+        # their numbers are kept.
+        self._use_aux = user_options.get('tex_use_aux', False)
+        self._aux_directory = user_options.get('tex_aux_directory', "")
+        self._aux = {}
+        self._numbered = {}
+
+        # Whether or not problems like references to undefined labels are
+        # reported when a file is ready to be parsed, and whether or not
+        # Bibtex entries which are never cited are among them.
+        self._diagnostics = user_options.get('tex_diagnostics', False)
+        self._unused_entries = user_options.get('tex_unused_entries', False)
+
+        # The optional directory where snapshots of the parsed information of
+        # each project are stored, so that they survive restarts. For each
+        # loaded project the time of the last save and how often its files
+        # were parsed until then are remembered. The snapshots are written by
+        # a background thread, so that requests do not wait for them.
+        self._snapshot_dir = user_options.get('tex_snapshot_dir', "")
+        if self._snapshot_dir:
+            self._snapshot_dir = expanduser(self._snapshot_dir)
+
+        self._snapshot_interval = float(user_options.get(
+                'tex_snapshot_interval', 60))
+        self._snapshots = {}
+        self._snapshot_queue = Queue()
+        self._snapshot_writer = None
+
+        if self._snapshot_dir:
+            self._snapshot_writer = threading.Thread(
+                    target=self._WriteSnapshots, name="TexSnapshotWriter")
+            self._snapshot_writer.daemon = True
+            self._snapshot_writer.start()
+
+        # The files which belong to each project.
+        self._project_files = {}
+
+        # The projects whose parsed information is kept in memory. The least
+        # recently used ones are evicted if there are more of them than
+        # allowed or they occupy more memory (in MiB) than the budget.
+        self._registry = TexProjectRegistry(
+                max_projects = int(user_options.get('tex_max_projects', 20)),
+                budget = int(float(user_options.get('tex_memory_budget', 256))
+                    * 1048576))
+
+        # The root documents which were found for files that do not name
+        # their root themselves.
+        self._roots = {}
+
+        # The tex-files found in the directories which were searched so far.
+        # They are only remembered while the directories are watched.
+        self._tex_files = {}
+
+        # Whether or not requests are answered right away with the objects
+        # which are known already if checking the files for changes in the
+        # background takes longer than the timeout. Results which may be
+        # outdated are flagged as partial.
+        self._async = user_options.get('tex_async', False)
+        self._async_timeout = float(user_options.get('tex_async_timeout',
+            0.1))
+
+        # The maximum number of refreshes which run at the same time for
+        # each project. Further ones wait, but only the newest one for each
+        # action and file is kept.
+        self._max_refreshes = max(1, int(user_options.get(
+            'tex_async_refreshes', 1)))
+
+        # The running and the waiting refreshes, which are guarded by the
+        # refresh lock.
+        self._refreshes = {}
+        self._pending = {}
+        self._refresh_lock = threading.Lock()
+        self._refresh_local = threading.local()
+
+        # The base directory of the project of each file and a lock for each
+        # project. Only the thread which holds the lock of a project changes
+        # the information gathered for it, so that several projects can be
+        # handled in parallel. The root document of a file is determined
+        # before the lock is taken and kept for the request of the current
+        # thread. The parsed files themselves are shared by all projects and
+        # guarded by the file cache and the bibliography index.
+        self._file_projects = {}
+        self._project_locks = {}
+        self._request_local = threading.local()
+
+        # The objects found for each action and file together with the
+        # generation of the parsed information they were found in. The
+        # generation increases whenever the watcher brought changed files up
+        # to date.
+        self._results = {}
+        self._generation = 0
+
+        # The dictionaries of results, merged objects and indices are never
+        # changed but replaced by changed copies. Hence, they can be read
+        # without any lock. Only the replacement is guarded. The items which
+        # a request publishes are collected and replace each dictionary only
+        # once when the request is done.
+        self._publish_lock = threading.Lock()
+
+        # The optional background thread which keeps the parsed files up to
+        # date, so that requests do not need to check the files themselves.
+        self._watcher = None
+
+        if user_options.get('tex_watch_project', False):
+            self._watcher = TexProjectWatcher(self._OnFilesChanged,
+                    self._OnChangesLost, debounce = float(user_options.get(
+                        'tex_watch_debounce', 0.5)))
+            self._watcher.start()
+
+            self._file_cache.validate = False
+
+    def Shutdown(self):
+        with self._refresh_lock:
+            for task in chain(self._pending.values(),
+                    chain.from_iterable(self._refreshes.values())):
+                task.cancelled.set()
+
+            self._pending.clear()
+
+        if self._watcher is not None:
+            self._watcher.Stop(timeout = 5)
+            self._watcher = None
+
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+        for base_dir in list(self._snapshots):
+            self._SaveSnapshot(base_dir, force = True)
+
+        if self._snapshot_writer is not None:
+            # Wait until all snapshots are written.
+            self._snapshot_queue.put(None)
+            self._snapshot_writer.join()
+            self._snapshot_writer = None
+
+    def DebugInfo(self, request_data):
+        file_name = request_data['filepath']
+
+        lookups = self._file_cache.hits + self._file_cache.misses
+
+        info = "TeX Completer for {}\n" \
+               "  File cache: {} entries, {} hits, {} misses ({:.1f}% hits)\n" \
+               "  Bibtex index: {} entries parsed, {} reused".format(file_name,
+                       len(self._file_cache), self._file_cache.hits,
+                       self._file_cache.misses,
+                       100.0 * self._file_cache.hits / max(lookups, 1),
+                       self._bib_index.parsed, self._bib_index.reused)
+
+        info += "\n  " + self._registry.Report()
+
+        if self._async:
+            with self._refresh_lock:
+                info += "\n  Refreshes: {} running, {} waiting".format(
+                        sum(len(r) for r in self._refreshes.values()),
+                        len(self._pending))
+
+        return "\n  ".join([info] + self._statistics.Report())
+
+    def SupportedFiletypes(self):
+        return self.FileTypes
+
+    def OnFileReadyToParse(self, request_data):
+        if not self._diagnostics:
+            return []
+
+        file_name = request_data['filepath']
+
+        with self._statistics.Measure("diagnostics"):
+            with self._LockProject(file_name, self._GetBuffers(request_data)):
+                index = self._GetLocationIndex(request_data)
+
+                # Bibtex databases are never opened as tex-files. So their
+                # problems, like entries which are never cited, are reported
+                # together with the ones of the tex-file.
+                problems = index.Problems(file_name) + list(chain.from_iterable(
+                    index.Problems(f) for f in index.Files()
+                    if f != file_name and splitext(f)[1] == ".bib"))
+
+        self._UseProject(file_name)
+
+        return [BuildDiagnosticData(self._BuildDiagnostic(problem, key))
+                for problem, key in problems]
+
+    def GetSubcommandsMap(self):
+        return {
+            'GoToDefinition' : (lambda self, request_data, args:
+                self._GoToDefinition(request_data)),
+            'GoToReferences' : (lambda self, request_data, args:
+                self._GoToReferences(request_data))
+        }
+
+    def ShouldUseNowInner(self, request_data):
+        return self._GetAction(request_data) != self.Actions.NoAction
+
+    def ComputeCandidates(self, request_data):
+        if not self._use_index and not self._async:
+            return super(TexCompleter, self).ComputeCandidates(request_data)
+
+        # The index already filters and sorts the candidates for the query.
+        # Hence, neither the generic filtering nor the candidate cache, which
+        # ignores the query, must be used. The candidate cache must not be
+        # used for asynchronous requests either, since the candidates change
+        # when a refresh finishes.
+        if not self.ShouldUseNow(request_data):
+            return []
+
+        candidates = self.ComputeCandidatesInner(request_data)
+
+        if not self._use_index and request_data['query']:
+            candidates = self.FilterAndSortCandidates(candidates,
+                    request_data['query'])
+
+        return candidates
+
+    def ComputeCandidatesInner(self, request_data):
+        action = self._GetAction(request_data)
+
+        with self._statistics.Request() as breakdown:
+            if action == self.Actions.Citation:
+                candidates = self._CollectCitables(request_data)
+            elif action == self.Actions.Reference:
+                candidates = self._CollectReferables(request_data)
+            elif action == self.Actions.Glossary:
+                candidates = self._CollectGlossaryEntries(request_data)
+            else:
+                candidates = []
+
+            self._statistics.Count("candidates returned", len(candidates))
+
+        if self._slow_request_threshold > 0 and \
+                breakdown["request [ms]"] > self._slow_request_threshold:
+            logger.warn("Slow request for {}: {}".format(
+                request_data['filepath'], ", ".join("{} {:.1f}".format(k, v)
+                    if isinstance(v, float) else "{} {}".format(k, v)
+                    for k, v in sorted(breakdown.items()))))
+
+        return candidates
+
+    def _GetAction(self, request_data):
+        """
+        Determine which action is requested by the command in front of the
+        text which is currently typed.
+
+        The action is determined for every request anew, so that requests can
+        be handled concurrently.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,str]
+        :rtype: int
+        :return: The requested action.
+        """
+        # Extract the last command
+        current_line = request_data['line_value']
+        word_start = CharacterIndex(current_line, request_data['start_column'])
+
+        # As according to the documentation the start_column points to the
+        # begin of the word which is currently typed, the last command ends
+        # at exactly this position. Like all columns of ycmd, it counts the
+        # bytes of the UTF-8 encoded line.
+        last_command = current_line[:word_start]
+
+        trigger = self._triggers.search(last_command)
+
+        if trigger is None:
+            return self.Actions.NoAction
+
+        elif trigger.group("reference") is not None:
+            return self.Actions.Reference
+
+        elif trigger.group("glossary") is not None:
+            return self.Actions.Glossary
+
+        return self.Actions.Citation
+
+    def _ReadCommandList(self, user_options, name):
+        """
+        Read a list of command names from the user options.
+
+        :param user_options: The options of the user.
+        :type user_options: dict[str,object]
+        :param name: The name of the option. Its value is either a list or a
+                     comma separated string of command names, with or without
+                     the leading backslash.
+        :type name: str
+        :rtype: list[str]
+        :return: The command names without the leading backslash.
+        """
+        commands = user_options.get(name, [])
+
+        if not isinstance(commands, list):
+            commands = str(commands).split(",")
+
+        return [c.strip().lstrip("\\") for c in commands if c.strip()]
+
+    def _CompileTriggers(self, references, citations, glossary):
+        """
+        Build the regular expression which finds a command triggering the
+        completion at the end of a line.
+
+        Besides the command with its opening brace, it matches a star, up to
+        two optional arguments in brackets, and the keys which were already
+        entered into the argument (e.g. '\\cite[p.~5]{knuth84,').
+
+        :param references: The names of all reference commands.
+        :type references: list[str]
+        :param citations: The names of all citation commands.
+        :type citations: list[str]
+        :param glossary: The names of all commands which use glossary
+                         entries.
+        :type glossary: list[str]
+        :rtype: re.RegexObject
+        :return: The compiled regular expression. Either its group
+                 'reference', 'citation' or 'glossary' holds the matched
+                 command.
+        """
+        def alternatives(commands):
+            # Longer names first, so that no name shadows a longer one.
+            return "|".join(re.escape(c) for c in
+                    sorted(set(commands), key=len, reverse=True))
+
+        return re.compile(r"\\(?:(?P<reference>" + alternatives(references) +
+                r")|(?P<citation>" + alternatives(citations) +
+                r")|(?P<glossary>" + alternatives(glossary) + r"))" +
+                r"\*?(?:[ \t]*\[[^\[\]]*\]){0,2}[ \t]*\{(?:[^{},]*,)*\s*\Z")
+
+    def _CompileUsageTokens(self, references, citations):
+        """
+        Build the regular expression which finds all commands that use or
+        define labels and keys.
+
+        :param references: The names of all reference commands.
+        :type references: list[str]
+        :param citations: The names of all citation commands.
+        :type citations: list[str]
+        :rtype: re.RegexObject
+        :return: The compiled regular expression. Either its group 'comment',
+                 'reference', 'citation' or 'label' matched. The group 'keys'
+                 holds the argument of the command.
+        """
+        def alternatives(commands):
+            # Longer names first, so that no name shadows a longer one.
+            return "|".join(re.escape(c) for c in
+                    sorted(set(commands), key=len, reverse=True))
+
+        return re.compile(r"(?P<comment>(?<!\\)%[^\n]*)|" +
+                r"\\(?:(?P<reference>" + alternatives(references) +
+                r")|(?P<citation>" + alternatives(citations) +
+                r")|(?P<label>label))\*?(?:\s*\[[^\[\]]*\]){0,2}\s*" +
+                r"\{(?P<keys>[^{}]*)\}")
+
+    def _GetKeys(self, token):
+        """
+        Get the keys in the argument of a command found by the usage tokens.
+
+        :param token: The match of the usage tokens.
+        :type token: re.MatchObject
+        :rtype: generator[(str, int)]
+        :return: Each key together with its position in the matched string.
+        """
+        begin = token.start("keys")
+
+        for key in self._Key.finditer(token.group("keys")):
+            yield (key.group(), begin + key.start())
+
+    def _GetKeyAtCursor(self, request_data):
+        """
+        Determine the label or key under the cursor.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,object]
+        :rtype: (int, str)
+        :return: The action which uses the key and the key itself.
+        :raises RuntimeError: If there is no label or key under the cursor.
+        """
+        line = request_data['line_value']
+        column = CharacterIndex(line, request_data['column_num'])
+
+        for token in self._usage_tokens.finditer(line):
+            if token.group("comment") is not None or \
+                    not token.start() <= column <= token.end():
+                continue
+
+            action = self.Actions.Citation if token.group("citation") \
+                    else self.Actions.Reference
+
+            keys = list(self._GetKeys(token))
+
+            # On the command itself, the first key is meant.
+            for key, begin in keys:
+                if begin <= column <= begin + len(key):
+                    return (action, key)
+
+            if keys and column < keys[0][1]:
+                return (action, keys[0][0])
+
+        raise RuntimeError("There is no label or key under the cursor.")
+
+    def _BuildDiagnostic(self, problem, key):
+        """
+        Describe a problem of a label or key in the format of ycmd.
+
+        :param problem: The file name, the line, the column, the kind and the
+                        text of the problem.
+        :type problem: (str, int, int, str, str)
+        :param key: The affected label or key.
+        :type key: str
+        :rtype: Diagnostic
+        :return: The diagnostic which covers the key.
+        """
+        file_name, line, column, kind, text = problem
+
+        location = Location(line, column, file_name)
+        extent = Range(location, Location(line,
+            column + len(key.encode("utf-8")), file_name))
+
+        return Diagnostic([extent], location, extent, text, kind)
+
+    def _GoToDefinition(self, request_data):
+        """
+        Find where the label or key under the cursor is defined.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,object]
+        :rtype: dict[str,object] | list[dict[str,object]]
+        :return: The location of the definition, or all of them if it is
+                 defined several times.
+        :raises RuntimeError: If there is no label or key under the cursor or
+                              its definition can not be found.
+        """
+        action, key = self._GetKeyAtCursor(request_data)
+        locations = self._FindLocations(request_data, "Definitions", action,
+                key)
+
+        if not locations:
+            raise RuntimeError("Can't find the definition of '{}'.".format(
+                key))
+
+        responses = [BuildGoToResponse(file_name, line, column)
+                for file_name, line, column in locations]
+
+        return responses[0] if len(responses) == 1 else responses
+
+    def _GoToReferences(self, request_data):
+        """
+        Find where the label or key under the cursor is used.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,object]
+        :rtype: list[dict[str,object]]
+        :return: The locations of all usages.
+        :raises RuntimeError: If there is no label or key under the cursor or
+                              it is not used at all.
+        """
+        action, key = self._GetKeyAtCursor(request_data)
+        locations = self._FindLocations(request_data, "Usages", action, key)
+
+        if not locations:
+            raise RuntimeError("Can't find any usage of '{}'.".format(key))
+
+        return [BuildGoToResponse(file_name, line, column, key)
+                for file_name, line, column in locations]
+
+    def _FindLocations(self, request_data, kind, action, key):
+        """
+        Look up the locations of a label or key in the index of the project.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,object]
+        :param kind: Either 'Definitions' or 'Usages'.
+        :type kind: str
+        :param action: The action which uses the key.
+        :type action: int
+        :param key: The label or key.
+        :type key: str
+        :rtype: list[(str, int, int)]
+        :return: The file name, the line and the column of each location.
+        """
+        file_name = request_data['filepath']
+
+        with self._LockProject(file_name, self._GetBuffers(request_data)):
+            index = self._GetLocationIndex(request_data)
+
+            locations = list(getattr(index, kind)(action, key))
+
+        self._UseProject(file_name)
+
+        return locations
+
+    def _GetLocationIndex(self, request_data):
+        """
+        Bring the index of the locations of all labels and keys of the
+        document up to date. The lock of the project must be held.
+
+        Only files which changed since the last time contribute anew.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,object]
+        :rtype: TexLocationIndex
+        :return: The index of the project.
+        """
+        base_dir, tex_files = self._GetProjectFiles(request_data)
+
+        index = self._Published("_locations", base_dir)
+        if index is None:
+            index = TexLocationIndex(unused = self._unused_entries)
+            self._Publish("_locations", base_dir, index)
+
+        indexed = set()
+        bib_files = []
+
+        for tex_file_name in tex_files:
+            try:
+                document = self._GetDocument(tex_file_name)
+            except IOError:
+                continue
+
+            index.Update(tex_file_name, (document,),
+                    ((self.Actions.Reference, r.completion()) + r.position()
+                        for r in document.referables
+                        if r.position() is not None),
+                    document.usages)
+            indexed.add(tex_file_name)
+
+            bib_files.extend(self._UseBibliography(bib, base_dir)
+                    for bib in document.bibliographies)
+
+        if self._use_aux:
+            # Labels of external documents are completed. So they are defined
+            # in the .aux files of these documents.
+            labels = self._GetAuxLabels(base_dir, tex_files)
+            definitions = {}
+
+            for label, (_, _, _, location) in labels.items():
+                if location is not None:
+                    definitions.setdefault(location[0], []).append(
+                            (self.Actions.Reference, label) + location[1:])
+
+            for aux_file_name, aux_definitions in definitions.items():
+                index.Update(aux_file_name, (labels,), aux_definitions, [])
+                indexed.add(aux_file_name)
+
+        for bib_file_name in bib_files:
+            if bib_file_name in indexed:
+                continue
+
+            try:
+                self._file_cache.Get(bib_file_name, "citables",
+                        self._bib_index.Update)
+            except IOError:
+                continue
+
+            positions = self._bib_index.Positions(bib_file_name)
+
+            index.Update(bib_file_name, (positions,),
+                    ((self.Actions.Citation, key) + position
+                        for key, position in positions.items()), [])
+            indexed.add(bib_file_name)
+
+        for file_name in index.Files():
+            if file_name not in indexed:
+                index.Remove(file_name)
+
+        return index
+
+    def _CollectReferables(self, request_data):
+        """
+        Create the YCM compatible list of all referable objects which could be
+        found.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,str]
+        :rtype: list[dict[str,str]]
+        :return: A list of all referable objects which could be found in a format
+                 which YCM understands.
+
+        """
+        referables, outdated = self._GetObjects(self.Actions.Reference,
+                request_data, self._CollectReferablesInner)
+
+        if self._use_index:
+            referables = self._QueryIndex((self.Actions.Reference,
+                self._file_projects.get(request_data['filepath'])), referables,
+                request_data['query'])
+
+        with self._statistics.Measure("payload building"):
+            return [ r.completion_data(outdated = outdated)
+                    for r in referables ]
+
+    def _GetObjects(self, action, request_data, collect):
+        """
+        Get the objects for a request.
+
+        In asynchronous mode, the objects which were found by the last refresh
+        are returned right away while a new refresh is started in the
+        background.
+
+        :param action: The action of the request.
+        :type action: int
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,str]
+        :param collect: The method which collects the objects.
+        :type collect: (dict[str,str]) -> list[TexObject]
+        :rtype: (list[TexObject], bool)
+        :return: A tuple containing the sorted list of objects and whether or
+                 not it may be outdated or incomplete.
+        """
+        key = (action, request_data['filepath'])
+
+        if not self._async:
+            buffers = self._GetBuffers(request_data)
+            generation = (self._generation, frozenset((f, b[0]) for f, b in
+                buffers.items()))
+
+            if self._watcher is not None and not self._file_cache.validate:
+                # The watcher keeps the parsed information up to date. If it
+                # did not change anything since the objects were found and
+                # the unsaved files are the same, they are still valid.
+                found, objects = self._results.get(key, (None, None))
+
+                if found == generation:
+                    return (objects, False)
+
+            with self._LockProject(key[1], buffers):
+                objects = collect(request_data)
+
+                if self._watcher is not None:
+                    self._Publish("_results", key, (generation, objects))
+
+            self._UseProject(key[1])
+
+            return (objects, False)
+
+        task = self._ScheduleRefresh(key, request_data, collect)
+        self._UseProject(key[1])
+
+        # Most refreshes only need to check that nothing changed. Give them
+        # the chance to finish.
+        task.done.wait(self._async_timeout)
+        objects = self._results.get(key, (None, None))[1]
+
+        outdated = objects is None or not task.done.is_set()
+        if outdated:
+            self._statistics.Count("partial results")
+
+        return (objects or [], outdated)
+
+    def _GetBuffers(self, request_data):
+        """
+        Get the unsaved content of the tex-files which are open in the editor.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,object]
+        :rtype: dict[str,(str, str)]
+        :return: The hash and the content of each open tex-file.
+        """
+        buffers = {}
+
+        for file_name, data in (request_data.get('file_data') or {}).items():
+            if data.get('contents') is None or set(data.get('filetypes',
+                self.FileTypes)).isdisjoint(self.FileTypes):
+                continue
+
+            buffers[normpath(file_name)] = (ContentHash(data['contents']),
+                    data['contents'])
+
+        return buffers
+
+    def _ProjectLock(self, project):
+        """
+        Get the lock which must be held while the parsed information of the
+        files of a project is changed.
+
+        :param project: The base directory of the project.
+        :type project: str
+        :rtype: threading.Lock
+        :return: The lock of the project.
+        """
+        lock = self._project_locks.get(project)
+
+        if lock is None:
+            with self._publish_lock:
+                lock = self._project_locks.setdefault(project,
+                        threading.Lock())
+
+        return lock
+
+    def _AcquireProject(self, project):
+        """
+        Acquire the lock of a project.
+
+        An evicted project drops its lock. Threads which waited for the
+        dropped lock take the new lock of the project instead.
+
+        :param project: The base directory of the project.
+        :type project: str
+        :rtype: threading.Lock
+        :return: The acquired lock, which the caller must release.
+        """
+        while True:
+            lock = self._ProjectLock(project)
+            lock.acquire()
+
+            if self._project_locks.get(project) is lock:
+                return lock
+
+            lock.release()
+
+    def _ResolveProject(self, file_name):
+        """
+        Determine the base directory and the root document of the document of
+        a file.
+
+        :param file_name: The path to the file of interest.
+        :type file_name: str
+        :rtype: (str, str)
+        :return: A tuple containing the base directory of the document and the
+                 path to its root document or None if there is none.
+        """
+        if isdir(file_name):
+            return (file_name, None)
+
+        root = self._FindRoot(file_name)
+
+        # Use the corresponding directory if the file path points to a file.
+        return (dirname(root if root is not None else file_name), root)
+
+    @contextmanager
+    def _LockProject(self, file_name, buffers = None):
+        """
+        Hold the lock of the project of a file within this context and use
+        the unsaved content of the open files.
+
+        The root document of the file is determined before the lock is taken,
+        so that all files of a document use the same lock right away. The
+        unsaved content is already used for this, so that open files are only
+        scanned once and a changed '%!TEX root' comment is noticed. The
+        snapshot of the project is loaded even earlier, so that determining the
+        root document does not parse the files which the snapshot knows. The
+        root is kept for the current thread while the lock is held. The items
+        which are published within this context are published together before
+        the lock is released.
+
+        :param file_name: The path to the file of the request.
+        :type file_name: str
+        :param buffers: The hash and the content of each open file.
+                        (Defaults to None)
+        :type buffers: dict[str,(str, str)]
+        """
+        self._LoadNearestSnapshot(file_name)
+
+        with self._file_cache.Buffers(buffers or {}):
+            base_dir, root = self._ResolveProject(file_name)
+            lock = self._AcquireProject(base_dir)
+
+            self._request_local.root = (file_name, base_dir, root)
+            self._request_local.published = {}
+
+            try:
+                yield
+            finally:
+                published = self._request_local.published
+
+                self._request_local.root = None
+                self._request_local.published = None
+
+                with self._publish_lock:
+                    for attribute, items in published.items():
+                        replacement = dict(getattr(self, attribute))
+                        replacement.update(items)
+
+                        setattr(self, attribute, replacement)
+
+                lock.release()
+
+    def _Publish(self, attribute, key, value):
+        """
+        Replace a dictionary which is read without locks by a copy which
+        contains the given item.
+
+        Within the context of _LockProject the item is only collected and
+        published together with the other items of the request.
+
+        :param attribute: The name of the attribute which holds the
+                          dictionary.
+        :type attribute: str
+        :param key: The key of the item.
+        :type key: object
+        :param value: The value of the item.
+        :type value: object
+        """
+        pending = getattr(self._request_local, "published", None)
+
+        if pending is not None:
+            pending.setdefault(attribute, {})[key] = value
+            return
+
+        with self._publish_lock:
+            published = dict(getattr(self, attribute))
+            published[key] = value
+
+            setattr(self, attribute, published)
+
+    def _Published(self, attribute, key, default = None):
+        """
+        Get an item of a dictionary which is read without locks, including
+        the items which the request of the current thread did not publish yet.
+
+        :param attribute: The name of the attribute which holds the
+                          dictionary.
+        :type attribute: str
+        :param key: The key of the item.
+        :type key: object
+        :param default: The value if there is no such item. (Defaults to None)
+        :type default: object
+        :rtype: object
+        :return: The value of the item.
+        """
+        pending = getattr(self._request_local, "published", None) or {}
+
+        if key in pending.get(attribute, {}):
+            return pending[attribute][key]
+
+        return getattr(self, attribute).get(key, default)
+
+    def _Retract(self, attribute, keys):
+        """
+        Replace a dictionary which is read without locks by a copy which lacks
+        the given items.
+
+        :param attribute: The name of the attribute which holds the
+                          dictionary.
+        :type attribute: str
+        :param keys: A function which tells whether or not a key is removed.
+        :type keys: (object) -> bool
+        """
+        with self._publish_lock:
+            setattr(self, attribute, dict((k, v) for k, v in
+                getattr(self, attribute).items() if not keys(k)))
+
+    def _UseProject(self, file_name):
+        """
+        Mark the project of a file as used and evict the least recently used
+        projects if the registry exceeds its limits.
+
+        Projects which are busy are skipped and evicted later.
+
+        :param file_name: The path to the file of a request.
+        :type file_name: str
+        """
+        project = self._file_projects.get(file_name)
+
+        if project is None:
+            return
+
+        self._registry.Touch(project)
+
+        for victim in self._registry.Victims(project):
+            lock = self._ProjectLock(victim)
+
+            if not lock.acquire(False):
+                continue
+
+            try:
+                # Another thread may have evicted the project meanwhile.
+                if self._project_locks.get(victim) is lock:
+                    self._EvictProject(victim)
+            finally:
+                lock.release()
+
+    def _EvictProject(self, project):
+        """
+        Drop all parsed information of a project while its lock is held.
+
+        The snapshot of the project is saved first, so that it can be loaded
+        quickly when the project is used again. Files which also belong to
+        other projects are kept.
+
+        The lock of the project is dropped, as well as the watches of the
+        directories which no other project needs.
+
+        :param project: The base directory of the project.
+        :type project: str
+        """
+        logger.debug("Evict project {}".format(project))
+
+        self._SaveSnapshot(project, force = True)
+        self._snapshots.pop(project, None)
+
+        files = self._project_files.pop(project, set())
+        for other in list(self._project_files.values()):
+            files = files - other
+
+        for file_name in files:
+            self._file_cache.Invalidate(file_name)
+            self._bib_index.Remove(file_name)
+            self._roots.pop(file_name, None)
+
+        for file_name, base_dir in list(self._file_projects.items()):
+            if base_dir == project:
+                self._file_projects.pop(file_name, None)
+                self._roots.pop(file_name, None)
+                files.add(file_name)
+
+        self._Retract("_merged", lambda k: k[1] == project)
+        self._Retract("_indices", lambda k: k[1] == project)
+        self._Retract("_locations", lambda k: k == project)
+        self._Retract("_aux", lambda k: k == project)
+        self._Retract("_numbered", lambda k: k[1] == project)
+        self._Retract("_results", lambda k: k[1] in files)
+
+        if self._watcher is not None:
+            needed = self._SearchedDirectories(chain.from_iterable(list(
+                self._project_files.values()))) | set(self._project_files)
+
+            for directory in (self._SearchedDirectories(files) |
+                    set([project])) - needed:
+                self._tex_files.pop(directory, None)
+                self._watcher.Unwatch(directory)
+
+        with self._publish_lock:
+            self._project_locks.pop(project, None)
+
+        self._registry.Remove(project)
+        self._statistics.Count("projects evicted")
+
+    def _SearchedDirectories(self, file_names):
+        """
+        Get the directories which were watched for the given files, i.e. their
+        own directories and the parent directories which were searched for
+        their root documents.
+
+        :param file_names: The paths to the files of interest.
+        :type file_names: iterable[str]
+        :rtype: set[str]
+        :return: The directories.
+        """
+        directories = set()
+
+        for file_name in file_names:
+            directories.add(dirname(file_name))
+            directories.add(dirname(dirname(file_name)))
+
+        return directories
+
+    def _ScheduleRefresh(self, key, request_data, collect):
+        """
+        Start a refresh of the objects for an action and a file in the
+        background or let it wait until a refresh of the project finished.
+
+        A waiting or running refresh for the same action and file is
+        superseded by the new one and cancelled. The files which a cancelled
+        refresh parsed already stay in the cache.
+
+        :param key: The action and the path to the file of the request.
+        :type key: (int, str)
+        :param request_data: The data of the request.
+        :type request_data: dict[str,str]
+        :param collect: The method which collects the objects.
+        :type collect: (dict[str,str]) -> list[TexObject]
+        :rtype: _RefreshTask
+        :return: The refresh.
+        """
+        with self._refresh_lock:
+            # Determining the root document may take a while. So refreshes
+            # are grouped by the last known project of the file, while the
+            # refresh itself takes the lock of the project of its root.
+            project = self._file_projects.get(key[1], dirname(key[1]))
+            task = _RefreshTask(key, project, request_data, collect)
+
+            superseded = self._pending.pop(key, None)
+            if superseded is not None:
+                superseded.cancelled.set()
+                self._statistics.Count("refreshes cancelled")
+
+            running = self._refreshes.setdefault(project, [])
+
+            for superseded in running:
+                if superseded.key == key and not superseded.cancelled.is_set():
+                    superseded.cancelled.set()
+                    self._statistics.Count("refreshes cancelled")
+
+            if len(running) < self._max_refreshes and \
+                    all(t.key != key for t in running):
+                self._StartRefresh(task)
+            else:
+                self._pending[key] = task
+
+        return task
+
+    def _StartRefresh(self, task):
+        """
+        Run a refresh in a background thread. The refresh lock must be held.
+
+        :param task: The refresh.
+        :type task: _RefreshTask
+        """
+        self._refreshes.setdefault(task.project, []).append(task)
+        self._statistics.Count("refreshes started")
+
+        thread = threading.Thread(target=self._Refresh, args=(task,),
+                name="TexRefresh")
+        thread.daemon = True
+        thread.start()
+
+    def _Refresh(self, task):
+        """
+        Collect the objects of a refresh and start the next waiting refresh
+        of the same project afterwards.
+
+        :param task: The refresh.
+        :type task: _RefreshTask
+        """
+        self._refresh_local.task = task
+
+        try:
+            generation = self._generation
+
+            with self._LockProject(task.key[1], self._GetBuffers(
+                task.request_data)):
+                self._CheckCancelled()
+
+                objects = task.collect(task.request_data)
+
+                self._Publish("_results", task.key, (generation, objects))
+
+            self._UseProject(task.key[1])
+
+        except _RefreshCancelled:
+            logger.debug("Refresh of {} was cancelled".format(task.key[1]))
+
+        except Exception:
+            logger.exception("Could not refresh {}".format(task.key[1]))
+
+        finally:
+            self._refresh_local.task = None
+
+            with self._refresh_lock:
+                self._refreshes[task.project].remove(task)
+                task.done.set()
+
+                running = self._refreshes[task.project]
+
+                for key, waiting in list(self._pending.items()):
+                    if len(running) >= self._max_refreshes:
+                        break
+
+                    if waiting.project == task.project and \
+                            all(t.key != key for t in running):
+                        del self._pending[key]
+                        self._StartRefresh(waiting)
+
+                if not running:
+                    del self._refreshes[task.project]
+
+    def _CheckCancelled(self):
+        """
+        Stop the refresh which runs in the current thread if it was
+        cancelled.
+
+        :raises _RefreshCancelled: If the refresh was cancelled.
+        """
+        task = getattr(self._refresh_local, "task", None)
+
+        if task is not None and task.cancelled.is_set():
+            raise _RefreshCancelled()
+
+    def _CollectReferablesInner(self, request_data):
+        """
+        Create a list of all referable objects which could be found.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,str]
+        :rtype: list[TexReferable]
+        :return: A list of all referable objects which could be found.
+        """
+        base_dir, referables = self._GatherReferables(request_data)
+
+        return self._Merge((self.Actions.Reference, base_dir), referables)
+
+    def _GatherReferables(self, request_data):
+        """
+        Gather the referable objects of all files of the document.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,str]
+        :rtype: (str, list[list[TexReferable]])
+        :return: A tuple containing the base directory of the document and a
+                 list containing the list of referable objects of each file.
+        """
+        referables = []
+
+        base_dir, tex_files = self._GetProjectFiles(request_data)
+
+        self._statistics.Count("tex-files scanned", len(tex_files))
+
+        self._Prefetch(tex_files, "document", self._ScanDocument)
+
+        for tex_file_name in tex_files:
+            self._CheckCancelled()
+
+            try:
+                logger.debug("Get referables from {}".format(tex_file_name))
+
+                # Add all the referable objects which are found in the current
+                # file to the overall list. The file is only parsed again if it
+                # changed since the last request.
+                referables.append(self._GetDocument(tex_file_name).referables)
+
+            except IOError as e:
+                # The file could somehow not be opened. Skip it.
+                logger.warn("Could not open {} for inspection".format(
+                    tex_file_name))
+
+        self._SaveSnapshot(base_dir)
+
+        if self._use_aux:
+            referables = self._NumberReferables(base_dir, tex_files,
+                    referables)
+
+        return (base_dir, referables)
+
+    def _NumberReferables(self, base_dir, tex_files, referables):
+        """
+        Add the numbers from the .aux files of the document to the referable
+        objects.
+
+        Labels of external documents (see package xr) are added as referable
+        objects of their own. Other labels which are only known from the .aux
+        files were removed since the last compilation and are left out. The
+        result is only built again if the objects or the .aux files changed.
+
+        :param base_dir: The base directory of the document.
+        :type base_dir: str
+        :param tex_files: The tex-files of the document.
+        :type tex_files: list[str]
+        :param referables: A list containing the list of referable objects of
+                           each file.
+        :type referables: list[list[TexReferable]]
+        :rtype: list[list[TexReferable]]
+        :return: The lists of numbered referable objects.
+        """
+        labels = self._GetAuxLabels(base_dir, tex_files)
+        key = (self.Actions.Reference, base_dir)
+
+        parts, numbered_labels, numbered = self._Published("_numbered", key,
+                (None, None, None))
+
+        if numbered is not None and numbered_labels is labels and \
+                len(parts) == len(referables) and \
+                all(a is b for a, b in zip(parts, referables)):
+            return numbered
+
+        with self._statistics.Measure("numbering"):
+            numbered = []
+            found = set()
+
+            for part in referables:
+                numbered_part = []
+
+                for referable in part:
+                    found.add(referable.completion())
+                    entry = labels.get(referable.completion())
+
+                    if entry is not None and entry[0]:
+                        referable = referable.numbered(entry[0])
+
+                    numbered_part.append(referable)
+
+                numbered.append(numbered_part)
+
+            numbered.append(sorted((TexReferable(label, name=title or
+                "No Name", ref_type=ref_type, number=number).shorten(
+                    "No Name") for label, (number, title, ref_type, location)
+                in labels.items() if location is not None and
+                label not in found), key=methodcaller("sort_key")))
+
+        self._Publish("_numbered", key, (referables, labels, numbered))
+
+        return numbered
+
+    def _GetAuxLabels(self, base_dir, tex_files):
+        """
+        Get the labels of all .aux files of the document and of the external
+        documents it refers to.
+
+        :param base_dir: The base directory of the document.
+        :type base_dir: str
+        :param tex_files: The tex-files of the document.
+        :type tex_files: list[str]
+        :rtype: dict[str,(str, str, str, (str, int, int))]
+        :return: The number, the title (or None) and the type of the object
+                 of each label. Labels of external documents also have the
+                 .aux file, the line and the column where they are defined,
+                 the ones of the document itself None. The dictionary must not
+                 be altered.
+        """
+        aux_dir = normpath(join(base_dir, self._aux_directory))
+
+        # The .aux files to read together with the prefix of their labels, the
+        # directory which the files they include are relative to and whether
+        # or not they belong to an external document.
+        to_read = []
+        externals = []
+
+        for tex_file_name in tex_files:
+            try:
+                document = self._GetDocument(tex_file_name)
+            except IOError:
+                continue
+
+            if document.structure[1]:
+                to_read.append((join(aux_dir, splitext(basename(
+                    tex_file_name))[0] + ".aux"), "", aux_dir, False))
+
+            for prefix, name in document.externals:
+                external = normpath(join(base_dir, name + ".aux"))
+                externals.append((external, prefix, dirname(external), True))
+
+        to_read.extend(externals)
+
+        sources = []
+        visited = set()
+
+        while to_read:
+            aux_file_name, prefix, directory, external = to_read.pop(0)
+
+            if (aux_file_name, prefix) in visited:
+                continue
+
+            visited.add((aux_file_name, prefix))
+
+            self._project_files[base_dir].add(aux_file_name)
+
+            if self._watcher is not None:
+                self._watcher.Watch(aux_file_name)
+
+            try:
+                entries, inputs = self._file_cache.Get(aux_file_name, "aux",
+                        self._ParseAux)
+            except IOError:
+                # The document was not compiled yet.
+                continue
+
+            sources.append((aux_file_name, prefix, external, entries))
+            to_read.extend((normpath(join(directory, name)), prefix,
+                directory, external) for name in inputs)
+
+        cached, labels = self._Published("_aux", base_dir, (None, None))
+
+        if labels is not None and len(cached) == len(sources) and \
+                all(a[:3] == b[:3] and a[3] is b[3] for a, b in
+                    zip(cached, sources)):
+            return labels
+
+        labels = {}
+
+        for aux_file_name, prefix, external, entries in sources:
+            for label, number, title, ref_type, line, column in entries:
+                labels.setdefault(prefix + label, (number, title, ref_type,
+                    (aux_file_name, line, column) if external else None))
+
+        self._Publish("_aux", base_dir, (sources, labels))
+
+        return labels
+
+    def _CollectCitables(self, request_data):
+        """
+        Create the YCM compatible list of all citable objects which could be
+        found.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,str]
+        :rtype: list[dict[str,str]]
+        :return: A list of all citable objects which could be found in a format
+                 which YCM understands.
+        """
+        citables, outdated = self._GetObjects(self.Actions.Citation,
+                request_data, self._CollectCitablesInner)
+
+        if self._use_index:
+            citables = self._QueryIndex((self.Actions.Citation,
+                self._file_projects.get(request_data['filepath'])), citables,
+                request_data['query'])
+
+        with self._statistics.Measure("payload building"):
+            return [ c.completion_data(outdated = outdated) for c in citables ]
+
+    def _CollectCitablesInner(self, request_data):
+        """
+        Create a list of all citable objects which could be found.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,str]
+        :rtype: list[TexCitable]
+        :return: A list of all citable objects which could be found.
+        """
+        base_dir, citables = self._GatherCitables(request_data)
+
+        return self._Merge((self.Actions.Citation, base_dir), citables)
+
+    def _GatherCitables(self, request_data):
+        """
+        Gather the citable objects of all bibliographies of the document.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,str]
+        :rtype: (str, list[list[TexCitable]])
+        :return: A tuple containing the base directory of the document and a
+                 list containing the list of citable objects of each
+                 bibliography.
+        """
+        citables = []
+        bibliographies = []
+
+        file_dir, tex_files = self._GetProjectFiles(request_data)
+
+        self._Prefetch(tex_files, "document", self._ScanDocument)
+
+        # 1. Scan all found tex-files for a bibliography command.
+        for tex_file_name in tex_files:
+            self._CheckCancelled()
+
+            try:
+                # Add all found bib-files mentioned in this file to the
+                # overall list.
+                bibliographies.extend(self._GetDocument(
+                    tex_file_name).bibliographies)
+
+            except IOError as e:
+                # The file could somehow not be opened.
+                logger.warn("Could not open {} for inspection".format(
+                    tex_file_name))
+
+        self._statistics.Count("tex-files scanned", len(tex_files))
+        self._statistics.Count("bib-files scanned", len(bibliographies))
+
+        # 2. Parse the corresponding Bibtex-files.
+        for bib in bibliographies:
+            self._CheckCancelled()
+
+            bib_file_name = self._UseBibliography(bib, file_dir)
+
+            # Open the file and parse it
+            try:
+                logger.debug("Get citables from {}".format(bib_file_name))
+
+                # Add all citables found in this bibliography file to the
+                # overall list.
+                citables.append(self._file_cache.Get(bib_file_name,
+                    "citables", self._bib_index.Update))
+
+            except IOError as e:
+                if isfile(bib_file_name):
+                    # The file could somehow not be opened.
+                    logger.warn("Could not open {} for inspection".format(
+                        bib_file_name))
+                else:
+                    # The file does not exist. Ignore it.
+                    logger.warn("Bibliography {} does not exist".format(
+                        bib_file_name))
+
+        self._SaveSnapshot(file_dir)
+
+        return (file_dir, citables)
+
+    def _UseBibliography(self, name, base_dir):
+        """
+        Find a Bibtex database of a document and add it to the files of the
+        project.
+
+        :param name: The argument of the bibliography command.
+        :type name: str
+        :param base_dir: The base directory of the document.
+        :type base_dir: str
+        :rtype: str
+        :return: The path to the database.
+        """
+        bib_file_name = self._ResolveBibliography(name, base_dir)
+
+        self._project_files[base_dir].add(bib_file_name)
+
+        if self._watcher is not None:
+            self._watcher.Watch(bib_file_name)
+
+        return bib_file_name
+
+    def _CollectGlossaryEntries(self, request_data):
+        """
+        Create the YCM compatible list of all glossary entries and acronyms
+        which could be found.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,str]
+        :rtype: list[dict[str,str]]
+        :return: A list of all glossary entries which could be found in a
+                 format which YCM understands.
+        """
+        entries, outdated = self._GetObjects(self.Actions.Glossary,
+                request_data, self._CollectGlossaryEntriesInner)
+
+        if self._use_index:
+            entries = self._QueryIndex((self.Actions.Glossary,
+                self._file_projects.get(request_data['filepath'])), entries,
+                request_data['query'])
+
+        with self._statistics.Measure("payload building"):
+            return [ e.completion_data(outdated = outdated) for e in entries ]
+
+    def _CollectGlossaryEntriesInner(self, request_data):
+        """
+        Create a list of all glossary entries and acronyms which could be
+        found.
+
+        The entries are taken from the same scan of the tex-files as the
+        labels, so no file is read for them alone.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,str]
+        :rtype: list[TexGlossaryEntry]
+        :return: A list of all glossary entries which could be found.
+        """
+        entries = []
+
+        base_dir, tex_files = self._GetProjectFiles(request_data)
+
+        self._Prefetch(tex_files, "document", self._ScanDocument)
+
+        for tex_file_name in tex_files:
+            self._CheckCancelled()
+
+            try:
+                entries.append(self._GetDocument(tex_file_name).glossary)
+            except IOError:
+                logger.warn("Could not open {} for inspection".format(
+                    tex_file_name))
+
+        self._SaveSnapshot(base_dir)
+
+        return self._Merge((self.Actions.Glossary, base_dir), entries)
+
+    def _Prefetch(self, file_names, kind, parse):
+        """
+        Parse all given files which changed in parallel if worker processes
+        are enabled.
+
+        :param file_names: The paths to the files of interest.
+        :type file_names: list[str]
+        :param kind: The kind of result which is requested.
+        :type kind: str
+        :param parse: The method which is used to parse a single file.
+        :type parse: (str) -> object
+        """
+        if self._workers > 1:
+            self._file_cache.Prefetch(file_names, kind, parse,
+                    partial(self._ParseMany, parse.__name__))
+
+    def _StartPool(self):
+        """
+        Start the pool of worker processes.
+
+        Forking ycmd, which runs several threads, may dead lock a worker if
+        another thread holds a lock at this moment, e.g. the one of the logging
+        module. Hence, the workers are forked from a separate server process
+        or spawned anew. Python 2 only supports forking. There, the pool is
+        started before the completer starts any thread of its own.
+
+        :rtype: multiprocessing.pool.Pool
+        :return: The pool.
+        """
+        get_context = getattr(multiprocessing, "get_context", None)
+
+        if get_context is None:
+            return multiprocessing.Pool(self._workers, _InitializeWorker,
+                    (self._worker_options,))
+
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = get_context("forkserver")
+        else:
+            context = get_context("spawn")
+
+        return context.Pool(self._workers, _InitializeWorker,
+                (self._worker_options,))
+
+    def _ParseMany(self, method_name, contents):
+        """
+        Parse the contents of several files in parallel using the worker
+        processes, unless there is too little content for the workers to pay
+        off (see ParallelThresholds).
+
+        :param method_name: The name of the method which parses a file.
+        :type method_name: str
+        :param contents: The contents of the files.
+        :type contents: list[str]
+        :rtype: list[object]
+        :return: The results of the method for each content in the same order.
+        """
+        threshold = self.ParallelThresholds.get(method_name, 0)
+        if method_name == "_GetAllCitables" and \
+                self._bibtex_scanner is not None:
+            threshold = self.ParallelThresholds["_ScanDocument"]
+
+        if sum(len(content) for content in contents) < threshold:
+            self._statistics.Count("batches parsed serially")
+
+            parse = getattr(self, method_name)
+            return [parse(content) for content in contents]
+
+        if self._pool is None:
+            self._pool = self._StartPool()
+
+        logger.debug("Parse {} files with {} workers".format(len(contents),
+            self._workers))
+
+        return self._pool.map(_ParseInWorker,
+                [(method_name, content) for content in contents])
+
+    def _ParseBibtexBatches(self, contents):
+        """
+        Parse several pieces of Bibtex content in parallel using the worker
+        processes.
+
+        :param contents: The pieces of Bibtex content.
+        :type contents: list[str]
+        :rtype: list[list[TexCitable]]
+        :return: The citables of each piece of content in the same order.
+        """
+        results = self._ParseMany("_GetAllCitables", contents)
+
+        # The citables of different pieces were created in different
+        # processes. Let them share their strings again.
+        pool = {}
+        for citable in chain.from_iterable(results):
+            citable.share(pool)
+
+        return results
+
+    def _Merge(self, key, parts):
+        """
+        Merge the objects of all files into one sorted list in which every
+        completion text occurs only once.
+
+        The merged list is kept and only built again if one of the parts
+        changed since the last time.
+
+        :param key: The action and the base directory of the project for
+                    which the objects are merged.
+        :type key: (int, str)
+        :param parts: A list containing the lists of objects of each file.
+        :type parts: list[list[TexObject]]
+        :rtype: list[TexObject]
+        :return: The sorted list of unique objects. It must not be altered.
+        """
+        merged_parts, objects = self._Published("_merged", key, (None, None))
+
+        if objects is not None and len(parts) == len(merged_parts) and \
+                all(a is b for a, b in zip(parts, merged_parts)):
+            return objects
+
+        # The parts are already sorted themselves, which the sorting
+        # algorithm takes advantage of.
+        objects = []
+        last = None
+
+        with self._statistics.Measure("sorting"):
+            for o in sorted(chain.from_iterable(parts),
+                    key=methodcaller("sort_key")):
+                # Labels or keys which are defined multiple times are only
+                # presented once.
+                if o.completion() != last:
+                    objects.append(o)
+                    last = o.completion()
+
+        self._statistics.Count("objects merged", len(objects))
+
+        self._Publish("_merged", key, (parts, objects))
+        self._registry.Update(key[1], key[0], parts)
+
+        return objects
+
+    def _QueryIndex(self, key, objects, query):
+        """
+        Find the best matching objects for the given query.
+
+        The index for the objects is only built again if the objects changed
+        since the last query.
+
+        :param key: The action and the base directory of the project for
+                    which the objects are searched.
+        :type key: (int, str)
+        :param objects: The sorted list of objects which should be searched.
+        :type objects: list[TexObject]
+        :param query: The text which the user typed so far.
+        :type query: str
+        :rtype: list[TexObject]
+        :return: The best matching objects.
+        """
+        indexed_objects, index = self._Published("_indices", key, (None, None))
+
+        if index is None or indexed_objects is not objects:
+            with self._statistics.Measure("index building"):
+                index = TexCandidateIndex(objects)
+
+            self._Publish("_indices", key, (objects, index))
+
+        with self._statistics.Measure("index query"):
+            return index.Query(query, self._max_candidates)
+
+    def _GetProjectFiles(self, request_data):
+        """
+        Get all tex-files which belong to the same document as the file for
+        which the request was issued.
+
+        If the root document can be determined, only the files which can be
+        reached from it via input commands are part of the document. Otherwise
+        all tex-files in the directory of the file are used.
+
+        :param request_data: The data which YouCompleteMe passes to the
+                             completer.
+        :type request_data: dict[str,str]
+        :rtype: (str, list[str])
+        :return: A tuple containing the base directory of the document and the
+                 list of its tex-files.
+        """
+        with self._statistics.Measure("project files"):
+            return self._GetProjectFilesInner(request_data['filepath'])
+
+    def _GetProjectFilesInner(self, file_name):
+        """
+        Get the base directory and the tex-files of the document of a file.
+
+        :param file_name: The path to the file of interest.
+        :type file_name: str
+        :rtype: (str, list[str])
+        :return: A tuple containing the base directory of the document and the
+                 list of its tex-files.
+        """
+        resolved = getattr(self._request_local, "root", None)
+
+        if resolved is not None and resolved[0] == file_name:
+            # The root was determined before the lock of the project was
+            # taken.
+            base_dir, root = resolved[1:]
+        else:
+            base_dir, root = self._ResolveProject(file_name)
+
+        self._LoadSnapshot(base_dir)
+
+        if root is None:
+            tex_files = self._GetAllTexFiles(base_dir)
+        else:
+            tex_files = self._GetReachableFiles(root)
+
+            if self._watcher is not None:
+                for tex_file_name in tex_files:
+                    self._watcher.Watch(tex_file_name)
+
+        self._project_files.setdefault(base_dir, set()).update(tex_files)
+        self._file_projects[file_name] = base_dir
+
+        return (base_dir, tex_files)
+
+    def _SnapshotPath(self, base_dir):
+        """
+        Get the path to the snapshot file of a project.
+
+        :param base_dir: The base directory of the project.
+        :type base_dir: str
+        :rtype: str
+        :return: The path to the snapshot file.
+        """
+        name = hashlib.sha1(base_dir.encode("utf-8")).hexdigest()
+
+        return join(self._snapshot_dir, name + ".pickle")
+
+    def _LoadSnapshot(self, base_dir):
+        """
+        Load the snapshot of a project if snapshots are enabled and it was not
+        loaded before.
+
+        Only the information about files which did not change since the
+        snapshot was taken is used.
+
+        :param base_dir: The base directory of the project.
+        :type base_dir: str
+        """
+        if not self._snapshot_dir or base_dir in self._snapshots:
+            return
+
+        # Nothing was saved yet, so the first request saves right away.
+        self._snapshots[base_dir] = [0, -1]
+
+        snapshot_path = self._SnapshotPath(base_dir)
+        if not isfile(snapshot_path):
+            return
+
+        try:
+            with open(snapshot_path, "rb") as snapshot_file:
+                snapshot = pickle.load(snapshot_file)
+        except Exception as e:
+            # The snapshot is broken. It is replaced with the next save.
+            logger.warn("Could not load snapshot {}: {}".format(snapshot_path,
+                e))
+            return
+
+        if snapshot.get('version') != self.SnapshotVersion or \
+                snapshot.get('base_dir') != base_dir:
+            return
+
+        self._project_files.setdefault(base_dir, set()).update(
+                snapshot['files'])
+        self._bib_index.Import(snapshot['bibliographies'])
+        added = self._file_cache.Import(snapshot['entries'], self._GetParser)
+
+        # The loaded information is already saved.
+        self._snapshots[base_dir] = [time.time(), self._file_cache.Parsed(
+            self._project_files[base_dir])]
+
+        logger.info("Loaded {} results from snapshot {}".format(added,
+            snapshot_path))
+
+    def _LoadNearestSnapshot(self, file_name):
+        """
+        Load the snapshot of the project which a file most likely belongs to,
+        before its root document is determined.
+
+        The root document is not known yet. Hence, the directory of the file
+        and its parent directories are taken as base directories, and the
+        snapshot of the nearest one which has a snapshot is loaded. This is
+        only done for files whose project is not known yet.
+
+        :param file_name: The path to the file of a request.
+        :type file_name: str
+        """
+        if not self._snapshot_dir or file_name in self._file_projects:
+            return
+
+        directory = file_name if isdir(file_name) else dirname(file_name)
+
+        while True:
+            if directory in self._snapshots:
+                # The project was loaded already.
+                return
+
+            if isfile(self._SnapshotPath(directory)):
+                lock = self._AcquireProject(directory)
+
+                try:
+                    self._LoadSnapshot(directory)
+                finally:
+                    lock.release()
+
+                return
+
+            parent = dirname(directory)
+            if parent == directory:
+                return
+
+            directory = parent
+
+    def _SaveSnapshot(self, base_dir, force = False):
+        """
+        Save the snapshot of a project in the background if any of its files
+        was parsed since the last time.
+
+        :param base_dir: The base directory of the project.
+        :type base_dir: str
+        :param force: Whether or not to save even if the last save was less
+                      than the snapshot interval ago. (Defaults to False)
+        :type force: bool
+        """
+        state = self._snapshots.get(base_dir)
+        if state is None:
+            return
+
+        files = set(self._project_files.get(base_dir, set()))
+        parsed = self._file_cache.Parsed(files)
+
+        if state[1] == parsed:
+            return
+
+        if not force and time.time() - state[0] < self._snapshot_interval:
+            return
+
+        # The exported results are never changed, only replaced. So they can
+        # be pickled in the background.
+        snapshot = {
+            'version' : self.SnapshotVersion,
+            'base_dir' : base_dir,
+            'files' : files,
+            'entries' : self._file_cache.Export(files),
+            'bibliographies' : self._bib_index.Export(files)
+        }
+
+        state[:] = [time.time(), parsed]
+
+        self._snapshot_queue.put((base_dir, snapshot))
+
+    def _WriteSnapshots(self):
+        """
+        Write the snapshots which were saved, one after another, until None is
+        saved.
+
+        This method runs in a background thread.
+        """
+        while True:
+            saved = self._snapshot_queue.get()
+            if saved is None:
+                break
+
+            try:
+                self._WriteSnapshot(*saved)
+            except Exception:
+                logger.exception("Could not write snapshot of {}".format(
+                    saved[0]))
+
+    def _WriteSnapshot(self, base_dir, snapshot):
+        """
+        Write the snapshot of a project to its file.
+
+        :param base_dir: The base directory of the project.
+        :type base_dir: str
+        :param snapshot: The snapshot.
+        :type snapshot: dict[str,object]
+        """
+        snapshot_path = self._SnapshotPath(base_dir)
+
+        try:
+            if not isdir(self._snapshot_dir):
+                makedirs(self._snapshot_dir)
+
+            # Write to a temporary file first, so that a snapshot is never
+            # read half written.
+            with open(snapshot_path + ".tmp", "wb") as snapshot_file:
+                pickle.dump(snapshot, snapshot_file, pickle.HIGHEST_PROTOCOL)
+
+            rename(snapshot_path + ".tmp", snapshot_path)
+
+        except (IOError, OSError) as e:
+            logger.warn("Could not save snapshot {}: {}".format(snapshot_path,
+                e))
+
+    def _GetParser(self, file_name, kind):
+        """
+        Get the method which parses a specific kind of result for a file.
+
+        :param file_name: The path to the file of interest.
+        :type file_name: str
+        :param kind: The kind of result of interest.
+        :type kind: str
+        :rtype: (str) -> object
+        :return: The parse method.
+        """
+        return {
+            "citables" : self._bib_index.Update,
+            "document" : self._ScanDocument,
+            "aux" : self._ParseAux
+        }[kind]
+
+    def _FindRoot(self, file_name):
+        """
+        Determine the root document of the given file.
+
+        The root document is either named explicitly in the file by a
+        '%!TEX root' comment, or it is the file itself if it contains a
+        '\\documentclass' command, or it is a document in the same or the
+        parent directory which includes the file.
+
+        :param file_name: The path to the file of interest.
+        :type file_name: str
+        :rtype: str
+        :return: The path to the root document or None if there is none.
+        """
+        current = file_name
+        visited = set()
+
+        while current not in visited:
+            visited.add(current)
+
+            try:
+                magic_root, is_root, _ = self._GetStructure(current)
+            except IOError:
+                break
+
+            if magic_root is not None:
+                current = normpath(join(dirname(current), magic_root))
+            elif is_root:
+                return current
+            else:
+                break
+
+        # The file does not know its root. Check whether a previously found
+        # root still includes it.
+        root = self._roots.get(file_name)
+
+        if root is not None and file_name in self._GetReachableFiles(root):
+            return root
+
+        # Search for documents which include the file.
+        directory = dirname(file_name)
+
+        for search_dir in [directory, dirname(directory)]:
+            try:
+                candidates = self._GetAllTexFiles(search_dir)
+            except OSError:
+                continue
+
+            for candidate in candidates:
+                try:
+                    _, is_root, _ = self._GetStructure(candidate)
+                except IOError:
+                    continue
+
+                if is_root and file_name in self._GetReachableFiles(candidate):
+                    self._roots[file_name] = candidate
+                    return candidate
+
+        return None
+
+    def _GetReachableFiles(self, root):
+        """
+        Get all tex-files which can be reached from the root document by
+        following the input commands.
+
+        :param root: The path to the root document.
+        :type root: str
+        :rtype: list[str]
+        :return: The list of all reachable files including the root document.
+        """
+        root_dir = dirname(root)
+
+        reachable = []
+        visited = set([root])
+        to_visit = [root]
+
+        # Visit the files level by level, so that all files of a level can be
+        # parsed at once.
+        while to_visit:
+            self._Prefetch(to_visit, "document", self._ScanDocument)
+
+            next_to_visit = []
+
+            for current in to_visit:
+                try:
+                    _, _, dependencies = self._GetStructure(current)
+                except IOError:
+                    logger.warn("Could not open {} for inspection".format(
+                        current))
+                    continue
+
+                reachable.append(current)
+
+                for dependency in dependencies:
+                    resolved = self._ResolveDependency(dependency,
+                            [root_dir, dirname(current)])
+
+                    if resolved is not None and resolved not in visited:
+                        visited.add(resolved)
+                        next_to_visit.append(resolved)
+
+            to_visit = next_to_visit
+
+        return reachable
+
+    def _ResolveDependency(self, name, directories):
+        """
+        Find the file which is meant by the argument of an input command.
+
+        :param name: The argument of the input command.
+        :type name: str
+        :param directories: The directories where the file is searched in.
+        :type directories: list[str]
+        :rtype: str
+        :return: The path to the file or None if it does not exist.
+        """
+        names = [name]
+        if splitext(name)[1] != ".tex":
+            names.insert(0, name + ".tex")
+
+        for directory in directories:
+            for candidate in names:
+                path = normpath(join(directory, candidate))
+
+                if self._file_cache.Trusts(path, "document") or isfile(path):
+                    return path
+
+        return None
+
+    def _ReadSearchPaths(self, paths):
+        """
+        Read a list of directories to search files in.
+
+        :param paths: Either a list of directories or a string of directories
+                      separated like in the PATH environment variable. Empty
+                      entries, which stand for the default directories of TeX,
+                      are skipped. Trailing slashes, which ask TeX to search
+                      subdirectories too, are ignored, except for the root
+                      directory itself.
+        :type paths: list[str] | str
+        :rtype: list[str]
+        :return: The directories.
+        """
+        if not isinstance(paths, list):
+            paths = str(paths).split(pathsep)
+
+        directories = []
+
+        for path in paths:
+            path = path.strip()
+
+            if path:
+                directories.append(normpath(expanduser(path.rstrip("/") or
+                    "/")))
+
+        return directories
+
+    def _ResolveBibliography(self, name, base_dir):
+        """
+        Find the Bibtex database which is meant by the argument of a
+        bibliography command.
+
+        The database is searched relative to the base directory of the
+        document first and in the configured search paths afterwards. Links
+        are resolved, so that every database is cached only once no matter
+        how the projects refer to it.
+
+        :param name: The argument of the bibliography command. It may contain
+                     directories and lack the extension.
+        :type name: str
+        :param base_dir: The base directory of the document.
+        :type base_dir: str
+        :rtype: str
+        :return: The real path to the database. If it does not exist, the path
+                 relative to the base directory is returned.
+        """
+        name = expanduser(name.strip())
+
+        names = [name]
+        if splitext(name)[1] != ".bib":
+            names.insert(0, name + ".bib")
+
+        for directory in [base_dir] + self._bib_paths:
+            for candidate in names:
+                path = normpath(join(directory, candidate))
+
+                if self._file_cache.Trusts(path, "citables"):
+                    return path
+
+                if isfile(path):
+                    return realpath(path)
+
+        return normpath(join(base_dir, names[0]))
+
+    def _GetStructure(self, file_name):
+        """
+        Get the information about how the given file is embedded into its
+        document.
+
+        :param file_name: The path to the file of interest.
+        :type file_name: str
+        :rtype: (str, bool, list[str])
+        :return: See TexDocument.structure.
+        :raises IOError: If the file can not be accessed.
+        """
+        return self._GetDocument(file_name).structure
+
+    def _GetDocument(self, file_name):
+        """
+        Get all information about a tex-file. The file is only read and
+        scanned again if it changed since the last time.
+
+        :param file_name: The path to the file of interest.
+        :type file_name: str
+        :rtype: TexDocument
+        :return: The information about the file.
+        :raises IOError: If the file can not be accessed.
+        """
+        return self._file_cache.Get(file_name, "document",
+                self._ScanDocument)
+
+    def _GetAllTexFiles(self, directory):
+        """
+        Get the list of all tex-files which are present in the specified
+        directory.
+
+        :param directory: The directory of interest.
+        :type directory: str
         :rtype: list[str]
         :return: A list of all tex-files found in the directory.
         """
-        return [join(directory, f) for f in listdir(directory)
-                if isfile(join(directory, f)) and splitext(f)[1] == ".tex"]
+        if self._watcher is None:
+            return self._ListTexFiles(directory)
+
+        # The watcher keeps the list of files up to date.
+        tex_files = self._tex_files.get(directory)
 
-    def _GetAllReferables(self, file_content):
+        if tex_files is None:
+            tex_files = self._ListTexFiles(directory)
+
+            self._tex_files[directory] = tex_files
+            self._watcher.Watch(directory)
+
+        return tex_files
+
+    def _ListTexFiles(self, directory):
         """
-        Parse the given content for labels which can be later referenced.
+        Search the specified directory for tex-files.
 
-        :param file_content: The content of the file which should be examined.
-        :type file_content: str
-        :rtype: list[TexReferable]
-        :return: The list of all referable objects in the file.
+        :param directory: The directory of interest.
+        :type directory: str
+        :rtype: list[str]
+        :return: A list of all tex-files found in the directory.
         """
-        found_referables = []
+        with self._statistics.Measure("directory listing"):
+            return [join(directory, f) for f in listdir(directory)
+                    if isfile(join(directory, f)) and splitext(f)[1] == ".tex"]
+
+    def _OnChangesLost(self):
+        """
+        Check the files on every request again since the watcher lost track of
+        the changes, until it brought all files up to date.
+
+        This method is called by the watcher in the background.
+        """
+        logger.warn("Lost track of changed files. Check them on every request")
+
+        self._file_cache.validate = True
+        self._generation += 1
+
+    def _OnFilesChanged(self, paths):
+        """
+        Bring the parsed information about the given files up to date.
+
+        This method is called by the watcher in the background whenever files
+        in the watched directories changed.
+
+        :param paths: The paths of all files which changed or None if changes
+                      were lost. In this case all files of all projects are
+                      checked and the files are trusted again afterwards.
+        :type paths: set[str]
+        """
+        if paths is None:
+            logger.debug("Refresh all files")
+            projects = sorted(self._project_files)
+        else:
+            logger.debug("Refresh {} changed files".format(len(paths)))
+
+            directories = set(dirname(p) for p in paths)
+            projects = sorted(project for project, files in
+                    list(self._project_files.items())
+                    if project in directories or not files.isdisjoint(paths))
+
+        # Lock all projects which the files may belong to. No other thread
+        # holds more than one of the locks at a time, so this can not dead
+        # lock.
+        locks = [self._AcquireProject(project) for project in projects]
+
+        try:
+            self._OnFilesChangedInner(paths)
+
+            # Objects found so far may be outdated now.
+            self._generation += 1
+
+            if paths is None:
+                self._file_cache.validate = False
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _OnFilesChangedInner(self, paths):
+        """
+        Bring the parsed information about the given files up to date while
+        the locks of their projects are held.
+
+        :param paths: The paths of all files which changed or None if all files
+                      may have changed.
+        :type paths: set[str]
+        """
+        new_tex_files = []
+
+        if paths is None:
+            paths = set(chain.from_iterable(list(
+                self._project_files.values())))
+            directories = set(self._tex_files)
+        else:
+            directories = set(dirname(p) for p in paths)
+
+        for directory in directories:
+            if directory not in self._tex_files:
+                continue
+
+            # Files may have been created or removed. So search the directory
+            # again.
+            try:
+                tex_files = self._ListTexFiles(directory)
+            except OSError:
+                tex_files = []
+
+            new_tex_files.extend(set(tex_files) -
+                    set(self._tex_files[directory]))
+            self._tex_files[directory] = tex_files
+
+        for path in paths:
+            self._file_cache.Refresh(path)
+
+            if not isfile(path):
+                self._bib_index.Remove(path)
+
+        # Parse the new files right away so that they are ready when they are
+        # needed.
+        for tex_file_name in new_tex_files:
+            try:
+                self._GetDocument(tex_file_name)
+            except IOError:
+                pass
+
+    def _CompileDocumentTokens(self, references, citations):
+        """
+        Build the regular expression which finds all tokens of a document that
+        are relevant for any kind of information the completer extracts from
+        it, so that a document is walked through only once.
+
+        :param references: The names of all reference commands.
+        :type references: list[str]
+        :param citations: The names of all citation commands.
+        :type citations: list[str]
+        :rtype: re.RegexObject
+        :return: The compiled regular expression. The name of its last matched
+                 group tells the kind of the token.
+        """
+        def alternatives(commands):
+            # Longer names first, so that no name shadows a longer one.
+            return "|".join(re.escape(c) for c in
+                    sorted(set(commands), key=len, reverse=True))
+
+        sectioning = self.SectioningCommands + \
+                [command for command, _ in self.SpecialSectioningCommands]
+
+        return re.compile("|".join([
+            # Comments, which are skipped apart from the root comment.
+            r"(?P<comment>(?<!\\)%[^\n]*)",
+            # The structure of the document and the resources it uses.
+            r"\\(?P<documentclass>documentclass)\b",
+            r"\\(?:" + "|".join(self.InputCommands) +
+                r")\s*\{(?P<dependency>[^}]*)\}",
+            r"\\(?P<bibliography>" + "|".join(self.BibliographyCommands) +
+                r")\s*(?:\[[^\]]*\]\s*)?\{(?P<resources>[^}]*)\}",
+            r"\\externaldocument\s*(?:\[(?P<external_prefix>[^\]]*)\]\s*)?" +
+                r"\{(?P<external>[^}]*)\}",
+            # Definitions of glossary entries and acronyms.
+            r"\\newglossaryentry\s*\{(?P<glossary>[^}]*)\}\s*" +
+                r"\{(?P<glossary_options>(?:[^{}]|\{[^{}]*\})*)\}",
+            r"\\newacronym\s*(?:\[[^\]]*\]\s*)?\{(?P<acronym>[^}]*)\}\s*" +
+                r"\{(?P<acronym_short>[^}]*)\}\s*" +
+                r"\{(?P<acronym_long>(?:[^{}]|\{[^{}]*\})*)\}",
+            # Begin and end of environments.
+            r"\\begin\s*\{(?P<begin>[^}]*)\}",
+            r"\\end\s*\{(?P<end>[^}]*)\}",
+            # Sectioning commands with optional star and short name.
+            r"\\(?P<section>" + "|".join(map(re.escape, sectioning)) +
+                r")\*?\s*(?:\[[^\]]*\])?\s*\{",
+            # Captions either as command or as option of an environment.
+            r"\\caption\s*(?:\[[^\]]*\])?\s*(?P<caption>\{)",
+            r"(?<![\w\\])caption\s*(?P<caption_option>=)",
+            # Labels either as command or as option of an environment.
+            r"\\label\s*(?P<label>\{)",
+            r"(?<![\w\\])label\s*(?P<label_option>=)",
+            # References and citations with the keys they use.
+            r"\\(?:(?P<reference>" + alternatives(references) +
+                r")|(?P<citation>" + alternatives(citations) +
+                r"))\*?(?:\s*\[[^\[\]]*\]){0,2}\s*\{(?P<keys>[^{}]*)\}"
+        ]))
+
+    def _ReadArgument(self, content, begin):
+        """
+        Read the argument of a command which is enclosed by curly brackets.
+
+        Nested curly brackets within the argument are handled properly.
+
+        :param content: The string where the argument is located.
+        :type content: str
+        :param begin: The position directly after the opening curly bracket.
+        :type begin: int
+        :rtype: str
+        :return: The argument without the enclosing curly brackets.
+        """
+        depth = 1
+        end = begin
+
+        while depth > 0:
+            brace = self._BraceTokens.search(content, end)
+
+            if brace is None:
+                # The argument is not terminated. Use everything until the end.
+                return content[begin:]
+
+            depth += 1 if brace.group() == "{" else -1
+            end = brace.end()
+
+        return content[begin:end - 1]
+
+    def _ReadOptionValue(self, content, begin):
+        """
+        Read the value of an option of a command.
+
+        :param content: The string where the option value is located.
+        :type content: str
+        :param begin: The position directly after the equal sign of the option.
+        :type begin: int
+        :rtype: str
+        :return: The value of the option.
+        """
+        while begin < len(content) and content[begin] in " \t":
+            begin += 1
 
-        for line_nr, line in enumerate(file_content.splitlines()):
-            label = self._ExtractFromOptionOrCommand(line, "label")
+        if begin < len(content) and content[begin] == "{":
+            # The value is surrounded by curly brackets.
+            return self._ReadArgument(content, begin + 1)
 
-            if label is not None:
-                name, ref_type = self._GetAdditionalReferableInformation(
-                            file_content, label)
+        # The value is not surrounded by curly brackets, so it ends at the next
+        # separator.
+        end = begin
+        while end < len(content) and content[end] not in ",]}\n":
+            end += 1
 
-                referable = TexReferable(label=label, name=name,
-                        ref_type=ref_type)
-                referable.shorten("No Name")
+        return content[begin:end].strip()
+
+    def _CleanName(self, name):
+        """
+        Make the name of a referable object presentable.
 
-                found_referables.append(referable)
+        :param name: The name as it was found in the document.
+        :type name: str
+        :rtype: str
+        :return: The name without labels and line breaks.
+        """
+        name = self._LabelCommand.sub("", name)
 
-        return found_referables
+        return " ".join(name.split())
 
-    def _GetAdditionalReferableInformation(self, file_content, label):
+    def _ScanDocument(self, file_content):
         """
-        Parse the given content for additional information to a given label of a
-        referable object.
+        Parse the given content for all information which the completer needs
+        about a tex-file.
+
+        The content is walked through exactly once for all kinds of
+        information. Meanwhile the currently open environments and the last
+        sectioning command are tracked, so that the name and the type of every
+        label is known without searching for it again.
 
         :param file_content: The content of the file which should be examined.
         :type file_content: str
-        :param label: The label of the referable object.
-        :type label: str
-        :rtype: (str,str)
-        :return: A tuple containing the name and the type of the corresponding
-                 referable object.
+        :rtype: TexDocument
+        :return: The information about the file.
         """
-        name = "No Name"
-        ref_type = "unknown"
+        magic_root = None
+        is_root = False
+        dependencies = []
+        bibliographies = []
+        glossary = []
+        externals = []
+        usages = []
+        found_referables = []
+
+        # The line at a position of the content and the position up to which
+        # the lines were counted.
+        counted = [0, 1]
+
+        def position(begin):
+            if begin >= counted[0]:
+                counted[1] += file_content.count("\n", counted[0], begin)
+            else:
+                counted[1] -= file_content.count("\n", begin, counted[0])
+            counted[0] = begin
+
+            return (counted[1], ByteColumn(file_content, begin))
+
+        def add(label, name, ref_type):
+            referable = TexReferable(label=label[0], name=name,
+                    ref_type=ref_type, position=label[1])
+            referable.shorten("No Name")
 
-        # Search for the definition of the label in the text.
-        label_pos = 0
+            found_referables.append(referable)
+
+        # The stack of currently open environments. Each environment is
+        # described by [begin position, type, caption, pending labels], where
+        # the pending labels are the ones which wait for a caption of the
+        # environment.
+        environments = []
+
+        # The last sectioning command as (begin position, type, name).
+        section = None
+
+        pos = 0
 
         while True:
-            label_pos = file_content.find(label, label_pos)
+            token = self._document_tokens.search(file_content, pos)
 
-            # Was the label actually contained in the file?
-            if label_pos == -1:
+            if token is None:
                 break
 
-            # Check that this is actually the label definition and not a
-            # reference to it.
-            if file_content[:label_pos].endswith("label=") or \
-                    file_content[:label_pos].endswith(r"\label{"):
-                # This is actually the definition so break here.
-                break
-            else:
-                # Continue searching.
-                label_pos += len(label)
+            pos = token.end()
+            kind = token.lastgroup
 
-        if label_pos != -1:
-            # The label was found in the file. Continue to search for additional
-            # information.
+            if kind == "comment":
+                # The root document may be named by a comment on a line of
+                # its own.
+                if magic_root is None and not file_content[file_content.rfind(
+                    "\n", 0, token.start()) + 1:token.start()].strip():
+                    magic_root = self._MagicRoot.match(token.group(kind))
 
-            # Search from the label position beginning backwards until another latex
-            # command is found. If this command is either a begin or a sectioning
-            # command use it to extract the data. Otherwise continue to search.
-            current_pos = label_pos
+                    if magic_root is not None:
+                        magic_root = magic_root.group(1).strip()
 
-            while current_pos >= 0:
-                current_pos = file_content.rfind("\\", 0, current_pos)
+            elif kind == "documentclass":
+                is_root = True
 
-                if current_pos == -1:
-                    # Nothing could be found any more. Leave the loop
-                    break
+            elif kind == "dependency":
+                dependencies.append(token.group(kind).strip())
 
-                current_content = file_content[current_pos:label_pos]
+            elif kind == "resources":
+                resources = token.group(kind).replace('\n', ' ').replace(
+                        '\r', '')
 
-                if current_content.startswith(r"\begin{"):
-                    # This is a begin command. Which begins an environment.
+                # Only the classic command takes a comma separated list of
+                # databases. The ones of biblatex take a single file name.
+                if token.group("bibliography") == "bibliography":
+                    bibliographies.extend(resources.split(","))
+                else:
+                    bibliographies.append(resources)
 
-                    # Search inside within the environment for the caption
-                    # command and extract the reference type which is the
-                    # environment type.
+            elif kind == "external":
+                externals.append(((token.group("external_prefix") or
+                    "").strip(), token.group(kind).strip()))
 
-                    # Extract the reference type.
-                    ref_type = self._ExtractFromCommand(current_content, "begin")
+            elif kind == "glossary_options":
+                name = self._GlossaryName.search(token.group(kind))
+                name = name.group(1).strip().strip("{}") if name is not None \
+                        else token.group("glossary").strip()
 
-                    # Extract the name from the environment
-                    env_begin = current_pos
-                    env_end = file_content.find(r"\end{" + ref_type + "}", env_begin)
-                    env_content = file_content[env_begin:env_end]
+                glossary.append(TexGlossaryEntry(
+                    token.group("glossary").strip(), self._CleanName(name)))
 
-                    found_name = self._ExtractFromOptionOrCommand(env_content,
-                            "caption")
+            elif kind == "acronym_long":
+                glossary.append(TexGlossaryEntry(
+                    token.group("acronym").strip(),
+                    self._CleanName(token.group("acronym_short")),
+                    self._CleanName(token.group(kind)), "acronym"))
 
-                    if name is not None:
-                        # The name of the referable object could not be
-                        # determined. So use the default.
-                        name = found_name
+            elif kind == "keys":
+                action = self.Actions.Citation if token.group("citation") \
+                        else self.Actions.Reference
 
-                    # Leave the search loop as the needed information is found.
-                    break
+                for key, begin in self._GetKeys(token):
+                    usages.append((action, key) + position(begin))
 
-                else:
-                    found = False
-
-                    # Check for all sectioning commands.
-                    for command in self.SectioningCommands:
-                        # Try if the command can be found in the currently
-                        # examined content.
-                        found_name = self._ExtractFromCommand(current_content,
-                                command, starable=True)
-
-                        if found_name is not None:
-                            # The command was found and the name directly
-                            # extracted. So just use extract also the reference
-                            # type which is the command name and finish the
-                            # search.
-                            name = found_name
-                            ref_type = command
-                            found = True
-                            break
+            elif kind == "begin":
+                environments.append([token.start(), token.group(kind).strip(),
+                    None, []])
 
-                    # Leave the search loop as the needed information is found.
-                    if found:
-                        break
+            elif kind == "end":
+                name = token.group(kind).strip()
+
+                # Close all environments up to the matching one. This also
+                # recovers from unbalanced environments.
+                if any(env[1] == name for env in environments):
+                    while True:
+                        env = environments.pop()
 
-                    for command, command_type in self.SpecialSectioningCommands:
-                        # Try if this command can be found in the currently
-                        # examined content.
-                        found_name = self._ExtractFromCommand(current_content,
-                                command)
-
-                        if found_name is not None:
-                            # The command could be found. The name is already
-                            # extracted, so just use it. The reference type is
-                            # the command_type.
-                            name = found_name
-                            ref_type = command_type
-                            found = True
+                        # Labels which did not get a caption can not be
+                        # described any better.
+                        for label in env[3]:
+                            add(label, "No Name", env[1])
+
+                        if env[1] == name:
                             break
 
-                    # Leave the search loop as the needed information is found.
-                    if found:
-                        break
+            elif kind == "section":
+                command = token.group(kind)
+                ref_type = dict(self.SpecialSectioningCommands).get(command,
+                        command)
 
-        else:
-            # The label could not be found in the file. Something went wrong!
-            logger.warn("Could not find additional information " + \
-                    "to referable {}".format(label))
+                section = (token.start(), ref_type,
+                        self._CleanName(self._ReadArgument(file_content, pos)))
+
+            elif kind in ("caption", "caption_option"):
+                if kind == "caption":
+                    caption = self._ReadArgument(file_content, pos)
+                else:
+                    caption = self._ReadOptionValue(file_content, pos)
+
+                # The caption belongs to the innermost environment. Only the
+                # first one is used.
+                if environments and environments[-1][2] is None:
+                    env = environments[-1]
+                    env[2] = self._CleanName(caption)
 
-        return (name, ref_type)
+                    for label in env[3]:
+                        add(label, env[2], env[1])
+                    env[3] = []
 
-    def _GetAllBibliographies(self, file_content):
+            elif kind in ("label", "label_option"):
+                if kind == "label":
+                    label = self._ReadArgument(file_content, pos).strip()
+                else:
+                    label = self._ReadOptionValue(file_content, pos)
+
+                if not label:
+                    continue
+
+                # Remember where the label is defined.
+                label = (label, position(file_content.find(label, pos)))
+
+                # The label describes whatever started last, either the
+                # innermost environment or the last sectioning command.
+                env = environments[-1] if environments else None
+
+                if env is not None and (section is None or env[0] > section[0]):
+                    if env[2] is not None:
+                        add(label, env[2], env[1])
+                    else:
+                        # The caption may still follow.
+                        env[3].append(label)
+                elif section is not None:
+                    add(label, section[2], section[1])
+                else:
+                    add(label, "No Name", "unknown")
+
+        # Resolve all labels of environments which were never closed.
+        for env in environments:
+            for label in env[3]:
+                add(label, "No Name", env[1])
+
+        if self._precompute_completions:
+            for o in chain(found_referables, glossary):
+                o.completion_data()
+
+        found_referables.sort(key=methodcaller("sort_key"))
+        glossary.sort(key=methodcaller("sort_key"))
+
+        return TexDocument((magic_root, is_root, dependencies),
+                found_referables, usages, bibliographies, glossary, externals)
+
+    def _ParseAux(self, file_content):
         """
-        Parse the given content for mentioned bibliographies and return them.
+        Parse the content of an .aux file for the labels which LaTeX wrote
+        when it compiled the document.
 
         :param file_content: The content of the file which should be examined.
         :type file_content: str
-        :rtype: list[str]
-        :return: The list of all bibliographies found in the file.
+        :rtype: (list[(str, str, str, str, int, int)], list[str])
+        :return: A tuple containing the label, the number, the title (or None),
+                 the type, and the line and the column of the label of each
+                 labeled object, and the list of all .aux files which are
+                 included by the file.
         """
-        found_bibliographies = []
+        found_labels = []
+        inputs = []
+
+        # The line and the position of the last token, so that the content is
+        # only searched once for line breaks.
+        line = 1
+        position = 0
+
+        for token in self._AuxTokens.finditer(file_content):
+            if token.group("input") is not None:
+                inputs.append(token.group("input").strip())
+                continue
+
+            label = token.group("label")
+
+            # Labels with an '@' are internal ones of packages like cleveref.
+            if "@" in label:
+                continue
+
+            title = token.group("title")
+            anchor = token.group("anchor")
+
+            ref_type = anchor.split(".", 1)[0] if anchor else "unknown"
+            ref_type = self.AnchorTypes.get(ref_type, ref_type)
 
-        for line in file_content.splitlines():
-            # Check whether a bibliography command is in the current line.
-            for command in self.BibliographyCommands:
-                biblographies = self._ExtractFromCommand(line, command)
+            begin = token.start("label")
+            line += file_content.count("\n", position, begin)
+            position = begin
 
-                if biblographies is not None:
-                    # The command to define a bibliography is in this line.
-                    # Add then to the list.
-                    found_bibliographies.extend(biblographies.split(","))
+            found_labels.append((label,
+                self._AuxNumber.sub("", token.group("number")).strip(),
+                self._CleanName(title) if title else None, ref_type, line,
+                ByteColumn(file_content, begin)))
 
-        return found_bibliographies
+        return (found_labels, inputs)
 
     def _GetAllCitables(self, file_content):
         """
@@ -967,31 +5888,78 @@ class TexCompleter(Completer):
         """
         found_citables = []
 
-        database = bibtexparser.loads(file_content)
+        # Strings which are shared between the citables of this database.
+        pool = {}
 
-        for entry in database.entries:
+        if self._bibtex_scanner is not None:
+            entries, file_content = self._bibtex_scanner.Scan(file_content)
+        else:
+            entries = []
+
+        if file_content:
+            entries.extend(bibtexparser.loads(file_content).entries)
+
+        for entry in entries:
             # Extract the needed data from the entry.
             label = entry['ID']
-            title = entry['title'] if entry.has_key('title') else "No Title"
-            author = entry['author'] if entry.has_key('author') else "No Author"
+            title = entry.get('title', "No Title")
+            author = entry.get('author', "No Author")
             cite_type = entry['ENTRYTYPE']
 
             citable = TexCitable(label=label, title=title, author=author,
                     cite_type=cite_type)
-            citable.shorten("No Title", "No Author")
+            citable.shorten("No Title", "No Author").share(pool)
+
+            if self._precompute_completions:
+                citable.completion_data()
 
             found_citables.append(citable)
 
         return found_citables
 
 
+###
+# Parsing in worker processes.
+###
+# The completer which is used by a worker process to parse files.
+_worker_completer = None
+
+def _InitializeWorker(user_options):
+    """
+    Prepare a worker process for parsing.
+
+    :param user_options: The options for the completer of the worker.
+    :type user_options: dict[str,object]
+    """
+    global _worker_completer
+
+    _worker_completer = TexCompleter(user_options)
+
+def _ParseInWorker(task):
+    """
+    Parse the content of a file in a worker process.
+
+    The content is read by the completer, so that it matches the fingerprint
+    which the result is stored with.
+
+    :param task: A tuple containing the name of the parse method of the
+                 completer and the content of the file.
+    :type task: (str, str)
+    :rtype: object
+    :return: The result of the parse method.
+    """
+    method_name, content = task
+
+    return getattr(_worker_completer, method_name)(content)
+
+
 ###
 # Enable the file to be runnable as script, too.
 ###
 if __name__ == "__main__":
     # Additional imports:
     from os import getcwd
-    from os.path import isabs, expanduser
+    from os.path import isabs
     from argparse import ArgumentParser
 
     # Command line options for the script.
@@ -1007,6 +5975,8 @@ if __name__ == "__main__":
     print_type.add_argument('-f', '--full', default=False,
             action='store_true', dest='full',
             help="Present all information available.")
+    options.add_argument('-j', '--jobs', type=int, default=0, dest='jobs',
+            help="The number of worker processes which parse the files.")
 
     # Get the option and make properly usable.
     parsed_args = options.parse_args()
@@ -1024,7 +5994,8 @@ if __name__ == "__main__":
     # the directory.
     completer = TexCompleter({
         'min_num_of_chars_for_completion' : 1,
-        'auto_trigger' : False
+        'auto_trigger' : False,
+        'tex_parse_workers' : parsed_args.jobs
     })
 
     citables = completer._CollectCitablesInner(
@@ -1034,6 +6005,8 @@ if __name__ == "__main__":
             {'filepath' : directory}
     )
 
+    completer.Shutdown()
+
     print("Citables (" + str(len(citables)) + "):")
     for c in citables:
         if full: